@@ -0,0 +1,39 @@
+"""Benchmark of the ExtractionPool with an increasing number of processes.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_extraction.py --months 24 --procs 1 2 4 8 16
+"""
+import argparse
+import time
+
+from src.preprocess.extraction import ExtractionPool
+
+CORPUS_PATH = "tests/units/data_examples/complete_pgn.txt"
+USERNAME = "marcov24"
+
+
+def parse_months(months, n_procs):
+    """Parse all months with n_procs processes, return the number of games."""
+    with ExtractionPool(USERNAME, n_procs) as pool:
+        futures = [future for pgns in months for future in pool.submit(pgns)]
+        return sum(future.result().num_rows for future in futures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=24, help="Copies of the corpus.")
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+    with open(CORPUS_PATH, "r") as f:
+        months = [f.read()] * args.months
+    reference = None
+    print(f"{'procs':>6} {'time (s)':>9} {'games/s':>9} {'speedup':>8}")
+    for n_procs in args.procs:
+        start = time.perf_counter()
+        n_games = parse_months(months, n_procs)
+        elapsed = time.perf_counter() - start
+        reference = reference or elapsed
+        print(
+            f"{n_procs:>6} {elapsed:9.3f} {n_games / elapsed:9.0f} "
+            f"{reference / elapsed:7.1f}x"
+        )
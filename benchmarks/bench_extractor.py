@@ -0,0 +1,52 @@
+"""Benchmark of the single-pass RegExtractor.extract against one scan per field.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_extractor.py --repeat 20
+"""
+import argparse
+import time
+
+from src.preprocess.regextractor import RegExtractor
+
+CORPUS_PATH = "tests/units/data_examples/complete_pgn.txt"
+USERNAME = "marcov24"
+
+
+def six_scans(pgn_txts):
+    """Previous implementation of PGN.extract_from_txt."""
+    for pgn_txt in pgn_txts:
+        color = RegExtractor.get_color(pgn_txt, USERNAME)
+        RegExtractor.get_result(pgn_txt, color)
+        RegExtractor.get_link(pgn_txt)
+        RegExtractor.get_month(pgn_txt)
+        RegExtractor.get_opening(pgn_txt)
+        RegExtractor.get_game(pgn_txt)
+
+
+def single_pass(pgn_txts):
+    """Current implementation of PGN.extract_from_txt."""
+    for pgn_txt in pgn_txts:
+        RegExtractor.extract(pgn_txt, USERNAME)
+
+
+def timed(func, *args):
+    """Return the wall time of func(*args) in seconds."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20, help="Copies of the corpus.")
+    args = parser.parse_args()
+    with open(CORPUS_PATH, "r") as f:
+        pgn_txts = RegExtractor.split(f.read()) * args.repeat
+    scans_time = timed(six_scans, pgn_txts)
+    single_time = timed(single_pass, pgn_txts)
+    print(f"{len(pgn_txts)} games")
+    print(f"six scans   : {scans_time:.3f}s ({len(pgn_txts) / scans_time:.0f} games/s)")
+    print(
+        f"single pass : {single_time:.3f}s ({len(pgn_txts) / single_time:.0f} games/s)"
+    )
+    print(f"speedup     : {scans_time / single_time:.1f}x")
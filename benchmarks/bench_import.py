@@ -0,0 +1,18 @@
+"""Benchmark of the import of the app, from the output of python -X importtime.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_import.py --top 15
+"""
+import argparse
+
+from tests.conftest import module_import_times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="src.app", help="Module imported.")
+    parser.add_argument("--top", type=int, default=15, help="Modules printed.")
+    args = parser.parse_args()
+    times = sorted(module_import_times(args.module), reverse=True)
+    for cumulative, name in times[: args.top]:
+        print(f"{cumulative / 1e6:8.3f}s {name}")
@@ -0,0 +1,100 @@
+"""Benchmark of ranking the positions of a large tree.
+
+A random tree is generated directly as a NodeStore, then ranked by rank_positions and
+by the former walk of a dictionary of PositionNode with queue.Queue and PriorityQueue.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_ranking.py --positions 1000000
+"""
+import argparse
+import queue
+import time
+
+import numpy as np
+
+from src.explorer.node_store import NodeStore
+from src.explorer.position_node import PositionNode
+from src.explorer.ranking import ROOT_KEY, rank_positions
+
+THRESH = 3
+K = 10
+
+
+def random_store(n: int, seed: int = 0) -> NodeStore:
+    """Store of a random tree of n positions whose counts decrease with depth."""
+    rng = np.random.default_rng(seed)
+    keys = rng.choice(np.iinfo(np.int64).max, n, replace=False).astype(np.uint64)
+    keys[0] = ROOT_KEY
+    # Position i is a child of a random earlier position, favouring the first ones.
+    parents = (rng.random(n - 1) ** 2 * np.arange(1, n)).astype(np.int64)
+    depth = np.zeros(n, dtype=np.int64)
+    for i, parent in enumerate(parents.tolist(), start=1):
+        depth[i] = depth[parent] + 1
+    n_games = np.maximum(1000 >> np.minimum(depth, 20), 1)
+    wins = rng.binomial(n_games, 0.5)
+    draws = rng.binomial(n_games - wins, 0.1)
+    order = np.argsort(keys)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    edges = np.lexsort((keys[1:], rank[parents]))
+    empty = np.zeros(n + 1, dtype=np.int64)
+    arrays = {
+        "hashes": keys[order],
+        "last_move_hero": (depth % 2 == 1)[order],
+        "counts": np.stack([wins, draws, n_games - wins - draws], axis=1)[order],
+        "child_ptr": NodeStore.offsets(rank[parents][edges], n),
+        "child_keys": keys[1:][edges],
+        "path_ptr": empty,
+        "path_bytes": np.zeros(0, dtype=np.uint8),
+        "opening_codes": np.zeros(n, dtype=np.int32),
+        "game_ptr": empty,
+        "game_ids": np.zeros(0, dtype=np.int32),
+    }
+    arrays.update(NodeStore.month_histograms(empty, arrays["game_ids"], None, None))
+    return NodeStore(arrays, [""])
+
+
+def queue_ranking(tree, thresh: int, k: int):
+    """Former ranking: walk with queue.Queue, rank with queue.PriorityQueue."""
+    pos_q, output_q, visited = queue.Queue(), queue.PriorityQueue(), {ROOT_KEY}
+    pos_q.put(ROOT_KEY)
+    while not pos_q.empty():
+        node_id = pos_q.get()
+        pos_node = tree[node_id]
+        if (not pos_node.last_move_hero) and (node_id not in visited):
+            output_q.put((pos_node.win_rate(), node_id))
+        for child_id in pos_node.children:
+            if child_id in tree:
+                child = tree[child_id]
+                if child_id not in visited and child.n_games() >= thresh:
+                    pos_q.put(child_id)
+        visited.add(node_id)
+    return [output_q.get()[1] for _ in range(min(k, output_q.qsize()))]
+
+
+def to_nodes(store: NodeStore):
+    """Dictionary of PositionNode of a store."""
+    nodes = {}
+    counts = store.counts.tolist()
+    children = np.split(store.child_keys, store.child_ptr[1:-1])
+    for i, key in enumerate(store.hashes.tolist()):
+        node = PositionNode(key, b"", bool(store.last_move_hero[i]), "")
+        node.res_cnt.win, node.res_cnt.draw, node.res_cnt.lose = counts[i]
+        node.children = set(children[i].tolist())
+        nodes[key] = node
+    return nodes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=1000000)
+    args = parser.parse_args()
+    store = random_store(args.positions)
+    start = time.perf_counter()
+    ids = rank_positions(store, THRESH, K)
+    print(f"rank_positions {time.perf_counter() - start:8.3f}s")
+    nodes = to_nodes(store)
+    start = time.perf_counter()
+    keys = queue_ranking(nodes, THRESH, K)
+    print(f"queue walk     {time.perf_counter() - start:8.3f}s")
+    assert keys == store.hashes[ids].tolist()
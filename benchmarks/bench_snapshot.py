@@ -0,0 +1,39 @@
+"""Benchmark of loading a tree snapshot against building the tree.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_snapshot.py --copies 16
+"""
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+from src.explorer.game_tree import GameTree
+from src.explorer.pgn import PGN
+from src.preprocess.regextractor import RegExtractor
+
+CORPUS_PATH = "tests/units/data_examples/complete_pgn.txt"
+USERNAME = "marcov24"
+MAX_DEPTH = 14
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=16, help="Copies of the corpus.")
+    args = parser.parse_args()
+    with open(CORPUS_PATH, "r") as f:
+        games = RegExtractor.split(f.read()) * args.copies
+    pgns = [PGN.extract_from_txt(game, USERNAME) for game in games]
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / "tree"
+        start = time.perf_counter()
+        tree = GameTree.from_pgn_list(pgns, MAX_DEPTH).compact()
+        print(f"build {time.perf_counter() - start:8.3f}s ({len(pgns)} games)")
+        start = time.perf_counter()
+        tree.save(path)
+        print(
+            f"save  {time.perf_counter() - start:8.3f}s ({path.stat().st_size} bytes)"
+        )
+        start = time.perf_counter()
+        GameTree.load(path)
+        print(f"load  {time.perf_counter() - start:8.3f}s")
@@ -0,0 +1,49 @@
+"""Benchmark of tree building game by game or through a move trie.
+
+Games are replayed from their SAN moves or from the moves encoded at ingest.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_tree.py --copies 8 --depth 20
+"""
+import argparse
+import time
+
+from src.explorer.game_tree import GameTree
+from src.explorer.pgn import PGN
+from src.preprocess.regextractor import RegExtractor
+
+CORPUS_PATH = "tests/units/data_examples/complete_pgn.txt"
+USERNAME = "marcov24"
+
+
+def build(pgns, depth, trie):
+    """Build a tree from all games, return the elapsed time."""
+    tree = GameTree()
+    start = time.perf_counter()
+    if trie:
+        tree.add_pgns_to_tree(pgns, depth)
+    else:
+        for pgn in pgns:
+            tree.add_pgn_to_tree(pgn, depth)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=8, help="Copies of the corpus.")
+    parser.add_argument("--depth", type=int, default=20)
+    args = parser.parse_args()
+    with open(CORPUS_PATH, "r") as f:
+        games = RegExtractor.split(f.read()) * args.copies
+    encoded = [PGN.extract_from_txt(game, USERNAME) for game in games]
+    san = [PGN(*[getattr(p, s) for s in PGN.__slots__[:-1]]) for p in encoded]
+    print(f"{'build':>8} {'moves':>8} {'time (s)':>9} {'games/s':>9} {'speedup':>8}")
+    reference = None
+    for trie in [False, True]:
+        for name, pgns in [("san", san), ("encoded", encoded)]:
+            elapsed = build(pgns, args.depth, trie)
+            reference = reference or elapsed
+            print(
+                f"{'trie' if trie else 'games':>8} {name:>8} {elapsed:9.3f} "
+                f"{len(pgns) / elapsed:9.0f} {reference / elapsed:7.1f}x"
+            )
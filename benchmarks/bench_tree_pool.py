@@ -0,0 +1,67 @@
+"""Benchmark of tree building per request: a new pool each time or a TreePool.
+
+The former is how trees were built before TreePool: a new pool per request, dict
+trees pickled back to the caller and merged with a linear reduce. Latency and peak
+memory allocated in the calling process are reported per request.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_tree_pool.py --copies 16 --procs 4
+"""
+import argparse
+from functools import reduce
+from multiprocessing import Pool
+import time
+import tracemalloc
+
+from src.explorer.game_tree import GameTree
+from src.explorer.pgn import PGN, PGNBatch
+from src.explorer.tree_pool import TreePool
+from src.preprocess.regextractor import RegExtractor
+
+CORPUS_PATH = "tests/units/data_examples/complete_pgn.txt"
+USERNAME = "marcov24"
+MAX_DEPTH = 14
+
+
+def build_with_new_pool(batch, n_procs):
+    """Build a tree with a new pool, pickled trees and a linear reduce."""
+    with Pool(n_procs) as pool:
+        step = -(-len(batch) // n_procs)
+        chunks = [batch[i : i + step] for i in range(0, len(batch), step)]
+        trees = pool.starmap(GameTree.from_pgn_list, [(c, MAX_DEPTH) for c in chunks])
+    return reduce(lambda x, y: x + y, trees)
+
+
+def measure(build, n_requests):
+    """Mean latency and max peak memory of n_requests builds."""
+    latencies, peaks = [], []
+    for _ in range(n_requests):
+        tracemalloc.start()
+        start = time.perf_counter()
+        build()
+        latencies.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(latencies) / n_requests, max(peaks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=16, help="Copies of the corpus.")
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+    with open(CORPUS_PATH, "r") as f:
+        games = RegExtractor.split(f.read()) * args.copies
+    batch = PGNBatch.from_pgns(PGN.extract_from_txt(g, USERNAME) for g in games)
+    print(f"{len(batch)} games, {args.procs} processes")
+    print(f"{'build':>10} {'latency (s)':>12} {'peak (MB)':>10}")
+    latency, peak = measure(
+        lambda: build_with_new_pool(batch, args.procs), args.requests
+    )
+    print(f"{'new pool':>10} {latency:12.3f} {peak / 1e6:10.1f}")
+    with TreePool(args.procs) as tree_pool:
+        latency, peak = measure(
+            lambda: tree_pool.build(batch, MAX_DEPTH), args.requests
+        )
+    print(f"{'TreePool':>10} {latency:12.3f} {peak / 1e6:10.1f}")
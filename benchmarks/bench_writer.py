@@ -0,0 +1,70 @@
+"""Benchmark of the streaming BatchWriter against one pd.concat per game.
+
+Run from the root of the repo:
+    poetry run python benchmarks/bench_writer.py --sizes 1000 10000 50000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.explorer.pgn import PGN
+from src.preprocess.writer import COLUMNS, BatchWriter
+
+
+def make_pgns(n_games):
+    """Build n_games synthetic games."""
+    return [
+        PGN("white", "win", f"https://link/{i}", "e4 e5 Nf3 Nc6", "2023-04", "Open")
+        for i in range(n_games)
+    ]
+
+
+def concat_per_game(pgns, path):
+    """Previous implementation of Fetcher.download_history."""
+    pgn_df = pd.DataFrame(columns=COLUMNS)
+    for pgn in pgns:
+        row = {col: getattr(pgn, col) for col in COLUMNS}
+        pgn_df = pd.concat([pgn_df, pd.DataFrame(row, index=[0])])
+    pgn_df.to_csv(path, index=False)
+
+
+def batch_writer(pgns, path):
+    """Streaming implementation of Fetcher.download_history."""
+    with BatchWriter(path) as writer:
+        for pgn in pgns:
+            writer.write(pgn)
+
+
+def timed(func, *args):
+    """Return the wall time of func(*args) in seconds."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument(
+        "--max-concat",
+        type=int,
+        default=50000,
+        help="Skip the quadratic implementation above this number of games.",
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "player.arrow"
+        print(f"{'games':>8} {'concat (s)':>12} {'writer (s)':>12} {'speedup':>9}")
+        for n_games in args.sizes:
+            pgns = make_pgns(n_games)
+            writer_time = timed(batch_writer, pgns, path)
+            if n_games <= args.max_concat:
+                concat_time = timed(concat_per_game, pgns, path)
+                speedup = f"{concat_time / writer_time:8.1f}x"
+                concat_str = f"{concat_time:12.3f}"
+            else:
+                speedup, concat_str = f"{'-':>9}", f"{'-':>12}"
+            print(f"{n_games:>8} {concat_str} {writer_time:12.3f} {speedup}")
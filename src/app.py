@@ -1,27 +1,90 @@
 """Dash app with the Opening Explorer."""
-from typing import Dict, Tuple
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 
-from cairosvg import svg2png
-import chess
-import chess.svg
 import dash
-from dash import Dash, Input, Output, State, callback, dcc, html
+from dash import ClientsideFunction, Dash, Input, Output, State, callback, dcc, html
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-from plotly.graph_objects import Figure
-import pybase64
 
 from src import config
-from src.explorer.game_tree import load_tree_multiproc
+from src.explorer.game_tree import GameTree, load_tree_multiproc
 from src.explorer.game_tree import Result
+from src.explorer.boards import report_images
+from src.explorer.cache import ResultCache
+from src.explorer.jobs import JobQueue
+from src.explorer.pgn import int_to_month, month_to_int
+from src.explorer.snapshot import TreeSnapshot
+from src.explorer.tree_pool import TreePool
+from src.preprocess.game_store import GameStore
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.LUX])
 
-# Pre loading base board.
-BASE_BOARD = chess.Board()
-BASE_SVG = chess.svg.board(BASE_BOARD, size=500)
-BASE_IMG = pybase64.b64encode(svg2png(bytestring=BASE_SVG)).decode()
+# Worker processes building trees, started with the server and reused by every submit.
+TREE_POOL = TreePool(config.N_PROCS)
+# Background threads running the tree builds, so that callbacks return at once.
+JOBS = JobQueue()
+# Weakness reports of the last players, served without syncing nor ranking again.
+RESULTS = ResultCache()
+# Progress messages of the stages of a build.
+STAGES = {
+    "fetching": "Fetching month",
+    "parsing": "Parsing month",
+    "building": "Building tree, step",
+}
+
+# Base board, a static asset rendered once by chess.svg.board(chess.Board(), size=500).
+BASE_IMG = dash.get_asset_url("base_board.svg")
+# Empty bar chart of results, whose counts are updated by the browser. It is written as
+# the figure plotly express would make, so that neither plotly nor pandas are imported.
+BASE_FIGURE = {
+    "data": [
+        {
+            "type": "bar",
+            "orientation": "h",
+            "name": result,
+            "legendgroup": result,
+            "x": [0],
+            "y": [result],
+            "marker": {"color": color},
+            "hovertemplate": "Result=%{y}<br>Count=%{x}<extra></extra>",
+        }
+        for result, color in [
+            ("Win", "#636efa"),
+            ("Lose", "#EF553B"),
+            ("Draw", "#00cc96"),
+        ]
+    ],
+    "layout": {
+        "barmode": "relative",
+        "xaxis": {"title": {"text": "Count"}, "gridcolor": "white"},
+        "yaxis": {
+            "title": {"text": "Result"},
+            "categoryorder": "array",
+            "categoryarray": ["Draw", "Lose", "Win"],
+        },
+        "legend": {"title": {"text": "Result"}, "tracegroupgap": 0},
+        "margin": {"t": 60},
+        "font": {"color": "#2a3f5f"},
+        "plot_bgcolor": "#E5ECF6",
+    },
+}
+
+
+def period_marks(first_month: str) -> Dict[int, str]:
+    """Marks of the period slider from first_month, one per year on long periods."""
+    first, last = month_to_int(first_month), month_to_int(config.END_MONTH)
+    yearly = last - first > 24
+    return {
+        month: int_to_month(month)
+        for month in range(first, last + 1)
+        if not yearly or month % 12 == 0 or month == first
+    }
+
+
+def first_month(username: str) -> str:
+    """First month of the games of a player, imported games can be the oldest ones."""
+    return min([config.MINIMAL_MONTH] + GameStore(username).months()[:1])
+
 
 app.layout = html.Div(
     children=[
@@ -53,7 +116,9 @@ app.layout = html.Div(
                             children="Opening name",
                             style={"textAlign": "center"},
                         ),
-                        html.Img(id="board", style={"margin-bottom": "20px"}),
+                        html.Img(
+                            id="board", src=BASE_IMG, style={"margin-bottom": "20px"}
+                        ),
                         html.Div(
                             children=[
                                 # Input player username to search
@@ -75,6 +140,21 @@ app.layout = html.Div(
                             ],
                             style={"display": "flex"},
                         ),
+                        # Select the period of the games, without rebuilding the tree
+                        html.Div(
+                            dcc.RangeSlider(
+                                month_to_int(config.MINIMAL_MONTH),
+                                month_to_int(config.END_MONTH),
+                                1,
+                                value=[
+                                    month_to_int(config.START_MONTH),
+                                    month_to_int(config.END_MONTH),
+                                ],
+                                marks=period_marks(config.MINIMAL_MONTH),
+                                id="period",
+                            ),
+                            style={"width": "100%", "margin-top": "20px"},
+                        ),
                     ],
                     style={
                         "width": "50%",
@@ -85,133 +165,178 @@ app.layout = html.Div(
                     },
                 ),
                 # Position stats graph
-                dcc.Graph(id="results-graph"),
+                dcc.Graph(id="results-graph", figure=BASE_FIGURE),
             ],
             style={"display": "flex", "margin-bottom": "50px", "margin-top": "100px"},
         ),
-        dcc.Loading(id="loading", children=html.Div(id="loading-output")),
+        # Progress of the tree build, polled while it runs in the background
+        html.Div(id="loading-output", style={"textAlign": "center"}),
+        dcc.Interval(id="poll", interval=config.JOB_POLL_INTERVAL, disabled=True),
         # dcc.Store stores the intermediate value
-        dcc.Store(id="board-svg"),
+        dcc.Store(id="job"),
+        dcc.Store(id="base-board", data=BASE_IMG),
         dcc.Store(id="positions"),
     ]
 )
 
 
+def build_tree(username: str, progress: Callable[[str, int, int], None]) -> GameTree:
+    """Build the tree of all the history of a player, run by a background job."""
+    return load_tree_multiproc(
+        config.N_PROCS,
+        username,
+        config.MAX_DEPTH,
+        first_month(username),
+        config.END_MONTH,
+        pool=TREE_POOL,
+        progress=progress,
+    )
+
+
+def report_key(username: str, period: List[int]) -> Tuple:
+    """Key of the weakness report of a player in RESULTS, see ResultCache."""
+    return (
+        username,
+        tuple(period),
+        config.MAX_DEPTH,
+        config.N_GAMES_THRESHOLD,
+        config.N_POSITIONS,
+        config.RANKING_SCORE,
+        GameStore(username).version,
+    )
+
+
 @callback(
-    Output("positions", "data"),
-    Output("loading-output", "children"),
+    Output("job", "data"),
     Input("submit-val", "n_clicks"),
+    State("period", "value"),
     State("playername", "value"),
 )
-def on_click(_: int, value: str) -> Tuple[Dict[str, Result.T], str]:
+def on_click(_: int, period: List[int], value: str) -> Optional[Dict[str, str]]:
     """
-    Update the positions in the explorer when a new username is submited.
+    Submit the build of the tree of a player when a new username is submited.
+
+    A build already running for the same username is joined instead, and no build is
+    submitted if the report of the player is cached.
 
         Parameters:
+            period (List[int]) : First and last months of the games, as numbers.
             value (str) : Username for which we explore opening.
 
         Returns:
-            positions : Dictionnary with positions to explore.
-            loading (str) : Empty string for the loading component.
+            job (Optional[Dict[str, str]]) : Username and id of the job building the
+                tree, None if the report is cached.
     """
     if value is None:
-        return None, ""
-    game_tree = load_tree_multiproc(
-        config.N_PROCS, value, config.MAX_DEPTH, config.START_MONTH, config.END_MONTH
-    )
-    positions = game_tree.get_worse_k_positions(
-        config.N_GAMES_THRESHOLD, config.N_POSITIONS
-    )
-    return {
-        "w": positions["w"].to_tuples(),
-        "b": positions["b"].to_tuples(),
-    }, ""
+        return None
+    if RESULTS.get(report_key(value, period)) is not None:
+        return {"username": value, "id": None}
+    job = JOBS.submit(value, partial(build_tree, value))
+    return {"username": value, "id": job.job_id}
 
 
 @callback(
-    Output("board-svg", "data"),
-    Output("opening", "children"),
-    [
-        Input("position-index", "value"),
-        Input("positions", "data"),
-        Input("color", "value"),
-    ],
+    Output("period", "min"),
+    Output("period", "marks"),
+    Input("job", "data"),
 )
-def load_board(
-    index: str, positions: Dict[str, Result.T], color: str
-) -> Tuple[str, str]:
-    """
-    Load the board svg in Store and returns opening name to be displayed.
+def update_period(job: Optional[Dict[str, str]]) -> Tuple[int, Dict[int, str]]:
+    """Extend the period slider to the first month stored for the player."""
+    month = config.MINIMAL_MONTH if job is None else first_month(job["username"])
+    return month_to_int(month), period_marks(month)
 
-        Parameters:
-            index (str) : The index for the position selected.
-            positions (Dict[str, Result.T]) : Dictionnary with positions to explore.
-            color (str) : Selected color.
 
-        Returns:
-            svg (str) : SVG image of the board.
-            opening (str) : Opening name.
-    """
-    if positions is None or index is None:
-        return f"data:image/png;base64,{BASE_IMG}", "Opening Name"
-    colored_position = positions["w"] if color == "White" else positions["b"]
-    fen, _, _, _, opening = colored_position[int(index)]
-    board = chess.Board(fen)
-    if color == "Black":
-        board = board.transform(chess.flip_vertical).transform(chess.flip_horizontal)
-    svg = chess.svg.board(board, size=500)
-    img = pybase64.b64encode(svg2png(bytestring=svg)).decode()
-    return f"data:image/png;base64,{img}", opening
-
-
-@callback(Output("board", "src"), Input("board-svg", "data"))
-def update_img(src_img: str) -> str:
+@callback(
+    Output("positions", "data"),
+    Output("loading-output", "children"),
+    Output("poll", "disabled"),
+    Input("job", "data"),
+    Input("poll", "n_intervals"),
+    Input("period", "value"),
+)
+def poll_job(
+    job: Optional[Dict[str, str]], _: int, period: List[int]
+) -> Tuple[Dict[str, Result.T], str, bool]:
     """
-    Update the svg inside the Img component.
+    Poll the job building the tree and update the positions once it is done.
+
+    The tree holds all the history of the player, so that a new period only reads its
+    results per month. Reports are cached until the store of the player changes.
 
         Parameters:
-            src_img (str) : SVG image of the board.
+            job (Optional[Dict[str, str]]) : Username and id of the job building the
+                tree.
+            period (List[int]) : First and last months of the games, as numbers.
 
         Returns:
-            src_img (str) : SVG image of the board.
+            positions : Dictionnary with positions to explore.
+            loading (str) : Progress of the job, empty once it is done.
+            disabled (bool) : False while the job must be polled.
     """
-    return src_img
+    if job is None:
+        return None, "", True
+    running = JOBS.get(job["id"]) if job["id"] is not None else None
+    if running is not None:
+        status = running.status()
+        if status["state"] == "running":
+            progress = "Starting"
+            if status["stage"] in STAGES:
+                stage = STAGES[status["stage"]]
+                progress = f"{stage} {status['done']}/{status['total']}"
+            return dash.no_update, progress, False
+        if status["state"] == "failed":
+            return None, f"Failed: {status['error']}", True
+        # The tree is only held until it is ranked, repeats are served by RESULTS and
+        # the snapshot of the tree.
+        JOBS.pop(running.job_id)
+    key = report_key(job["username"], period)
+    report = RESULTS.get(key)
+    if report is None:
+        if running is not None:
+            game_tree = running.result()
+        else:
+            # The job was dropped, the tree saved by the build is reused.
+            snapshot = TreeSnapshot(job["username"], config.MAX_DEPTH)
+            game_tree = snapshot.load(first_month(job["username"]))
+            if game_tree is None:
+                return None, "", True
+        positions = game_tree.get_worse_k_positions(
+            config.N_GAMES_THRESHOLD,
+            config.N_POSITIONS,
+            int_to_month(period[0]),
+            int_to_month(period[1]),
+        )
+        report = {
+            "w": positions["w"].to_tuples(),
+            "b": positions["b"].to_tuples(),
+        }
+        RESULTS.put(key, report)
+    # Boards are sent with the report, so that the browser can flip through them on
+    # its own. They are kept in the cache of rendered boards, not in RESULTS.
+    return dict(report, images=report_images(report)), "", True
 
 
-@callback(
-    Output("results-graph", "figure"),
-    [
-        Input("position-index", "value"),
-        Input("positions", "data"),
-        Input("color", "value"),
-    ],
+# Browsing the positions of a report runs in the browser, see assets/explorer.js.
+app.clientside_callback(
+    ClientsideFunction(namespace="explorer", function_name="load_board"),
+    Output("board", "src"),
+    Output("opening", "children"),
+    Input("position-index", "value"),
+    Input("positions", "data"),
+    Input("color", "value"),
+    State("base-board", "data"),
 )
-def update_bar_chart(index: str, positions: Dict[str, Result.T], color: str) -> Figure:
-    """
-    Update the bar chart with position's statistics.
 
-        Parameters:
-            index (str) : The index for the position selected.
-            positions (Dict[str, Result.T]) : Dictionnary with positions to explore.
-            color (str) : Selected color.
-
-        Returns:
-            fig (Figure) : Bar chart with position's statistics.
-    """
-    win, lose, draw = 0, 0, 0
-    if positions is not None and index is not None:
-        colored_pos = positions["w"] if color == "White" else positions["b"]
-        current_pos = colored_pos[int(index)]
-        _, win, lose, draw, _ = current_pos
-    result_df = pd.DataFrame(
-        {
-            "Result": ["Win", "Lose", "Draw"],
-            "Count": [win, lose, draw],
-        }
-    )
-    fig = px.bar(result_df, x="Count", y="Result", color="Result")
-    return fig
+app.clientside_callback(
+    ClientsideFunction(namespace="explorer", function_name="update_bar_chart"),
+    Output("results-graph", "figure"),
+    Input("position-index", "value"),
+    Input("positions", "data"),
+    Input("color", "value"),
+    State("results-graph", "figure"),
+)
 
 
 if __name__ == "__main__":
+    TREE_POOL.start()
     app.run_server(debug=True)
@@ -0,0 +1,55 @@
+/*
+ * Clientside callbacks of the Opening Explorer.
+ *
+ * Browsing the positions of a report only reads the positions Store, which holds the
+ * results of each position and its rendered board, so it needs no server round-trip.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    explorer: {
+        /*
+         * Position selected in the positions Store, undefined if there is none.
+         */
+        selected: function (index, positions, color) {
+            if (!positions || index === null || index === undefined) {
+                return undefined;
+            }
+            const key = color === "White" ? "w" : "b";
+            const i = parseInt(index, 10);
+            if (i >= positions[key].length) {
+                return undefined;
+            }
+            return {position: positions[key][i], image: positions.images[key][i]};
+        },
+
+        /*
+         * Board image and opening name of the selected position.
+         */
+        load_board: function (index, positions, color, base_img) {
+            const selected = window.dash_clientside.explorer.selected(
+                index, positions, color
+            );
+            if (selected === undefined) {
+                return [base_img, "Opening Name"];
+            }
+            return [selected.image, selected.position[4]];
+        },
+
+        /*
+         * Bar chart of the results of the selected position, the figure rendered by
+         * the server at startup being reused with new counts.
+         */
+        update_bar_chart: function (index, positions, color, figure) {
+            const selected = window.dash_clientside.explorer.selected(
+                index, positions, color
+            );
+            // Positions are (fen, win, lose, draw, opening), traces Win, Lose, Draw.
+            const counts =
+                selected === undefined ? [0, 0, 0] : selected.position.slice(1, 4);
+            return Object.assign({}, figure, {
+                data: figure.data.map(function (trace, i) {
+                    return Object.assign({}, trace, {x: [counts[i]]});
+                }),
+            });
+        },
+    },
+});
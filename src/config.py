@@ -8,3 +8,29 @@ N_POSITIONS = 10
 N_PROCS = 4
 MAX_DEPTH = 14
 N_GAMES_THRESHOLD = 3
+N_FETCH_WORKERS = 8
+WRITER_BATCH_SIZE = 5000
+ARCHIVE_RAW_PGN = True
+REQUEST_RATE = 10.0
+REQUEST_BURST = 8
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+N_PARSE_PROCS = 4
+GAMES_PER_CHUNK = 250
+IMPORT_CHUNK_BYTES = 16 << 20
+IMPORT_BUFFER_GAMES = 200000
+ENCODED_PLIES = 30
+N_EXAMPLE_GAMES = None
+TREE_SNAPSHOTS = True
+RANKING_SCORE = "win_rate"
+WILSON_Z = 1.96
+JOB_WORKERS = 2
+JOB_HISTORY = 32
+JOB_POLL_INTERVAL = 500
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 600.0
+BOARD_SIZE = 500
+BOARD_CACHE_SIZE = 512
+BOARD_FORMAT = "png"
+POOL_START_METHOD = "forkserver"
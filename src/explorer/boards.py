@@ -0,0 +1,78 @@
+"""Rendering of the positions of the explorer into images displayed by the app."""
+
+from functools import lru_cache
+from typing import Dict, List
+
+import chess
+import chess.svg
+import pybase64
+
+from src.config import BOARD_CACHE_SIZE, BOARD_FORMAT, BOARD_SIZE
+
+
+def board_image(
+    fen: str,
+    orientation: chess.Color = chess.WHITE,
+    size: int = BOARD_SIZE,
+    image_format: str = BOARD_FORMAT,
+) -> str:
+    """
+    Image of a position as a data URL, rendered once per position in an LRU cache.
+
+        Parameters:
+            fen (str) : FEN of the position.
+            orientation (chess.Color) : Color at the bottom of the board.
+            size (int) : Size of the image in pixels.
+            image_format (str) : "png", or "svg" to skip rasterising the board.
+
+        Returns:
+            src (str) : Data URL of the image, for the src of an Img component.
+    """
+    # Arguments are passed in the same way for all calls to share cache entries.
+    return _render_board(fen, orientation, size, image_format)
+
+
+@lru_cache(maxsize=BOARD_CACHE_SIZE)
+def _render_board(
+    fen: str, orientation: chess.Color, size: int, image_format: str
+) -> str:
+    """Render a position, see board_image."""
+    board = chess.Board(fen)
+    if orientation == chess.BLACK:
+        board = board.transform(chess.flip_vertical).transform(chess.flip_horizontal)
+    svg = chess.svg.board(board, size=size)
+    if image_format == "svg":
+        data, mime = svg.encode(), "svg+xml"
+    else:
+        # Rasterising needs the cairo library, which sending SVG does without.
+        from cairosvg import svg2png
+
+        data, mime = svg2png(bytestring=svg), "png"
+    return f"data:image/{mime};base64,{pybase64.b64encode(data).decode()}"
+
+
+def report_images(
+    positions: Dict[str, List[tuple]],
+    size: int = BOARD_SIZE,
+    image_format: str = BOARD_FORMAT,
+) -> Dict[str, List[str]]:
+    """
+    Images of the positions of a report, as displayed by the app.
+
+        Parameters:
+            positions (Dict[str, List[tuple]]) : Positions of white ("w") and black
+                ("b") as stored by the app, see Result.to_tuples.
+            size (int) : Size of the images in pixels.
+            image_format (str) : "png" or "svg".
+
+        Returns:
+            images (Dict[str, List[str]]) : Data URL of the image of each position,
+                the boards of black being flipped.
+    """
+    return {
+        key: [
+            board_image(position[0], orientation, size, image_format)
+            for position in positions[key]
+        ]
+        for key, orientation in [("w", chess.WHITE), ("b", chess.BLACK)]
+    }
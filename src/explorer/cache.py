@@ -0,0 +1,87 @@
+"""ResultCache class which keeps the last results computed by the app in memory."""
+
+from __future__ import annotations
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Hashable, Tuple
+
+from src.config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+
+
+class ResultCache:
+    """
+    ResultCache class which keeps the last results computed by the app in memory.
+
+    It is a thread-safe LRU cache whose entries also expire ttl seconds after they were
+    stored. Keys are meant to hold everything a result depends on, including the
+    version of the data it was computed from, so that a result is never served once its
+    data changed; the entries of older versions are then evicted as least recently used.
+
+    Attributes
+    ----------
+    max_entries (int) : Maximum number of results kept.
+    ttl (float) : Number of seconds a result is served after it was stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_SIZE,
+        ttl: float = RESULT_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Construct an empty cache.
+
+        Parameters
+        ----------
+            max_entries : int
+                Maximum number of results kept.
+            ttl : float
+                Number of seconds a result is served after it was stored.
+            clock : Callable[[], float]
+                Monotonic clock in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of results kept, expired ones included until they are evicted."""
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Result of a key, marked as the most recently used.
+
+            Parameters:
+                key (Hashable) : Key of the result.
+                default (Any) : Value returned if there is no result or it expired.
+
+            Returns:
+                result (Any) : Result of the key, else default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if self._clock() >= entry[0]:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, result: Any):
+        """Store the result of a key, evicting the least recently used results."""
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all the results."""
+        with self._lock:
+            self._entries.clear()
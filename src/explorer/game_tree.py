@@ -1,16 +1,34 @@
 """GameTree class which holds count of number of wins,draws,losses per position."""
 
 from __future__ import annotations
-import queue
-from functools import reduce
-from typing import List, Tuple, Dict, TypeVar
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Dict,
+    TypeVar,
+    Union,
+)
 
 
 import chess
+import chess.polyglot
+import numpy as np
 
-from src.explorer.pgn import PGN
-from src.explorer.player import Player
-from src.explorer.position_node import PositionNode
+from src.config import N_EXAMPLE_GAMES, RANKING_SCORE, TREE_SNAPSHOTS
+from src.explorer.move_trie import MoveTrie, TrieNode
+from src.explorer.moves import MOVE_DTYPE, decode_game, decode_move, encode_move
+from src.explorer.node_store import NodeStore
+from src.explorer.pgn import PGN, PGNBatch, month_to_int
+from src.explorer.position_node import PositionNode, merge_games
+from src.explorer.ranking import Score, rank_positions
+
+if TYPE_CHECKING:
+    from src.explorer.tree_pool import TreePool
 
 
 class GameTree:
@@ -18,30 +36,50 @@ class GameTree:
 
     Contains two dictionaries, one for which the analysed player (which will be called
     Hero from now on) has white pieces and the other black pieces.
-    Dictionary's keys are unique positions which corresponds to:
-        1.the positions of pieces on the board
-        2.which player played the last move.
+    Dictionary's keys are the 64 bits Zobrist hashes of unique positions, which cover
+    the positions of pieces on the board and which player played the last move, but not
+    the move counters, so that transpositions share a single node.
     Dictionary's values corresponds to instances of PositionNode which encapsulate
-    information for the given unique position (opening name,result count and link
-    to games).
+    information for the given unique position (opening name,result count and ids of
+    games, which are indices in a single table of links). Once built, a tree can be
+    compacted into NodeStore instances which are read the same way but hold the
+    positions in arrays, and, when the ids of all games are kept, their results per
+    month, so that the tree of all the history answers for any period.
     ...
 
     Attributes
     ----------
-    white (Dict[Tuple[str,bool],PositionNode]) : Position dictionary for white.
-    black (Dict[Tuple[str,bool],PositionNode])  : Position dictionary for black.
+    white (Union[Dict[int,PositionNode],NodeStore]) : Position dictionary for white.
+    black (Union[Dict[int,PositionNode],NodeStore])  : Position dictionary for black.
+    games (List[str]) : Link to each game added, indexed by game id.
+    game_months (List[int]) : Month of each game as a number of months, by game id.
+    game_results (List[int]) : Outcome of each game, by game id.
+    n_examples (Optional[int]) : Maximum number of game ids kept per position.
     """
 
-    def __init__(self):
-        """Construct an empty GameTree."""
+    def __init__(self, n_examples: Optional[int] = N_EXAMPLE_GAMES):
+        """Construct an empty GameTree.
+
+        Parameters
+        ----------
+            n_examples : Optional[int]
+                Maximum number of game ids kept per position, sampled uniformly among
+                its games. None keeps the ids of all games.
+        """
         self.white = {}
         self.black = {}
+        self.games = []
+        self.game_months = []
+        self.game_results = []
+        self.n_examples = n_examples
 
     def __add__(self, other: GameTree) -> GameTree:
         """Add operator for GameTree.
 
         For each node_id in other trees, if the node_id is also in the similar tree of
-        self, nodes are added, else the node is added to self tree.
+        self, nodes are added, else the node is added to self tree. Game ids of other
+        are shifted after the ones of self. If one of the trees is compact, both are
+        compacted and merged with vectorised operations.
 
         Parameters
         ----------
@@ -51,28 +89,120 @@ class GameTree:
         Returns:
             self (GameTree) : Updated GameTree.
         """
+        offset = len(self.games)
+        self.games += other.games
+        self.game_months += other.game_months
+        self.game_results += other.game_results
+        if isinstance(self.white, NodeStore) or isinstance(other.white, NodeStore):
+            self.compact()
+            other.compact()
+            self.white = self.white.merge(other.white, offset, self.n_examples)
+            self.black = self.black.merge(other.black, offset, self.n_examples)
+            return self
+
         for node_id, position in other.white.items():
+            position.game_ids = [i + offset for i in position.game_ids]
             if node_id in self.white.keys():
-                self.white[node_id] += position
+                self.white[node_id].merge(position, self.n_examples)
             else:
                 self.white[node_id] = position
 
         for node_id, position in other.black.items():
+            position.game_ids = [i + offset for i in position.game_ids]
             if node_id in self.black.keys():
-                self.black[node_id] += position
+                self.black[node_id].merge(position, self.n_examples)
             else:
                 self.black[node_id] = position
 
         return self
 
+    def node_links(self, node: PositionNode) -> List[str]:
+        """Links to the games of a position node, see PositionNode.game_ids."""
+        return [self.games[i] for i in node.game_ids]
+
+    def compact(self) -> GameTree:
+        """Convert the position dictionaries into NodeStore instances.
+
+        Returns:
+            self (GameTree) : Updated GameTree.
+        """
+        # Results per month are counted from the game ids, all of them are needed.
+        months, results = None, None
+        if self.n_examples is None:
+            months = np.array(self.game_months, dtype=np.int32)
+            results = np.array(self.game_results, dtype=np.int8)
+        if not isinstance(self.white, NodeStore):
+            self.white = NodeStore.from_nodes(self.white, months, results)
+        if not isinstance(self.black, NodeStore):
+            self.black = NodeStore.from_nodes(self.black, months, results)
+        return self
+
+    def period(self, start_month: str, end_month: str) -> GameTree:
+        """Tree of the games of a period, read from the results per month.
+
+        The tree is compacted if needed. Positions keep the ones of the whole tree, those
+        without games in the period having null counts.
+
+        Parameters
+        ----------
+            start_month : str
+                Start month in format YYYY-MM (eg: 2023-01).
+            end_month : str
+                End month in format YYYY-MM (eg: 2023-01).
+
+        Returns:
+            tree (GameTree) : Compact tree sharing the arrays of self.
+        """
+        self.compact()
+        start, end = month_to_int(start_month), month_to_int(end_month)
+        months = np.array(self.game_months, dtype=np.int32)
+        tree = GameTree(self.n_examples)
+        tree.games = self.games
+        tree.game_months = self.game_months
+        tree.game_results = self.game_results
+        tree.white = self.white.period(start, end, months)
+        tree.black = self.black.period(start, end, months)
+        return tree
+
+    def save(self, path: str, **meta):
+        """Save the tree to a snapshot file, see snapshot.write_snapshot.
+
+        Parameters
+        ----------
+            path : str
+                Path of the snapshot file.
+            meta
+                Information saved with the tree, returned by load.
+        """
+        from src.explorer.snapshot import write_snapshot
+
+        write_snapshot(self, Path(path), **meta)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[Tuple[GameTree, Dict]]:
+        """Load a tree from a snapshot file, see snapshot.read_snapshot.
+
+        Parameters
+        ----------
+            path : str
+                Path of the snapshot file.
+
+        Returns:
+            out (Optional[Tuple[GameTree, Dict]]) : Memory-mapped tree and its meta,
+                None if there is no snapshot in the current format.
+        """
+        from src.explorer.snapshot import read_snapshot
+
+        return read_snapshot(Path(path))
+
     @classmethod
-    def from_pgn_list(cls, pgn_list: List[PGN], max_depth: int) -> GameTree:
+    def from_pgn_list(cls, pgn_list: Iterable[PGN], max_depth: int) -> GameTree:
         """Instantiate a GameTree instance from a PGN list.
 
         Parameters
         ----------
-            pgn_list : List[PGN]
-                A list containing all the PGNs of Hero from csv.
+            pgn_list : Iterable[PGN]
+                A list (or PGNBatch) containing all the PGNs of Hero from csv.
             max_depth : int
                 Maximum number of moves in the game used to build tree.
 
@@ -80,8 +210,7 @@ class GameTree:
             tree (GameTree) : GameTree from loaded PGNs.
         """
         tree = cls()
-        for pgn in pgn_list:
-            tree.add_pgn_to_tree(pgn, max_depth)
+        tree.add_pgns_to_tree(pgn_list, max_depth)
         return tree
 
     def load_tree(
@@ -91,6 +220,7 @@ class GameTree:
         start_month: str,
         end_month: str,
         csv_path: str = None,
+        sync: bool = True,
     ):
         """Load a tree from a username and a time period or a csv.
 
@@ -106,13 +236,120 @@ class GameTree:
                 End month in format YYYY-MM (eg: 2023-01).
             csv_path : str
                 Path to a csv file from which the player history is loaded in priority.
+            sync : bool
+                Sync the store with Chess.com, else only read the games stored.
 
         """
-        # pylint: disable=line-too-long
+        # pylint: disable=line-too-long,too-many-arguments
+        # Player imports the fetcher and its HTTP stack, only needed to load games.
+        from src.explorer.player import Player
+
         player = Player(username)
-        player.load_player_history(start_month, end_month, csv_path)
-        for pgn in player.pgn_list:
-            self.add_pgn_to_tree(pgn, max_depth)
+        player.load_player_history(start_month, end_month, csv_path, sync=sync)
+        self.add_pgns_to_tree(player.pgn_list, max_depth)
+
+    def add_pgns_to_tree(self, pgn_list: Iterable[PGN], max_depth: int):
+        """Increment result all nodes of unique positions found in the games.
+
+        Games are first gathered in a MoveTrie, then the trie is walked once so that
+        each distinct sequence of moves is played on a board a single time. The tree
+        obtained is the same as with add_pgn_to_tree called on every game.
+
+        Parameters
+        ----------
+            pgn_list : Iterable[PGN]
+                PGN instances of Hero.
+            max_depth : int
+                Maximum number of moves in the game used to build tree.
+        """
+        trie = MoveTrie()
+        for pgn in pgn_list:
+            trie.insert(pgn, max_depth, len(self.games))
+            self.games.append(pgn.link)
+            self.game_months.append(pgn.month_id)
+            self.game_results.append(int(pgn.result_id))
+        for tree, root, color in [
+            (self.white, trie.white, "white"),
+            (self.black, trie.black, "black"),
+        ]:
+            board = chess.Board()
+            key = chess.polyglot.zobrist_hash(board)
+            self._add_trie_node(tree, root, board, key, color == "black", [], set())
+
+    def _add_trie_node(
+        self,
+        tree: Dict[int, PositionNode],
+        trie_node: TrieNode,
+        board: chess.Board,
+        node_id: int,
+        last_move_hero: bool,
+        path: List[int],
+        ancestors: set,
+    ):
+        """Add the position of a trie node and of its descendants to a tree.
+
+        Parameters
+        ----------
+            tree : Dict[int, PositionNode]
+                Position dictionary of the color of the trie.
+            trie_node : TrieNode
+                Games which reached the position, which is on board.
+            board : chess.Board
+                Board in the position, restored before returning.
+            node_id : int
+                Zobrist hash of the position.
+            last_move_hero : bool
+                Boolean set to True if Hero played the last move.
+            path : List[int]
+                Packed moves leading to the position.
+            ancestors : set
+                Positions met earlier on path, already counted for these games.
+        """
+        # pylint: disable=too-many-arguments
+        # Positions after the last move of the games are only children.
+        if not trie_node.children:
+            return
+        if node_id not in tree:
+            tree[node_id] = PositionNode(
+                node_id,
+                np.array(path, dtype=MOVE_DTYPE).tobytes(),
+                last_move_hero,
+                trie_node.opening,
+            )
+        node = tree[node_id]
+        # A position repeated in a game only counts once for that game.
+        counted = node_id not in ancestors
+        if counted:
+            node.game_ids = merge_games(
+                node.game_ids,
+                node.n_games(),
+                trie_node.game_ids,
+                len(trie_node.game_ids),
+                self.n_examples,
+            )
+            node.res_cnt += trie_node.res_cnt
+            ancestors.add(node_id)
+        for token, child in trie_node.children.items():
+            try:
+                if isinstance(token, int):
+                    board.push(decode_move(token))
+                else:
+                    board.push_san(token)
+            except ValueError as err:
+                link = self.games[trie_node.game_ids[0]]
+                raise ValueError(
+                    f"Illegal move {token!r} at ply {len(path)} of {link}"
+                ) from err
+            path.append(encode_move(board.peek()))
+            child_id = chess.polyglot.zobrist_hash(board)
+            node.children.add(child_id)
+            self._add_trie_node(
+                tree, child, board, child_id, not last_move_hero, path, ancestors
+            )
+            path.pop()
+            board.pop()
+        if counted:
+            ancestors.remove(node_id)
 
     def add_pgn_to_tree(self, pgn: PGN, max_depth: int):
         """Increment result all nodes of unique positions found in the game.
@@ -130,45 +367,70 @@ class GameTree:
         tree = self.white if pgn.color == "white" else self.black
         # Spliting game string to get a list of individual moves.
         game = pgn.game.split(" ")
+        game_id = len(self.games)
+        self.games.append(pgn.link)
+        self.game_months.append(pgn.month_id)
+        self.game_results.append(int(pgn.result_id))
+        # Moves resolved at ingest are replayed without parsing their SAN.
+        moves = decode_game(pgn.moves) if pgn.moves is not None else []
         # If hero has white pieces, we consider that his opponent played the last move for init.
         last_move_hero = pgn.color == "black"
         # Number of moves played.
         depth = 0
         # Initial chess board.
         board = chess.Board()
+        node_id = chess.polyglot.zobrist_hash(board)
+        # Packed moves played so far, kept by new nodes to compute their FEN lazily.
+        path = []
         visited = set()
         # Iterating through unique positions encountered in the game to increment their counters.
         while depth <= max_depth and depth < len(game):
             move = game[depth]
-            fen = board.fen()
-            node_id = (fen, last_move_hero)
-            if node_id not in tree.keys():
-                node = PositionNode(fen, last_move_hero, pgn.opening)
+            if node_id not in tree:
+                node = PositionNode(
+                    node_id,
+                    np.array(path, dtype=MOVE_DTYPE).tobytes(),
+                    last_move_hero,
+                    pgn.opening,
+                )
                 tree[node_id] = node
             else:
                 node = tree[node_id]
             if node_id not in visited:
                 node.increment_count(pgn.result)
-                node.links.append(pgn.link)
+                node.add_game(game_id, self.n_examples)
                 visited.add(node_id)
             try:
-                board.push_san(move)
-            except:
-                raise ValueError(f"{depth},{move},{pgn.game,board.fen(),pgn.link}")
+                if depth < len(moves):
+                    board.push(moves[depth])
+                else:
+                    board.push_san(move)
+            except ValueError as err:
+                raise ValueError(
+                    f"Illegal move {move!r} at ply {depth} of {pgn.link}"
+                ) from err
+            path.append(encode_move(board.peek()))
             # Inverting the variable : if hero just played, he made the last move.
             last_move_hero = not last_move_hero
-            next_id = (board.fen(), last_move_hero)
-            node.children.add(next_id)
+            node_id = chess.polyglot.zobrist_hash(board)
+            node.children.add(node_id)
             depth += 1
 
     def get_worse_k_positions_from_tree(
-        self, tree: GameTree, color: str, thresh: int, k: int
+        self,
+        tree: Union[Dict[int, PositionNode], NodeStore],
+        color: str,
+        thresh: int,
+        k: int,
+        score: Union[str, Score] = RANKING_SCORE,
     ) -> Result:
-        """Extract from the tree the worst k positions with respect to win rate.
+        """Extract from the tree the worst k positions with respect to a score.
+
+        Positions are ranked by the ranking module, see rank_positions.
 
         Parameters
         ----------
-            tree : GameTree
+            tree : Union[Dict[int, PositionNode], NodeStore]
                 Tree with all positions node with incremented counters.
             color : str
                 Color of hero's pieces.
@@ -176,43 +438,26 @@ class GameTree:
                 Minimal number of games at a given node to be considered in the final solution.
             k: int
                 Number of positions to extract.
+            score : Union[str, Score]
+                Score of the positions, or its name in ranking.SCORES.
 
         Returns:
             out (Result) : All the positions to be analyzed for this tree.
         """
-        # pylint: disable=line-too-long
-        board = chess.Board()
-        last_move_hero = color == "black"
-        node_id = (board.fen(), last_move_hero)
-        # Position queue for tree traversal.
-        pos_q = queue.Queue()
-        # Priority Queue where the positions with minimal win rates will be on top.
-        output_q = queue.PriorityQueue()
-        visited = set()
-        pos_q.put(node_id)
-        visited.add(node_id)
-        # Traversing the game tree to add positions node to priority queue with win rate as priority value.
-        while not pos_q.empty():
-            node_id = pos_q.get()
-            pos_node = tree[node_id]
-            if (not pos_node.last_move_hero) and (node_id not in visited):
-                output_q.put((pos_node.win_rate(), node_id))
-            for child_id in pos_node.children:
-                if child_id in tree.keys():
-                    child = tree[child_id]
-                    # Stopping exploration once we reach a position with a number of games below threshold.
-                    if child_id not in visited and child.n_games() >= thresh:
-                        pos_q.put(child_id)
-            visited.add(node_id)
-
-        out, i = [], 0
-        # Unpacking priority queue to get top k elements (with worst win rates).
-        while not output_q.empty() and i < k:
-            _, node_id = output_q.get()
-            out.append(tree[node_id])
-        return Result(out)
-
-    def get_worse_k_positions(self, thresh: int, k: int):
+        # pylint: disable=line-too-long,unused-argument,too-many-arguments
+        if not isinstance(tree, NodeStore):
+            tree = NodeStore.from_nodes(tree)
+        ids = rank_positions(tree, thresh, k, score)
+        return Result([tree.node(i) for i in ids.tolist()])
+
+    def get_worse_k_positions(
+        self,
+        thresh: int,
+        k: int,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None,
+        score: Union[str, Score] = RANKING_SCORE,
+    ):
         """Get worse k positions for white and black trees.
 
         Parameters
@@ -221,14 +466,28 @@ class GameTree:
                 Minimal number of games at a given node to be considered in the final solution.
             k: int
                 Number of positions to extract.
+            start_month : Optional[str]
+                If given with end_month, only the games of the period are considered,
+                see period.
+            end_month : Optional[str]
+                End month in format YYYY-MM (eg: 2023-01).
+            score : Union[str, Score]
+                Score of the positions, or its name in ranking.SCORES.
 
         Returns:
-            out (Dict[str:Result]) : Worst k positions in terms of win rate of white and black tree in a dict.
+            out (Dict[str:Result]) : Worst k positions in terms of score of white and black tree in a dict.
         """
-        # pylint: disable=line-too-long
+        # pylint: disable=line-too-long,too-many-arguments
+        if start_month is not None and end_month is not None:
+            tree = self.period(start_month, end_month)
+            return tree.get_worse_k_positions(thresh, k, score=score)
         return {
-            "w": self.get_worse_k_positions_from_tree(self.white, "white", thresh, k),
-            "b": self.get_worse_k_positions_from_tree(self.black, "black", thresh, k),
+            "w": self.get_worse_k_positions_from_tree(
+                self.white, "white", thresh, k, score
+            ),
+            "b": self.get_worse_k_positions_from_tree(
+                self.black, "black", thresh, k, score
+            ),
         }
 
 
@@ -239,17 +498,22 @@ def load_tree_multiproc(
     start_month: str,
     end_month: str,
     csv_path: str = None,
+    pool: TreePool = None,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+    sync: bool = True,
 ):
     """Multiprocessing version of the load_tree method.
 
     Leverages the fact that we can parallelize the tree building and then due to the
     type of operations performed, it is possible to apply a reduce method to get our
-    final output.
+    final output. Trees are built and merged by a TreePool, see its documentation.
+    Unless the history is loaded from a csv, the tree is kept in a TreeSnapshot so that
+    only the games added to the store since the last call are built.
 
     Parameters
     ----------
         n_procs : int
-            Number of processors to be used.
+            Number of processors to be used, when no pool is given.
         username : str
             Username of Hero.
         max_depth : int
@@ -260,26 +524,42 @@ def load_tree_multiproc(
             End month in format YYYY-MM (eg: 2023-01).
         csv_path : str
             Path to a csv file from which the player history is loaded in priority.
+        pool : TreePool
+            Long-lived pool to build the tree with, else a pool is started and stopped.
+        progress : Optional[Callable[[str, int, int], None]]
+            Called with a stage ("fetching", "parsing" or "building"), the number of
+            steps of the stage done and its number of steps.
+        sync : bool
+            Sync the store with Chess.com, else only build the games already stored,
+            eg: imported from local databases. See Player.load_store.
 
     Returns:
         out (GameTree):  An initiated GameTree with Hero's games.
     """
     # pylint: disable=too-many-arguments
-    from multiprocessing import Pool
-
-    pool = Pool(n_procs)
-    player = Player(username)
-    player.load_player_history(start_month, end_month, csv_path)
-    chunk_size = len(player.pgn_list) // n_procs
-    pgn_chunks = [
-        player.pgn_list[i : i + chunk_size]
-        for i in range(0, len(player.pgn_list), chunk_size)
-    ]
-    trees = pool.starmap(
-        GameTree.from_pgn_list, zip(pgn_chunks, [max_depth] * n_procs)
-    )
-    out = reduce(lambda x, y: x + y, trees)
-    return out
+    from src.explorer.snapshot import TreeSnapshot
+    from src.explorer.player import Player
+    from src.explorer.tree_pool import TreePool
+
+    own_pool = pool is None
+    if own_pool:
+        pool = TreePool(n_procs)
+
+    def build(pgn_list: Iterable[PGN]) -> GameTree:
+        # Columnar chunks are much lighter to send to the workers than PGN lists.
+        return pool.build(PGNBatch.from_pgns(pgn_list), max_depth, progress)
+
+    try:
+        player = Player(username)
+        if csv_path is None and TREE_SNAPSHOTS:
+            snapshot = TreeSnapshot(username, max_depth)
+            store = player.load_store(sync, progress)
+            return snapshot.update(store, start_month, end_month, build)
+        player.load_player_history(start_month, end_month, csv_path, progress, sync)
+        return build(player.pgn_list)
+    finally:
+        if own_pool:
+            pool.close()
 
 
 class Result:
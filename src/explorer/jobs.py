@@ -0,0 +1,165 @@
+"""JobQueue class which runs long tasks of the app in background threads."""
+
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+from uuid import uuid4
+
+from src.config import JOB_HISTORY, JOB_WORKERS
+
+# A task is called with a function reporting its progress as (stage, done, total).
+Task = Callable[[Callable[[str, int, int], None]], Any]
+
+
+class Job:
+    """
+    Task run by a JobQueue, with the last progress it reported.
+
+    Attributes
+    ----------
+    job_id (str) : Id of the job, used by clients to poll it.
+    key (Hashable) : Key of the job, requests with the same key share a running job.
+    stage (str) : Stage the task reported last, empty until it reports one.
+    done (int) : Number of steps of the stage done.
+    total (int) : Number of steps of the stage.
+    future (Future) : Future of the result of the task.
+    """
+
+    def __init__(self, job_id: str, key: Hashable):
+        """
+        Construct a job which has not reported any progress.
+
+        Parameters
+        ----------
+            job_id : str
+                Id of the job.
+            key : Hashable
+                Key of the job.
+        """
+        self.job_id = job_id
+        self.key = key
+        self.stage = ""
+        self.done = 0
+        self.total = 0
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, done: int, total: int):
+        """Record the progress of the task, called from the thread running it."""
+        with self._lock:
+            self.stage, self.done, self.total = stage, done, total
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Status of the job, which can be sent to a client.
+
+            Returns:
+                status (Dict[str, Any]) : Id, state ("running", "done" or "failed"),
+                    stage, done, total and error message of the job.
+        """
+        with self._lock:
+            status = {
+                "id": self.job_id,
+                "state": "running",
+                "stage": self.stage,
+                "done": self.done,
+                "total": self.total,
+                "error": None,
+            }
+        if self.future.done():
+            error = self.future.exception()
+            status["state"] = "done" if error is None else "failed"
+            status["error"] = None if error is None else repr(error)
+        return status
+
+    def result(self) -> Any:
+        """Result of the task, waiting for it if it is running."""
+        return self.future.result()
+
+
+class JobQueue:
+    """
+    JobQueue class which runs long tasks of the app in background threads.
+
+    Tasks are submitted with a key, and a task submitted while another one with the
+    same key is running joins it instead of starting again. Finished jobs are kept until
+    a client pops their result, the oldest being dropped once there are more than
+    history jobs.
+
+    Attributes
+    ----------
+    n_workers (int) : Number of tasks run at the same time.
+    history (int) : Number of jobs kept, running jobs are never dropped.
+    """
+
+    def __init__(self, n_workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        """
+        Construct the queue, its threads are started on demand.
+
+        Parameters
+        ----------
+            n_workers : int
+                Number of tasks run at the same time.
+            history : int
+                Number of jobs kept.
+        """
+        self.n_workers = n_workers
+        self.history = history
+        self._executor = ThreadPoolExecutor(n_workers, thread_name_prefix="job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._latest: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, task: Task) -> Job:
+        """
+        Run a task in the background, unless a job with the same key is running.
+
+            Parameters:
+                key (Hashable) : Key of the task, eg: the username of the player.
+                task (Task) : Task run with a function reporting its progress.
+
+            Returns:
+                job (Job) : Job running the task, or the running job of the key.
+        """
+        with self._lock:
+            job = self._latest.get(key)
+            if job is not None and not job.future.done():
+                return job
+            job = Job(uuid4().hex, key)
+            job.future = self._executor.submit(task, job.report)
+            self._jobs[job.job_id] = job
+            self._latest[key] = job
+            self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Job of an id, None if it does not exist or was dropped."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self, key: Hashable) -> Optional[Job]:
+        """Last job submitted with a key, None if there is none or it was dropped."""
+        with self._lock:
+            return self._latest.get(key)
+
+    def pop(self, job_id: str) -> Optional[Job]:
+        """Drop a job, so that its result is freed once the caller is done with it."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is not None and self._latest.get(job.key) is job:
+                del self._latest[job.key]
+            return job
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond history."""
+        finished = [i for i, job in self._jobs.items() if job.future.done()]
+        for job_id in finished[: max(len(self._jobs) - self.history, 0)]:
+            job = self._jobs.pop(job_id)
+            if self._latest.get(job.key) is job:
+                del self._latest[job.key]
+
+    def shutdown(self):
+        """Stop the threads once the running tasks are over, pending ones are cancelled."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
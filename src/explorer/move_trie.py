@@ -0,0 +1,91 @@
+"""MoveTrie class which aggregates the games of Hero by shared move prefixes."""
+
+from __future__ import annotations
+from typing import Dict, List, Union
+
+import numpy as np
+
+from src.explorer.moves import MOVE_DTYPE
+from src.explorer.pgn import PGN
+from src.explorer.position_node import ResultCounter
+
+# A move is its code packed by encode_move when resolved at ingest, else its SAN.
+MoveToken = Union[int, str]
+
+
+class TrieNode:
+    """Node of a MoveTrie, the games which played a given sequence of moves.
+
+    Attributes
+    ----------
+    children (Dict[MoveToken, TrieNode]) : Nodes reached by playing one more move.
+    res_cnt (ResultCounter) : Results of the games which played a move from here.
+    game_ids (List[int]) : Ids of the games which played a move from here.
+    opening (str) : Opening of the first game which reached this node.
+    """
+
+    __slots__ = ("children", "res_cnt", "game_ids", "opening")
+
+    def __init__(self, opening: str):
+        """Construct an empty node."""
+        self.children: Dict[MoveToken, TrieNode] = {}
+        self.res_cnt = ResultCounter()
+        self.game_ids: List[int] = []
+        self.opening = opening
+
+
+class MoveTrie:
+    """MoveTrie class which aggregates the games of Hero by shared move prefixes.
+
+    Games are inserted as sequences of moves without touching a board, results and
+    game ids being tallied on every node a move is played from. Walking the trie then
+    visits each distinct prefix exactly once, which is what GameTree uses to push a
+    move on a board once per prefix instead of once per game.
+
+    Attributes
+    ----------
+    white (TrieNode) : Root of the games where Hero has white pieces.
+    black (TrieNode) : Root of the games where Hero has black pieces.
+    """
+
+    def __init__(self):
+        """Construct an empty MoveTrie."""
+        self.white = TrieNode("")
+        self.black = TrieNode("")
+
+    @staticmethod
+    def tokens(pgn: PGN, n_moves: int) -> List[MoveToken]:
+        """
+        First moves of a game, as codes where they were resolved at ingest.
+
+            Parameters:
+                pgn (PGN) : Individual PGN instance.
+                n_moves (int) : Maximum number of moves returned.
+
+            Returns:
+                tokens (List[MoveToken]) : Moves of the game, in order.
+        """
+        game = pgn.game.split(" ")[:n_moves]
+        if pgn.moves is None:
+            return game
+        codes = np.frombuffer(pgn.moves, MOVE_DTYPE)[: len(game)].tolist()
+        return codes + game[len(codes) :]
+
+    def insert(self, pgn: PGN, max_depth: int, game_id: int):
+        """
+        Insert the first max_depth + 1 moves of a game.
+
+            Parameters:
+                pgn (PGN) : Individual PGN instance.
+                max_depth (int) : Maximum number of moves in the game used to build tree.
+                game_id (int) : Id of the game, greater than the ids already inserted.
+        """
+        node = self.white if pgn.color == "white" else self.black
+        add_result = getattr(ResultCounter, f"add_{pgn.result}")
+        for token in self.tokens(pgn, max_depth + 1):
+            add_result(node.res_cnt)
+            node.game_ids.append(game_id)
+            child = node.children.get(token)
+            if child is None:
+                child = node.children[token] = TrieNode(pgn.opening)
+            node = child
@@ -0,0 +1,55 @@
+"""Compact binary encoding of the moves of a game."""
+
+from typing import List, Optional
+
+import chess
+import numpy as np
+
+from src.config import ENCODED_PLIES
+
+MOVE_DTYPE = np.dtype("<u2")
+
+
+def encode_move(move: chess.Move) -> int:
+    """Pack a move in 16 bits: from square, to square and promotion piece type."""
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code: int) -> chess.Move:
+    """Unpack a move packed by encode_move."""
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None)
+
+
+def encode_game(game: str, max_plies: int = ENCODED_PLIES) -> Optional[bytes]:
+    """
+    Resolve the first SAN moves of a game and pack them as little-endian uint16.
+
+        Parameters:
+            game (str) : Succession of SAN moves separated by spaces.
+            max_plies (int) : Maximum number of moves encoded.
+
+        Returns:
+            moves (Optional[bytes]) : Packed moves, None if a move is not legal.
+    """
+    board = chess.Board()
+    codes = []
+    for san in game.split()[:max_plies]:
+        try:
+            move = board.push_san(san)
+        except ValueError:
+            return None
+        codes.append(encode_move(move))
+    return np.array(codes, dtype=MOVE_DTYPE).tobytes()
+
+
+def decode_game(moves: bytes) -> List[chess.Move]:
+    """
+    Unpack the moves packed by encode_game.
+
+        Parameters:
+            moves (bytes) : Packed moves.
+
+        Returns:
+            moves (List[chess.Move]) : Moves of the game, in order.
+    """
+    return [decode_move(code) for code in np.frombuffer(moves, MOVE_DTYPE).tolist()]
@@ -0,0 +1,538 @@
+"""NodeStore class which holds the positions of a tree as arrays."""
+
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.explorer.position_node import PositionNode, merge_games
+
+
+class NodeStore:
+    """NodeStore class which holds the positions of a tree as arrays.
+
+    It is a compact alternative to a dictionary of PositionNode: positions get integer
+    ids in the order of their sorted Zobrist keys, results are counted in a single
+    array and variable length fields are stored in CSR form, the keys of the children
+    of position i being child_keys[child_ptr[i]:child_ptr[i + 1]], and so are game ids
+    and paths. Opening names are codes in a table of distinct names. Results are also
+    counted per month of the games, in CSR form too: each position has one row per
+    month it has games in, holding the cumulative results of the games played up to
+    that month, so that the results of any period are the difference of two rows found
+    by binary search. A store is thus made of ARRAYS only, which can be memory-mapped
+    or shared between processes, and merging stores and computing win rates are
+    vectorised. It can be read as a dictionary of PositionNode, those being views built
+    on access: updating them does not update the store.
+
+    Attributes
+    ----------
+    hashes (np.ndarray) : Sorted Zobrist keys of the positions (uint64).
+    last_move_hero (np.ndarray) : True if Hero played the last move, per position.
+    counts (np.ndarray) : Number of wins, draws and losses per position (n, 3).
+    child_ptr (np.ndarray) : Offsets of the children of each position (n + 1).
+    child_keys (np.ndarray) : Zobrist keys of the children (uint64).
+    path_ptr (np.ndarray) : Offsets of the path of each position (n + 1).
+    path_bytes (np.ndarray) : Packed moves leading to the positions (uint8).
+    opening_codes (np.ndarray) : Index of the opening name per position (int32).
+    game_ptr (np.ndarray) : Offsets of the game ids of each position (n + 1).
+    game_ids (np.ndarray) : Sorted ids of the games of each position (int32).
+    month_ptr (np.ndarray) : Offsets of the month rows of each position (n + 1), empty
+        if results are not counted per month.
+    month_keys (np.ndarray) : Sorted months of the games of each position, as numbers
+        of months (int32).
+    month_counts (np.ndarray) : Number of wins, draws and losses of the games of the
+        position played up to each of its months (n_rows, 3).
+    openings (List[str]) : Distinct opening names.
+    """
+
+    ARRAYS = (
+        "hashes",
+        "last_move_hero",
+        "counts",
+        "child_ptr",
+        "child_keys",
+        "path_ptr",
+        "path_bytes",
+        "opening_codes",
+        "game_ptr",
+        "game_ids",
+        "month_ptr",
+        "month_keys",
+        "month_counts",
+    )
+
+    def __init__(self, arrays: Dict[str, np.ndarray], openings: List[str]):
+        """
+        Construct a store from its arrays.
+
+        Parameters
+        ----------
+            arrays : Dict[str, np.ndarray]
+                Arrays of the store, keyed by their name in ARRAYS.
+            openings : List[str]
+                Distinct opening names.
+        """
+        self.hashes = arrays["hashes"]
+        self.last_move_hero = arrays["last_move_hero"]
+        self.counts = arrays["counts"]
+        self.child_ptr = arrays["child_ptr"]
+        self.child_keys = arrays["child_keys"]
+        self.path_ptr = arrays["path_ptr"]
+        self.path_bytes = arrays["path_bytes"]
+        self.opening_codes = arrays["opening_codes"]
+        self.game_ptr = arrays["game_ptr"]
+        self.game_ids = arrays["game_ids"]
+        self.month_ptr = arrays["month_ptr"]
+        self.month_keys = arrays["month_keys"]
+        self.month_counts = arrays["month_counts"]
+        self.openings = openings
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays of the store, keyed by their name in ARRAYS."""
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_nodes(
+        cls,
+        nodes: Dict[int, PositionNode],
+        game_months: Optional[np.ndarray] = None,
+        game_results: Optional[np.ndarray] = None,
+    ) -> NodeStore:
+        """
+        Construct a store from a dictionary of PositionNode keyed by Zobrist hash.
+
+            Parameters:
+                nodes (Dict[int, PositionNode]) : Positions of a tree.
+                game_months (Optional[np.ndarray]) : Month of each game, indexed by
+                    game id. Results are counted per month only if given, which needs
+                    the ids of all the games of each position.
+                game_results (Optional[np.ndarray]) : Outcome of each game.
+
+            Returns:
+                store (NodeStore) : Same positions, as arrays.
+        """
+        ordered = [nodes[key] for key in sorted(nodes)]
+        children = [sorted(node.children) for node in ordered]
+        game_ids = [sorted(node.game_ids) for node in ordered]
+        codes = {}
+        arrays = {
+            "hashes": np.array([node.key for node in ordered], dtype=np.uint64),
+            "last_move_hero": np.array(
+                [node.last_move_hero for node in ordered], dtype=bool
+            ),
+            "counts": np.array(
+                [
+                    (node.res_cnt.win, node.res_cnt.draw, node.res_cnt.lose)
+                    for node in ordered
+                ],
+                dtype=np.int64,
+            ).reshape(-1, 3),
+            "child_ptr": np.cumsum([0] + [len(k) for k in children], dtype=np.int64),
+            "child_keys": np.array([k for keys in children for k in keys], np.uint64),
+            "path_ptr": np.cumsum(
+                [0] + [len(node.path) for node in ordered], dtype=np.int64
+            ),
+            "path_bytes": np.frombuffer(
+                b"".join(node.path for node in ordered), dtype=np.uint8
+            ),
+            "opening_codes": np.array(
+                [codes.setdefault(node.opening, len(codes)) for node in ordered],
+                dtype=np.int32,
+            ),
+            "game_ptr": np.cumsum([0] + [len(ids) for ids in game_ids], dtype=np.int64),
+            "game_ids": np.array([i for ids in game_ids for i in ids], dtype=np.int32),
+        }
+        arrays.update(
+            cls.month_histograms(
+                arrays["game_ptr"], arrays["game_ids"], game_months, game_results
+            )
+        )
+        return cls(arrays, list(codes))
+
+    @classmethod
+    def month_histograms(
+        cls,
+        game_ptr: np.ndarray,
+        game_ids: np.ndarray,
+        game_months: Optional[np.ndarray],
+        game_results: Optional[np.ndarray],
+    ) -> Dict[str, np.ndarray]:
+        """
+        Count the results of the games of each position per month, see month_counts.
+
+            Parameters:
+                game_ptr (np.ndarray) : CSR offsets of the game ids of the positions.
+                game_ids (np.ndarray) : Ids of the games of each position.
+                game_months (Optional[np.ndarray]) : Month of each game.
+                game_results (Optional[np.ndarray]) : Outcome of each game.
+
+            Returns:
+                arrays (Dict[str, np.ndarray]) : month_ptr, month_keys and
+                    month_counts arrays.
+        """
+        n = len(game_ptr) - 1
+        if game_months is None:
+            return {
+                "month_ptr": np.zeros(0, dtype=np.int64),
+                "month_keys": np.zeros(0, dtype=np.int32),
+                "month_counts": np.zeros((0, 3), dtype=np.int32),
+            }
+        months = np.asarray(game_months, dtype=np.int64)[game_ids]
+        results = np.asarray(game_results, dtype=np.int64)[game_ids]
+        counts = np.eye(3, dtype=np.int64)[results]
+        return cls.month_rows(cls.owners(game_ptr), months, counts, n)
+
+    @classmethod
+    def month_rows(
+        cls, owners: np.ndarray, months: np.ndarray, counts: np.ndarray, n: int
+    ) -> Dict[str, np.ndarray]:
+        """
+        Cumulative month rows of n positions from results counted per month.
+
+            Parameters:
+                owners (np.ndarray) : Position of each entry.
+                months (np.ndarray) : Month of each entry, as a number of months.
+                counts (np.ndarray) : Wins, draws and losses of each entry (m, 3).
+                n (int) : Number of positions.
+
+            Returns:
+                arrays (Dict[str, np.ndarray]) : month_ptr, month_keys and
+                    month_counts arrays.
+        """
+        keys = (np.asarray(owners, dtype=np.int64) << 32) + np.asarray(
+            months, dtype=np.int64
+        )
+        keys, rows = np.unique(keys, return_inverse=True)
+        totals = np.zeros((len(keys), 3), dtype=np.int64)
+        np.add.at(totals, rows.reshape(-1), counts)
+        row_owners = keys >> 32
+        month_ptr = cls.offsets(row_owners, n)
+        # Sums within each position, from the sums over all the rows.
+        cumulated = np.zeros((len(keys) + 1, 3), dtype=np.int64)
+        np.cumsum(totals, axis=0, out=cumulated[1:])
+        cumulated = cumulated[1:] - cumulated[month_ptr[row_owners]]
+        return {
+            "month_ptr": month_ptr,
+            "month_keys": (keys & 0xFFFFFFFF).astype(np.int32),
+            "month_counts": cumulated.astype(np.int32),
+        }
+
+    def month_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Position, month and results of each month row, not cumulated."""
+        owners = self.owners(self.month_ptr)
+        totals = self.month_counts.astype(np.int64)
+        totals[1:] -= self.month_counts[:-1]
+        starts = self.month_ptr[:-1][np.diff(self.month_ptr) > 0]
+        totals[starts] = self.month_counts[starts]
+        return owners, self.month_keys, totals
+
+    def __len__(self) -> int:
+        """Number of positions."""
+        return len(self.hashes)
+
+    def index(self, key: int) -> int:
+        """Id of the position of a Zobrist key, -1 if it is not stored."""
+        key = np.uint64(key)
+        i = int(np.searchsorted(self.hashes, key))
+        return i if i < len(self.hashes) and self.hashes[i] == key else -1
+
+    def __contains__(self, key: int) -> bool:
+        """Return True if the position is stored."""
+        return self.index(key) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the Zobrist keys, in increasing order."""
+        return iter(self.hashes.tolist())
+
+    def keys(self) -> List[int]:
+        """Zobrist keys of the positions, in increasing order."""
+        return self.hashes.tolist()
+
+    def __getitem__(self, key: int) -> PositionNode:
+        """PositionNode view of a position, raise KeyError if it is not stored."""
+        i = self.index(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.node(i)
+
+    def get(self, key: int, default=None):
+        """PositionNode view of a position, default if it is not stored."""
+        i = self.index(key)
+        return self.node(i) if i >= 0 else default
+
+    def items(self) -> Iterator[Tuple[int, PositionNode]]:
+        """Iterate over the positions as (Zobrist key, PositionNode view)."""
+        for i, key in enumerate(self.hashes.tolist()):
+            yield key, self.node(i)
+
+    def node(self, i: int) -> PositionNode:
+        """PositionNode view of the position of id i."""
+        start, end = self.path_ptr[i], self.path_ptr[i + 1]
+        node = PositionNode(
+            int(self.hashes[i]),
+            self.path_bytes[start:end].tobytes(),
+            bool(self.last_move_hero[i]),
+            self.openings[self.opening_codes[i]],
+        )
+        node.res_cnt.win, node.res_cnt.draw, node.res_cnt.lose = self.counts[i].tolist()
+        start, end = self.child_ptr[i], self.child_ptr[i + 1]
+        node.children = set(self.child_keys[start:end].tolist())
+        start, end = self.game_ptr[i], self.game_ptr[i + 1]
+        node.game_ids = self.game_ids[start:end].tolist()
+        return node
+
+    def n_games(self) -> np.ndarray:
+        """Number of games per position."""
+        return self.counts.sum(axis=1)
+
+    def win_rates(self) -> np.ndarray:
+        """Win rate per position."""
+        return self.counts[:, 0] / self.n_games()
+
+    def has_months(self) -> bool:
+        """Return True if results are counted per month."""
+        return len(self.month_ptr) == len(self.hashes) + 1
+
+    def period_counts(self, start_month: int, end_month: int) -> np.ndarray:
+        """
+        Number of wins, draws and losses per position of the games of a period.
+
+            Parameters:
+                start_month (int) : First month of the period, as a number of months.
+                end_month (int) : Last month of the period, as a number of months.
+
+            Returns:
+                counts (np.ndarray) : Results of the period per position (n, 3).
+        """
+        if not self.has_months():
+            raise ValueError("Results are not counted per month in this store.")
+        positions = np.arange(len(self), dtype=np.int64) << 32
+        keys = (self.owners(self.month_ptr) << 32) + self.month_keys
+        # Rows before the period, then rows up to its end, of each position.
+        before = np.searchsorted(keys, positions + start_month, "left")
+        until = np.searchsorted(
+            keys, positions + max(end_month, start_month - 1), "right"
+        )
+        return self.counts_until(until) - self.counts_until(before)
+
+    def counts_until(self, rows: np.ndarray) -> np.ndarray:
+        """Cumulative results of each position before its row of index rows."""
+        counts = np.zeros((len(self), 3), dtype=np.int64)
+        found = rows > self.month_ptr[:-1]
+        counts[found] = self.month_counts[rows[found] - 1]
+        return counts
+
+    def period(
+        self,
+        start_month: int,
+        end_month: int,
+        game_months: Optional[np.ndarray] = None,
+    ) -> NodeStore:
+        """
+        Store of the same positions whose results are the ones of a period.
+
+        Positions without games in the period are kept, with null counts.
+
+            Parameters:
+                start_month (int) : First month of the period, as a number of months.
+                end_month (int) : Last month of the period, as a number of months.
+                game_months (Optional[np.ndarray]) : Month of each game, indexed by
+                    game id. If given, only the game ids of the period are kept.
+
+            Returns:
+                store (NodeStore) : Store sharing the other arrays of self.
+        """
+        arrays = self.arrays()
+        arrays["counts"] = self.period_counts(start_month, end_month)
+        if game_months is not None:
+            months = np.asarray(game_months)[self.game_ids]
+            keep = (months >= start_month) & (months <= end_month)
+            arrays["game_ptr"] = self.offsets(
+                self.owners(self.game_ptr)[keep], len(self)
+            )
+            arrays["game_ids"] = self.game_ids[keep]
+        return NodeStore(arrays, self.openings)
+
+    @staticmethod
+    def owners(ptr: np.ndarray) -> np.ndarray:
+        """Id of the position owning each entry of a CSR array of offsets ptr."""
+        return np.repeat(np.arange(len(ptr) - 1, dtype=np.int64), np.diff(ptr))
+
+    @staticmethod
+    def offsets(owners: np.ndarray, n: int) -> np.ndarray:
+        """CSR offsets of n positions from the sorted owners of the entries."""
+        ptr = np.zeros(n + 1, dtype=np.int64)
+        ptr[1:] = np.cumsum(np.bincount(owners, minlength=n))
+        return ptr
+
+    @staticmethod
+    def gather(ptr: np.ndarray, data: np.ndarray, ids: np.ndarray):
+        """
+        Gather the CSR entries of the positions ids, in order.
+
+            Parameters:
+                ptr (np.ndarray) : CSR offsets.
+                data (np.ndarray) : CSR entries.
+                ids (np.ndarray) : Ids of the positions gathered.
+
+            Returns:
+                ptr (np.ndarray) : CSR offsets of the gathered positions.
+                data (np.ndarray) : Gathered entries.
+        """
+        lengths = ptr[ids + 1] - ptr[ids]
+        out_ptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        out_ptr[1:] = np.cumsum(lengths)
+        index = np.arange(out_ptr[-1]) + np.repeat(ptr[ids] - out_ptr[:-1], lengths)
+        return out_ptr, data[index]
+
+    def __add__(self, other: NodeStore) -> NodeStore:
+        """Merge two stores whose game ids do not overlap, see merge."""
+        return self.merge(other)
+
+    def merge(
+        self, other: NodeStore, game_offset: int = 0, n_examples: Optional[int] = None
+    ) -> NodeStore:
+        """
+        Merge two stores.
+
+        Results are added, children are united and game ids are united. The path and
+        opening of positions found in both stores are the ones of self.
+
+            Parameters:
+                other (NodeStore) : Store merged with self.
+                game_offset (int) : Shift applied to the game ids of other.
+                n_examples (Optional[int]) : Maximum number of game ids kept per
+                    position, see merge_games.
+
+            Returns:
+                store (NodeStore) : Merged store.
+        """
+        # pylint: disable=too-many-locals
+        hashes = np.union1d(self.hashes, other.hashes)
+        ids = np.searchsorted(hashes, self.hashes)
+        other_ids = np.searchsorted(hashes, other.hashes)
+        counts = np.zeros((len(hashes), 3), dtype=np.int64)
+        counts[ids] += self.counts
+        counts[other_ids] += other.counts
+        # Source of the fields of each position, in self then other concatenated.
+        source = np.empty(len(hashes), dtype=np.int64)
+        source[other_ids] = np.arange(len(other)) + len(self)
+        source[ids] = np.arange(len(self))
+        last_move_hero = np.concatenate([self.last_move_hero, other.last_move_hero])
+        path_ptr, path_bytes = self.gather(
+            np.concatenate([self.path_ptr[:-1], other.path_ptr + self.path_ptr[-1]]),
+            np.concatenate([self.path_bytes, other.path_bytes]),
+            source,
+        )
+        openings = list(self.openings)
+        codes = {opening: code for code, opening in enumerate(openings)}
+        recode = np.array(
+            [codes.setdefault(o, len(codes)) for o in other.openings], dtype=np.int32
+        )
+        openings += list(codes)[len(openings) :]
+        opening_codes = np.concatenate(
+            [self.opening_codes, recode[other.opening_codes]]
+        )
+        # Edges of both stores, deduplicated and sorted by parent then child.
+        parents = np.concatenate(
+            [ids[self.owners(self.child_ptr)], other_ids[other.owners(other.child_ptr)]]
+        )
+        child_keys = np.concatenate([self.child_keys, other.child_keys])
+        order = np.lexsort((child_keys, parents))
+        parents, child_keys = parents[order], child_keys[order]
+        unique = np.ones(len(parents), dtype=bool)
+        unique[1:] = (parents[1:] != parents[:-1]) | (child_keys[1:] != child_keys[:-1])
+        parents, child_keys = parents[unique], child_keys[unique]
+        # Game ids of both stores, those of other come after those of self.
+        owners = np.concatenate(
+            [ids[self.owners(self.game_ptr)], other_ids[other.owners(other.game_ptr)]]
+        )
+        game_ids = np.concatenate(
+            [self.game_ids, other.game_ids + np.int32(game_offset)]
+        )
+        order = np.argsort(owners, kind="stable")
+        owners, game_ids = owners[order], game_ids[order]
+        if n_examples is not None:
+            game_ids, owners = self.sample_games(
+                game_ids, owners, counts, other, other_ids, n_examples
+            )
+        arrays = {
+            "hashes": hashes,
+            "last_move_hero": last_move_hero[source],
+            "counts": counts,
+            "child_ptr": self.offsets(parents, len(hashes)),
+            "child_keys": child_keys,
+            "path_ptr": path_ptr,
+            "path_bytes": path_bytes,
+            "opening_codes": opening_codes[source],
+            "game_ptr": self.offsets(owners, len(hashes)),
+            "game_ids": game_ids,
+        }
+        arrays.update(self.merge_months(other, len(hashes), ids, other_ids))
+        return NodeStore(arrays, openings)
+
+    def merge_months(
+        self, other: NodeStore, n: int, ids: np.ndarray, other_ids: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Add the results per month of two stores.
+
+            Parameters:
+                other (NodeStore) : Store merged with self.
+                n (int) : Number of positions of the merged store.
+                ids (np.ndarray) : Id of the positions of self in the merged store.
+                other_ids (np.ndarray) : Id of the positions of other in the merged
+                    store.
+
+            Returns:
+                arrays (Dict[str, np.ndarray]) : month_ptr, month_keys and
+                    month_counts arrays.
+        """
+        stores = [s for s in (self, other) if len(s) > 0]
+        if not all(store.has_months() for store in stores):
+            return self.month_histograms(np.zeros(n + 1, np.int64), None, None, None)
+        owners, months, counts = [], [], []
+        for store, store_ids in [(self, ids), (other, other_ids)]:
+            if not store.has_months():
+                continue
+            store_owners, store_months, store_counts = store.month_totals()
+            owners.append(store_ids[store_owners])
+            months.append(store_months)
+            counts.append(store_counts)
+        return self.month_rows(
+            np.concatenate(owners or [np.zeros(0, np.int64)]),
+            np.concatenate(months or [np.zeros(0, np.int32)]),
+            np.concatenate(counts or [np.zeros((0, 3), np.int64)]),
+            n,
+        )
+
+    @staticmethod
+    def sample_games(
+        game_ids: np.ndarray,
+        owners: np.ndarray,
+        counts: np.ndarray,
+        other: NodeStore,
+        other_ids: np.ndarray,
+        n_examples: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep at most n_examples of the merged game ids of each position."""
+        # pylint: disable=too-many-arguments
+        ptr = NodeStore.offsets(owners, len(counts))
+        n_games = counts.sum(axis=1)
+        other_n_games = np.zeros(len(counts), dtype=np.int64)
+        other_n_games[other_ids] = other.n_games()
+        other_n_ids = np.zeros(len(counts), dtype=np.int64)
+        other_n_ids[other_ids] = np.diff(other.game_ptr)
+        keep = np.ones(len(game_ids), dtype=bool)
+        for i in np.flatnonzero(np.diff(ptr) > n_examples).tolist():
+            start, end = ptr[i], ptr[i + 1]
+            split = end - other_n_ids[i]
+            kept = merge_games(
+                game_ids[start:split].tolist(),
+                int(n_games[i] - other_n_games[i]),
+                game_ids[split:end].tolist(),
+                int(other_n_games[i]),
+                n_examples,
+            )
+            keep[start:end] = np.isin(game_ids[start:end], kept)
+        return game_ids[keep], owners[keep]
@@ -1,10 +1,58 @@
 """PGN class which contains relevant fields from raw PGN."""
+from __future__ import annotations
+from enum import IntEnum
+import sys
+from typing import Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from src.explorer.moves import encode_game
 from src.preprocess.regextractor import RegExtractor
 
 
+class Color(IntEnum):
+    """Color of Hero's pieces."""
+
+    WHITE = 0
+    BLACK = 1
+
+
+class Outcome(IntEnum):
+    """Result of Hero."""
+
+    WIN = 0
+    DRAW = 1
+    LOSE = 2
+
+
+def month_to_int(month: str) -> int:
+    """Convert a month in the format YYYY-MM to a number of months since year 0."""
+    year, month = month.split("-")
+    return int(year) * 12 + int(month) - 1
+
+
+def int_to_month(month: int) -> str:
+    """Convert a number of months since year 0 to a month in the format YYYY-MM."""
+    return f"{month // 12:04d}-{month % 12 + 1:02d}"
+
+
+def month_range(start: str, end: str) -> List[str]:
+    """Months from start to end included, in the format YYYY-MM."""
+    return [int_to_month(m) for m in range(month_to_int(start), month_to_int(end) + 1)]
+
+
+def intern(value: str) -> str:
+    """Intern a string so that equal values share a single object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class PGN:
     """PGN class which contains relevant fields from raw PGN.
 
+    Instances are compact: color and result are held as small ints, month as a number
+    of months, the opening name is interned and there is no instance __dict__. The
+    string API is kept through properties and instances pickle to a flat tuple.
+
     Attributes
     ----------
     color (str): Color of Hero's pieces.
@@ -13,44 +61,90 @@ class PGN:
     game (str): Succession of moves separated by spaces.
     month (str): Month in the format YYYY-MM.
     opening (str): Opening name.
+    color_id (Color): Color of Hero's pieces as an enum.
+    result_id (Outcome): Result of Hero as an enum.
+    month_id (int): Month as a number of months since year 0.
+    moves (Optional[bytes]): First moves packed by encode_game, if resolved at ingest.
     """
 
+    __slots__ = (
+        "color_id",
+        "result_id",
+        "link",
+        "game",
+        "month_id",
+        "opening",
+        "moves",
+    )
+
     def __init__(
         self,
-        color: str,
-        result: str,
+        color: Union[str, Color],
+        result: Union[str, Outcome],
         link: str,
         game: str,
-        month: str,
+        month: Union[str, int],
         opening: str,
+        moves: Optional[bytes] = None,
     ):
         """PGN class which contains relevant fields from raw PGN.
 
         Parameters
         ----------
-            color : str
+            color : Union[str, Color]
                 Color of Hero's pieces.
-            result : str
+            result : Union[str, Outcome]
                 Result of Hero.
             link : str
                 Link to Chess.com game.
             game : str
                Succession of moves separated by spaces.
-            month : str
-                Month in the format YYYY-MM.
+            month : Union[str, int]
+                Month in the format YYYY-MM, or as a number of months since year 0.
             opening : str
                 Opening name.
+            moves : Optional[bytes]
+                First moves packed by encode_game, if resolved at ingest.
         """
-        self.color = color
-        self.result = result
+        # pylint: disable=too-many-arguments
+        self.color_id = Color[color.upper()] if isinstance(color, str) else color
+        self.result_id = Outcome[result.upper()] if isinstance(result, str) else result
         self.link = link
         self.game = game
-        self.month = month
-        self.opening = opening
+        self.month_id = month_to_int(month) if isinstance(month, str) else int(month)
+        self.opening = intern(opening)
+        self.moves = moves
+
+    def __reduce__(self):
+        """Pickle as a flat tuple of small ints and strings."""
+        return PGN, (
+            int(self.color_id),
+            int(self.result_id),
+            self.link,
+            self.game,
+            self.month_id,
+            self.opening,
+            self.moves,
+        )
+
+    @property
+    def color(self) -> str:
+        """Color of Hero's pieces."""
+        return self.color_id.name.lower()
+
+    @property
+    def result(self) -> str:
+        """Result of Hero."""
+        return self.result_id.name.lower()
+
+    @property
+    def month(self) -> str:
+        """Month in the format YYYY-MM."""
+        return int_to_month(self.month_id)
 
     @classmethod
     def extract_from_txt(cls, pgn_txt: str, username: str):
-        """Construct a PGN from a raw PGN string.
+        """Construct a PGN from a raw PGN string, resolving its first moves.
 
         Parameters
         ----------
@@ -59,10 +153,95 @@ class PGN:
             username : str
                 Username of Hero.
         """
-        color = RegExtractor.get_color(pgn_txt, username)
-        result = RegExtractor.get_result(pgn_txt, color)
-        link = RegExtractor.get_link(pgn_txt)
-        month = RegExtractor.get_month(pgn_txt)
-        opening = RegExtractor.get_opening(pgn_txt)
-        game = RegExtractor.get_game(pgn_txt)
-        return cls(color, result, link, game, month, opening)
+        fields = RegExtractor.extract(pgn_txt, username)
+        return cls(*fields, encode_game(fields[3]))
+
+
+class PGNBatch:
+    """Columnar batch of PGNs.
+
+    Small fields are held in NumPy arrays and opening names as codes in a table of
+    distinct names, which makes a batch much cheaper to build, slice and pickle than a
+    list of PGN instances.
+
+    Attributes
+    ----------
+    color_ids (np.ndarray): Color of Hero's pieces per game (int8).
+    result_ids (np.ndarray): Result of Hero per game (int8).
+    month_ids (np.ndarray): Month per game as a number of months (int32).
+    opening_codes (np.ndarray): Index of the opening name in openings per game (int32).
+    openings (List[str]): Distinct opening names.
+    links (List[str]): Link per game.
+    games (List[str]): Moves per game.
+    moves (List[Optional[bytes]]): Packed first moves per game.
+    """
+
+    def __init__(
+        self,
+        color_ids: np.ndarray,
+        result_ids: np.ndarray,
+        month_ids: np.ndarray,
+        opening_codes: np.ndarray,
+        openings: List[str],
+        links: List[str],
+        games: List[str],
+        moves: List[Optional[bytes]],
+    ):
+        """Construct a batch from its columns."""
+        # pylint: disable=too-many-arguments
+        self.color_ids = color_ids
+        self.result_ids = result_ids
+        self.month_ids = month_ids
+        self.opening_codes = opening_codes
+        self.openings = openings
+        self.links = links
+        self.games = games
+        self.moves = moves
+
+    @classmethod
+    def from_pgns(cls, pgns: Iterable[PGN]) -> PGNBatch:
+        """Construct a batch from PGN instances."""
+        pgns = list(pgns)
+        codes = {}
+        opening_codes = [codes.setdefault(pgn.opening, len(codes)) for pgn in pgns]
+        return cls(
+            np.array([pgn.color_id for pgn in pgns], dtype=np.int8),
+            np.array([pgn.result_id for pgn in pgns], dtype=np.int8),
+            np.array([pgn.month_id for pgn in pgns], dtype=np.int32),
+            np.array(opening_codes, dtype=np.int32),
+            list(codes),
+            [pgn.link for pgn in pgns],
+            [pgn.game for pgn in pgns],
+            [pgn.moves for pgn in pgns],
+        )
+
+    def __len__(self) -> int:
+        """Number of games in the batch."""
+        return len(self.links)
+
+    def __getitem__(self, index: slice) -> PGNBatch:
+        """Slice of the batch, sharing the opening names table."""
+        return PGNBatch(
+            self.color_ids[index],
+            self.result_ids[index],
+            self.month_ids[index],
+            self.opening_codes[index],
+            self.openings,
+            self.links[index],
+            self.games[index],
+            self.moves[index],
+        )
+
+    def __iter__(self) -> Iterator[PGN]:
+        """Iterate over the games of the batch as PGN instances."""
+        openings = [intern(opening) for opening in self.openings]
+        for i, link in enumerate(self.links):
+            yield PGN(
+                Color(self.color_ids[i]),
+                Outcome(self.result_ids[i]),
+                link,
+                self.games[i],
+                self.month_ids[i],
+                openings[self.opening_codes[i]],
+                self.moves[i],
+            )
@@ -1,14 +1,13 @@
 """Player class responsible to load all PGN for a given username."""
-import os
-from datetime import datetime
-from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Optional
 
-import pandas as pd
+from requests import RequestException
 
-from src.config import DATA_FOLDER, MINIMAL_MONTH
+from src.config import MINIMAL_MONTH
 from src.explorer.pgn import PGN
-from src.preprocess.fetcher import Fetcher
+from src.preprocess.fetcher import USERNAME_PATTERN, Fetcher, utc_month
+from src.preprocess.game_store import GameStore
+from src.preprocess.writer import COLUMNS
 
 
 class Player:
@@ -37,15 +36,20 @@ class Player:
         self.pgn_list = []
 
     def load_player_history(
-        self, start_month: str, end_month: str, csv_path: Optional[str] = None
+        self,
+        start_month: str,
+        end_month: str,
+        csv_path: Optional[str] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+        sync: bool = True,
     ):
         """
         Load the player's PGNs from csv to pgn_list attribute.
 
         First checks if a csv file path is provided to load from it directly. If not,
-        checks if the username has already a csv file in the data folder and loads PGNs
-        from it. Else, fetches the player history with th Fetcher class then loads from
-        the csv.
+        brings the GameStore of the username up to date with the Fetcher class, which
+        only requests the months missing or still in progress, then loads PGNs of the
+        requested months from it. See load_store.
 
         Parameters
         ----------
@@ -55,33 +59,88 @@ class Player:
                 End month in format YYYY-MM (eg: 2023-01).
             csv_path : str
                 Path to a csv file from which the player history is loaded in priority.
+            progress : Optional[Callable[[str, int, int], None]]
+                Reports the progress of the sync, see Fetcher.store_months.
+            sync : bool
+                Sync the store with Chess.com, else only read the games stored.
         """
+        # pylint: disable=too-many-arguments
         # If path is provided, load from it.
         if csv_path is not None:
             self.pgn_list = self.load_from_csv(csv_path, start_month, end_month)
         else:
-            username_path = self.path()
-            # If csv file found in data folder load from it.
-            if username_path is not None:
-                self.pgn_list = self.load_from_csv(
-                    username_path, start_month, end_month
-                )
-            else:
-                # Fetch data from chess.com then load from csv file.
-                f = Fetcher(self.username)
-                f.download_history(MINIMAL_MONTH, datetime.now().strftime("%Y-%m"))
-                self.pgn_list = self.load_from_csv(self.path(), start_month, end_month)
-
-    def path(self):
+            # Sync data from chess.com then load from the store.
+            store = self.load_store(sync, progress)
+            self.pgn_list = self.load_from_store(store, start_month, end_month)
+
+    def load_store(
+        self,
+        sync: bool = True,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> GameStore:
+        """
+        Return the GameStore of the player, synced with Chess.com if sync is True.
+
+        Players whose name is not a Chess.com username, eg: players of imported
+        databases, are never synced, and a player with imported games whose sync fails
+        is read from the store.
+
+            Parameters:
+                sync (bool) : Sync the store with Chess.com, see sync_store.
+                progress (Optional[Callable[[str, int, int], None]]) : Reports the
+                    progress of the sync, see Fetcher.store_months.
+
+            Returns:
+                store (GameStore) : Store of the player.
+        """
+        store = GameStore(self.username)
+        if not sync or not USERNAME_PATTERN.match(self.username):
+            return store
+        try:
+            return self.sync_store(progress)
+        except RequestException:
+            # Imported players may not have an account with the same username.
+            if not store.imported():
+                raise
+            return GameStore(self.username)
+
+    def sync_store(
+        self, progress: Optional[Callable[[str, int, int], None]] = None
+    ) -> GameStore:
+        """
+        Bring the GameStore of the player up to date with Chess.com.
+
+        Only the months missing or still in progress are requested, see Fetcher.
+
+            Parameters:
+                progress (Optional[Callable[[str, int, int], None]]) : Reports the
+                    progress of the sync, see Fetcher.store_months.
+
+            Returns:
+                store (GameStore) : Store of the player.
         """
-        Get the default filename of the csv file in the data folder if exists.
+        f = Fetcher(self.username)
+        f.sync_history(MINIMAL_MONTH, utc_month(), progress=progress)
+        return f.store
 
-        Returns:
-            path (Optional[str]) : Default filename of the csv file in the data folder
-                if exists.
+    def load_from_store(self, store: GameStore, start_month: str, end_month: str):
         """
-        if f"{self.username}.csv" in os.listdir(DATA_FOLDER):
-            return Path(DATA_FOLDER) / f"{self.username}.csv"
+        Convert the games stored for a period into PGN instances.
+
+        Only the partitions of the requested months are read, and they are memory-mapped.
+
+        Parameters
+        ----------
+            store : GameStore
+                Store holding the games of the player.
+            start_month : str
+                Start month in format YYYY-MM (eg: 2023-01).
+            end_month : str
+                End month in format YYYY-MM (eg: 2023-01).
+        """
+        table = store.read_range(start_month, end_month)
+        columns = [table.column(col).to_pylist() for col in COLUMNS]
+        return [PGN(*row) for row in zip(*columns)]
 
     def load_from_csv(self, path: str, start_month: str, end_month: str):
         """
@@ -96,6 +155,9 @@ class Player:
             end_month : str
                 End month in format YYYY-MM (eg: 2023-01).
         """
+        # pandas is only needed by csv files, it is slow to import.
+        import pandas as pd
+
         pgn_df = pd.read_csv(path)
         pgn_df = pgn_df[
             (pgn_df["month"] >= start_month) & (pgn_df["month"] <= end_month)
@@ -1,5 +1,12 @@
 """Position Node class which wraps all relevant informations about a position node."""
 from __future__ import annotations
+from bisect import insort
+import random
+from typing import List, Optional
+
+import chess
+
+from src.explorer.moves import decode_game
 
 
 class ResultCounter:
@@ -39,51 +46,131 @@ class ResultCounter:
         self.draw += 1
 
 
+def merge_games(
+    game_ids: List[int],
+    n_games: int,
+    other_ids: List[int],
+    other_n_games: int,
+    n_examples: Optional[int] = None,
+) -> List[int]:
+    """
+    Merge the sorted game ids of two sets of games.
+
+    With n_examples, game ids are uniform samples of at most n_examples of the games,
+    the merged sample keeps each of the n_games + other_n_games games with the same
+    probability.
+
+        Parameters:
+            game_ids (List[int]) : Sorted ids of the games of the first set, or sample.
+            n_games (int) : Number of games of the first set.
+            other_ids (List[int]) : Sorted ids of the games of the second set, or sample.
+            other_n_games (int) : Number of games of the second set.
+            n_examples (Optional[int]) : Size of the samples, None to keep all games.
+
+        Returns:
+            game_ids (List[int]) : Sorted ids of the games of both sets, or sample.
+    """
+    if n_examples is None or len(game_ids) + len(other_ids) <= n_examples:
+        return sorted(game_ids + other_ids)
+    # Number of the sampled games which belong to the first set.
+    drawn = random.sample(range(n_games + other_n_games), n_examples)
+    n_first = min(sum(1 for i in drawn if i < n_games), len(game_ids))
+    n_first = max(n_first, n_examples - len(other_ids))
+    return sorted(
+        random.sample(game_ids, n_first)
+        + random.sample(other_ids, n_examples - n_first)
+    )
+
+
 class PositionNode:
     """Position Node class which wraps all relevant informations about a position node.
 
+    The node is identified by the Zobrist hash of its position, the FEN is only
+    computed on demand by replaying the moves of the first game which reached it.
+
     Attributes
     ----------
+    key (int) : Zobrist hash of the position.
+    path (bytes) : Moves packed by encode_game leading to the position.
     fen (str) : String describing the board position in a compact way.
     last_move_hero (bool)  : Boolean set to True if Hero played the last move.
     opening (str) : Name of the opening.
     res_cnt (ResultCounter) : ResultCounter for the node.
-    children (Set[Tuple[str,bool]]) : Node ids which start from this node.
-    links (List[str]) = List of links to games in chess.com from this node.
+    children (Set[int]) : Keys of the nodes which start from this node.
+    game_ids (List[int]) : Sorted ids of the games from this node, see GameTree.games.
     """
 
-    def __init__(self, fen: str, last_move_hero: bool, opening: str):
+    def __init__(self, key: int, path: bytes, last_move_hero: bool, opening: str):
         """
         Construct empty PositionNode.
 
         Parameters
         ----------
-            fen : str
-                String describing the board position in a compact way.
+            key : int
+                Zobrist hash of the position.
+            path : bytes
+                Moves packed by encode_game leading to the position.
             last_move_hero : bool
                 Boolean set to True if Hero played the last move.
             opening :str
                 Name of the opening.
         """
-        self.fen = fen
+        self.key = key
+        self.path = path
         self.last_move_hero = last_move_hero
         self.opening = opening
         self.res_cnt = ResultCounter()
         self.children = set()
-        self.links = []
+        self.game_ids = []
 
     def __add__(self, other: PositionNode) -> PositionNode:
         """Define add operator for PositionNode.
 
         The result counters are added, children from others are added to self children
-        and links to games from other are added to self.
+        and ids of games from other are added to self.
         """
+        return self.merge(other)
+
+    def merge(
+        self, other: PositionNode, n_examples: Optional[int] = None
+    ) -> PositionNode:
+        """Add other to self, see __add__ and merge_games for n_examples."""
+        self.game_ids = merge_games(
+            self.game_ids, self.n_games(), other.game_ids, other.n_games(), n_examples
+        )
         self.res_cnt += other.res_cnt
         self.children.update(other.children)
-        self.links += other.links
 
         return self
 
+    def add_game(self, game_id: int, n_examples: Optional[int] = None):
+        """Add the id of a game whose result was just counted.
+
+        With n_examples, at most n_examples ids are kept by reservoir sampling.
+
+        Parameters
+        ----------
+            game_id : int
+                Id of the game, greater than the ids already added.
+            n_examples : Optional[int]
+                Maximum number of ids kept, None to keep all of them.
+        """
+        if n_examples is None or len(self.game_ids) < n_examples:
+            self.game_ids.append(game_id)
+            return
+        i = random.randrange(self.n_games())
+        if i < n_examples:
+            del self.game_ids[i]
+            insort(self.game_ids, game_id)
+
+    @property
+    def fen(self) -> str:
+        """String describing the board position, computed by replaying path."""
+        board = chess.Board()
+        for move in decode_game(self.path):
+            board.push(move)
+        return board.fen()
+
     def increment_count(self, result):
         """Increment ResultCounter.
 
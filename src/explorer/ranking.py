@@ -0,0 +1,122 @@
+"""Ranking of the positions of a tree by a score of their results."""
+
+from __future__ import annotations
+from typing import Callable, Dict, Union
+
+import chess
+import chess.polyglot
+import numpy as np
+
+from src.config import WILSON_Z
+from src.explorer.node_store import NodeStore
+
+# A score maps the wins, draws and losses of positions (n, 3) to one value each, the
+# lowest values being the worst positions for Hero.
+Score = Callable[[np.ndarray], np.ndarray]
+
+ROOT_KEY = chess.polyglot.zobrist_hash(chess.Board())
+
+
+def rate(numerator: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Ratio of numerator to the number of games, NaN for positions without games."""
+    n_games = counts.sum(axis=1)
+    out = np.full(len(counts), np.nan)
+    return np.divide(numerator, n_games, out=out, where=n_games > 0)
+
+
+def win_rate(counts: np.ndarray) -> np.ndarray:
+    """Share of games won."""
+    return rate(counts[:, 0], counts)
+
+
+def expected_score(counts: np.ndarray) -> np.ndarray:
+    """Points scored per game, a draw counting for half a win."""
+    return rate(counts[:, 0] + 0.5 * counts[:, 1], counts)
+
+
+def wilson_upper_bound(counts: np.ndarray) -> np.ndarray:
+    """
+    Upper bound of the Wilson score interval of the win rate.
+
+    A position ranks low only if it is bad with confidence, so that a loss in a
+    position seen twice does not outrank a position lost 20 times out of 30.
+
+        Parameters:
+            counts (np.ndarray) : Wins, draws and losses per position (n, 3).
+
+        Returns:
+            scores (np.ndarray) : Upper bound of the win rate at z = WILSON_Z.
+    """
+    n_games = counts.sum(axis=1).astype(np.float64)
+    p = win_rate(counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z2_n = WILSON_Z**2 / n_games
+        spread = WILSON_Z * np.sqrt(p * (1 - p) / n_games + z2_n / (4 * n_games))
+        return (p + z2_n / 2 + spread) / (1 + z2_n)
+
+
+SCORES: Dict[str, Score] = {
+    "win_rate": win_rate,
+    "expected_score": expected_score,
+    "wilson": wilson_upper_bound,
+}
+
+
+def reachable(store: NodeStore, thresh: int) -> np.ndarray:
+    """
+    Ids of the positions reached from the initial position through positions which
+    have at least thresh games, the initial position excluded.
+
+    The tree is walked breadth first, one level of positions per vectorised step.
+
+        Parameters:
+            store (NodeStore) : Positions of a tree.
+            thresh (int) : Minimal number of games of a position to be explored.
+
+        Returns:
+            ids (np.ndarray) : Sorted ids of the positions reached.
+    """
+    root = store.index(ROOT_KEY)
+    if root < 0:
+        return np.zeros(0, dtype=np.int64)
+    explored = store.n_games() >= thresh
+    seen = np.zeros(len(store), dtype=bool)
+    seen[root] = True
+    frontier = np.array([root], dtype=np.int64)
+    while len(frontier) > 0:
+        _, keys = store.gather(store.child_ptr, store.child_keys, frontier)
+        ids = np.minimum(np.searchsorted(store.hashes, keys), len(store) - 1)
+        ids = np.unique(ids[store.hashes[ids] == keys])
+        frontier = ids[explored[ids] & ~seen[ids]]
+        seen[frontier] = True
+    seen[root] = False
+    return np.flatnonzero(seen)
+
+
+def rank_positions(
+    store: NodeStore, thresh: int, k: int, score: Union[str, Score] = "win_rate"
+) -> np.ndarray:
+    """
+    Ids of the k worst positions of a tree where Hero is to move.
+
+        Parameters:
+            store (NodeStore) : Positions of a tree.
+            thresh (int) : Minimal number of games of a position to be considered.
+            k (int) : Number of positions returned.
+            score (Union[str, Score]) : Score of the positions or its name in SCORES.
+
+        Returns:
+            ids (np.ndarray) : Ids of the positions, from the worst one. Ties are
+                broken by Zobrist key.
+    """
+    score = SCORES[score] if isinstance(score, str) else score
+    ids = reachable(store, thresh)
+    ids = ids[~store.last_move_hero[ids]]
+    scores = score(store.counts[ids])
+    if len(ids) > k > 0:
+        # Only the positions scoring at most the k-th lowest score are sorted.
+        kth = np.partition(np.nan_to_num(scores, nan=np.inf), k - 1)[k - 1]
+        kept = scores <= kth
+        ids, scores = ids[kept], scores[kept]
+    order = np.lexsort((store.hashes[ids], scores))
+    return ids[order[:k]]
@@ -0,0 +1,236 @@
+"""TreeSnapshot class which keeps the game tree of a player on disk."""
+
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import DATA_FOLDER
+from src.explorer.game_tree import GameTree
+from src.explorer.node_store import NodeStore
+from src.explorer.pgn import PGN
+from src.preprocess.game_store import GameStore
+
+SNAPSHOT_FORMAT = 4
+MAGIC = b"GAMETREE"
+# Alignment of the arrays in a snapshot file, in bytes.
+ALIGNMENT = 64
+
+
+def data_offset(header_length: int) -> int:
+    """Offset of the arrays in a snapshot file whose header has header_length bytes."""
+    return -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(tree: GameTree, path: Path, **meta):
+    """
+    Atomically write a GameTree to a snapshot file.
+
+    The file holds a magic string, the length of a json header, the header and the
+    arrays of both compact trees and of the table of games, aligned on ALIGNMENT
+    bytes. The header records the format, the layout of the arrays, the opening
+    names and meta.
+
+        Parameters:
+            tree (GameTree) : Tree saved, compacted if needed.
+            path (Path) : Path of the snapshot file.
+            meta : Information saved in the header, returned by read_snapshot.
+    """
+    tree.compact()
+    links = [link.encode() for link in tree.games]
+    arrays = {
+        ("games", "link_ptr"): np.cumsum([0] + [len(l) for l in links], dtype=np.int64),
+        ("games", "link_bytes"): np.frombuffer(b"".join(links), dtype=np.uint8),
+        ("games", "months"): np.array(tree.game_months, dtype=np.int32),
+        ("games", "results"): np.array(tree.game_results, dtype=np.int8),
+    }
+    for color in ["white", "black"]:
+        for name, array in getattr(tree, color).arrays().items():
+            arrays[(color, name)] = np.ascontiguousarray(array)
+    layout, size = [], 0
+    for (group, name), array in arrays.items():
+        layout.append([group, name, array.dtype.str, list(array.shape), size])
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps(
+        {
+            "format": SNAPSHOT_FORMAT,
+            "meta": meta,
+            "n_examples": tree.n_examples,
+            "layout": layout,
+            "openings": {c: getattr(tree, c).openings for c in ["white", "black"]},
+        }
+    ).encode()
+    start = data_offset(len(header))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for (_, _, _, _, offset), array in zip(layout, arrays.values()):
+            f.seek(start + offset)
+            f.write(array.tobytes())
+        f.truncate(start + size)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: Path) -> Optional[Tuple[GameTree, Dict]]:
+    """
+    Load a GameTree from a snapshot file, its arrays being memory-mapped.
+
+        Parameters:
+            path (Path) : Path of the snapshot file.
+
+        Returns:
+            tree (GameTree) : Compact tree with read-only arrays.
+            meta (Dict) : Information saved with the tree.
+        Or None if the file does not exist or has another format.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    if header["format"] != SNAPSHOT_FORMAT:
+        return None
+    start = data_offset(length)
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {"games": {}, "white": {}, "black": {}}
+    for group, name, dtype, shape, offset in header["layout"]:
+        count = int(np.prod(shape))
+        array = np.frombuffer(data, dtype, count, start + offset)
+        arrays[group][name] = array.reshape(shape)
+    tree = GameTree(header["n_examples"])
+    link_ptr = arrays["games"]["link_ptr"].tolist()
+    link_bytes = arrays["games"]["link_bytes"].tobytes()
+    tree.games = [link_bytes[a:b].decode() for a, b in zip(link_ptr, link_ptr[1:])]
+    tree.game_months = arrays["games"]["months"].tolist()
+    tree.game_results = arrays["games"]["results"].tolist()
+    tree.white = NodeStore(arrays["white"], header["openings"]["white"])
+    tree.black = NodeStore(arrays["black"], header["openings"]["black"])
+    return tree, header["meta"]
+
+
+class TreeSnapshot:
+    """
+    TreeSnapshot class which keeps the game tree of a player on disk.
+
+    The snapshot of the tree built from the games of a GameStore is saved in
+    {data_folder}/{username}/trees/depth-{max_depth}-from-{start_month}.tree with the
+    number of games and the revision of each month it was built from, see GameStore.
+    Trees starting from different months are thus kept apart. When games were only
+    appended to months of the store, the games which are not in the tree yet are built
+    and merged into it, so repeated queries load a file instead of replaying games.
+    When a month was rewritten, eg: parsed again, the whole tree is built again.
+
+    Attributes
+    ----------
+    username (str) : Username of the player.
+    max_depth (int) : Maximum number of moves in the game used to build tree.
+    folder (Path) : Folder of the snapshot files of the player.
+    """
+
+    def __init__(self, username: str, max_depth: int, data_folder: str = DATA_FOLDER):
+        """
+        Construct the snapshot of a player for a depth.
+
+        Parameters
+        ----------
+            username : str
+                Username of the player in Chess.com.
+            max_depth : int
+                Maximum number of moves in the game used to build tree.
+            data_folder : str
+                Folder holding the stores of all players.
+        """
+        self.username = username
+        self.max_depth = max_depth
+        self.folder = Path(data_folder) / username.casefold() / "trees"
+
+    def path(self, start_month: str) -> Path:
+        """Path of the snapshot of the trees built from start_month."""
+        return self.folder / f"depth-{self.max_depth}-from-{start_month}.tree"
+
+    def load(self, start_month: str) -> Optional[GameTree]:
+        """Return the tree built from start_month as is, None if there is no snapshot."""
+        snapshot = read_snapshot(self.path(start_month))
+        return snapshot[0] if snapshot is not None else None
+
+    def update(
+        self,
+        store: GameStore,
+        start_month: str,
+        end_month: str,
+        build: Callable[[List[PGN]], GameTree],
+    ) -> GameTree:
+        """
+        Return the tree of the stored games of a period, updating the snapshot.
+
+            Parameters:
+                store (GameStore) : Store holding the games of the player.
+                start_month (str) : Start month in format YYYY-MM (eg: 2023-01).
+                end_month (str) : End month in format YYYY-MM (eg: 2023-01).
+                build (Callable[[List[PGN]], GameTree]) : Builds the tree of games.
+
+            Returns:
+                tree (GameTree) : Tree of the games of the period.
+        """
+        months = {}
+        for month in store.months():
+            if start_month <= month <= end_month:
+                state = store.month_state(month)
+                months[month] = [state["n_games"], state.get("revision", 0)]
+        # Player imports the fetcher and its HTTP stack, only needed to load games.
+        from src.explorer.player import Player
+
+        player = Player(self.username)
+        snapshot = read_snapshot(self.path(start_month))
+        if snapshot is not None:
+            tree, meta = snapshot
+            if meta["store_version"] == store.version and meta["months"] == months:
+                return tree
+            # Games of a snapshot are kept if its months were only appended to.
+            if all(
+                month in months
+                and months[month][1] == revision
+                and months[month][0] >= n_games
+                for month, (n_games, revision) in meta["months"].items()
+            ):
+                known = set(tree.games)
+                pgns = [
+                    pgn
+                    for month, n_games in months.items()
+                    if meta["months"].get(month) != n_games
+                    for pgn in player.load_from_store(store, month, month)
+                    if pgn.link not in known
+                ]
+                if len(pgns) > 0:
+                    tree += build(pgns)
+                self.save(tree, store, start_month, end_month, months)
+                return tree
+        tree = build(player.load_from_store(store, start_month, end_month))
+        self.save(tree, store, start_month, end_month, months)
+        return tree
+
+    def save(
+        self,
+        tree: GameTree,
+        store: GameStore,
+        start_month: str,
+        end_month: str,
+        months: Dict[str, List[int]],
+    ):
+        """Write the snapshot of a tree built from the months of a store."""
+        # pylint: disable=too-many-arguments
+        write_snapshot(
+            tree,
+            self.path(start_month),
+            store_version=store.version,
+            start_month=start_month,
+            end_month=end_month,
+            months=months,
+        )
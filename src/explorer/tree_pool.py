@@ -0,0 +1,230 @@
+"""TreePool class which builds game trees in a long-lived pool of processes."""
+
+from __future__ import annotations
+import atexit
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import threading
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from src.config import N_EXAMPLE_GAMES, N_PROCS, POOL_START_METHOD
+from src.explorer.game_tree import GameTree
+from src.explorer.node_store import NodeStore
+from src.explorer.pgn import PGN, PGNBatch
+
+# Alignment of the arrays in a shared memory block, in bytes.
+ALIGNMENT = 8
+
+
+class SharedStore(NamedTuple):
+    """Handle of a NodeStore copied in a shared memory block.
+
+    Attributes
+    ----------
+    name (str) : Name of the shared memory block.
+    layout (List[Tuple[str, str, Tuple[int, ...], int]]) : Name, dtype, shape and
+        offset in the block of each array.
+    openings (List[str]) : Distinct opening names of the store.
+    """
+
+    name: str
+    layout: List[Tuple[str, str, Tuple[int, ...], int]]
+    openings: List[str]
+
+
+SharedTree = Tuple[SharedStore, SharedStore]
+
+
+def share_store(store: NodeStore) -> SharedStore:
+    """
+    Copy the arrays of a NodeStore in a new shared memory block.
+
+        Parameters:
+            store (NodeStore) : Store to share.
+
+        Returns:
+            handle (SharedStore) : Handle to pass to attach_store.
+    """
+    arrays = store.arrays()
+    layout, size = [], 0
+    for name, array in arrays.items():
+        layout.append((name, array.dtype.str, array.shape, size))
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    shm = SharedMemory(create=True, size=max(size, 1))
+    for (name, dtype, shape, offset), array in zip(layout, arrays.values()):
+        np.ndarray(shape, dtype, shm.buf, offset)[...] = array
+    shm.close()
+    return SharedStore(shm.name, layout, store.openings)
+
+
+def attach_store(handle: SharedStore) -> NodeStore:
+    """
+    Copy a shared NodeStore out of its shared memory block, then free the block.
+
+        Parameters:
+            handle (SharedStore) : Handle returned by share_store.
+
+        Returns:
+            store (NodeStore) : Store owning its arrays.
+    """
+    shm = SharedMemory(handle.name)
+    try:
+        arrays = {
+            name: np.ndarray(shape, dtype, shm.buf, offset).copy()
+            for name, dtype, shape, offset in handle.layout
+        }
+    finally:
+        shm.close()
+        shm.unlink()
+    return NodeStore(arrays, handle.openings)
+
+
+def build_shared_tree(
+    pgns: PGNBatch, max_depth: int, first_game_id: int, n_examples: Optional[int]
+) -> SharedTree:
+    """Build the compact tree of a chunk of games, numbered from first_game_id."""
+    tree = GameTree(n_examples)
+    tree.add_pgns_to_tree(pgns, max_depth)
+    tree.compact()
+    tree.white.game_ids += np.int32(first_game_id)
+    tree.black.game_ids += np.int32(first_game_id)
+    return share_store(tree.white), share_store(tree.black)
+
+
+def merge_shared_trees(
+    left: SharedTree, right: SharedTree, n_examples: Optional[int]
+) -> SharedTree:
+    """Merge two shared compact trees, the game ids of right following those of left."""
+    white = attach_store(left[0]).merge(attach_store(right[0]), 0, n_examples)
+    black = attach_store(left[1]).merge(attach_store(right[1]), 0, n_examples)
+    return share_store(white), share_store(black)
+
+
+class TreePool:
+    """
+    TreePool class which builds game trees in a long-lived pool of processes.
+
+    The processes are started once, typically with the app, and reused by every build.
+    Games are cut in one chunk per process, each process builds the compact tree of its
+    chunk and the trees are merged pairwise inside the processes, in log2(n_procs)
+    rounds. Trees go through shared memory blocks, so only small handles are pickled
+    and the calling process only ever holds the final tree.
+
+    Attributes
+    ----------
+    n_procs (int) : Number of processes building trees.
+    n_examples (Optional[int]) : Maximum number of game ids kept per position.
+    """
+
+    def __init__(
+        self, n_procs: int = N_PROCS, n_examples: Optional[int] = N_EXAMPLE_GAMES
+    ):
+        """
+        Construct the pool, its processes are started by start or on first use.
+
+        Parameters
+        ----------
+            n_procs : int
+                Number of processes building trees.
+            n_examples : Optional[int]
+                Maximum number of game ids kept per position, see GameTree.
+        """
+        self.n_procs = n_procs
+        self.n_examples = n_examples
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Start the processes when entering the pool context."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop the processes when leaving the pool context."""
+        self.close()
+
+    def start(self) -> TreePool:
+        """Start the processes of the pool if they are not running."""
+        with self._lock:
+            if self._pool is None:
+                # Processes share the tracker of shared memory blocks of this process.
+                resource_tracker.ensure_running()
+                # Builds run in the threads of the app, forking them could copy locks
+                # held by other threads.
+                context = multiprocessing.get_context(POOL_START_METHOD)
+                self._pool = context.Pool(self.n_procs)
+                atexit.register(self.close)
+        return self
+
+    def close(self):
+        """Stop the processes of the pool."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def build(
+        self,
+        pgn_list: Union[PGNBatch, Iterable[PGN]],
+        max_depth: int,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> GameTree:
+        """
+        Build the tree of a list of games.
+
+            Parameters:
+                pgn_list (Union[PGNBatch, Iterable[PGN]]) : Games of Hero.
+                max_depth (int) : Maximum number of moves in the game used to build tree.
+                progress (Optional[Callable[[str, int, int], None]]) : Called with
+                    "building", the number of chunks built or merged and the number of
+                    chunks to build and merge.
+
+            Returns:
+                tree (GameTree) : Compact tree of the games.
+        """
+        pool = self.start()._pool
+        batch = pgn_list
+        if not isinstance(batch, PGNBatch):
+            batch = PGNBatch.from_pgns(pgn_list)
+        tree = GameTree(self.n_examples)
+        tree.games = list(batch.links)
+        tree.game_months = batch.month_ids.tolist()
+        tree.game_results = batch.result_ids.tolist()
+        if len(batch) == 0:
+            return tree.compact()
+        # At most one chunk per process and never an empty one.
+        cuts = np.linspace(0, len(batch), min(self.n_procs, len(batch)) + 1)
+        cuts = cuts.astype(int).tolist()
+        # Each chunk is built, then all but one are merged into another.
+        n_steps, n_done = 2 * (len(cuts) - 1) - 1, 0
+
+        def collect(result):
+            nonlocal n_done
+            shared = result.get()
+            n_done += 1
+            if progress is not None:
+                progress("building", n_done, n_steps)
+            return shared
+
+        results = [
+            pool.apply_async(
+                build_shared_tree, (batch[a:b], max_depth, a, self.n_examples)
+            )
+            for a, b in zip(cuts, cuts[1:])
+        ]
+        shared = [collect(result) for result in results]
+        while len(shared) > 1:
+            results = [
+                pool.apply_async(
+                    merge_shared_trees, (shared[i], shared[i + 1], self.n_examples)
+                )
+                for i in range(0, len(shared) - 1, 2)
+            ]
+            shared = [collect(result) for result in results] + shared[
+                len(results) * 2 :
+            ]
+        tree.white, tree.black = attach_store(shared[0][0]), attach_store(shared[0][1])
+        return tree
@@ -0,0 +1,117 @@
+"""RawArchive class which keeps the raw month PGN files downloaded for a player."""
+
+import gzip
+import io
+import mmap
+import os
+from pathlib import Path
+from typing import List, Optional, TextIO
+
+from src.config import DATA_FOLDER
+
+
+class MappedGzipFile(gzip.GzipFile):
+    """GzipFile decompressing a memory-mapped file, the map is closed with it."""
+
+    def __init__(self, mapped: mmap.mmap):
+        """Construct the file over a memory map, which it then owns."""
+        super().__init__(fileobj=mapped)
+        self.mapped = mapped
+
+    def close(self):
+        """Close the file and its memory map."""
+        try:
+            super().close()
+        finally:
+            self.mapped.close()
+
+
+class RawArchive:
+    """
+    RawArchive class which keeps the raw month PGN files downloaded for a player.
+
+    Each month is saved gzip compressed in {data_folder}/{username}/raw/{YYYY-MM}.pgn.gz
+    so that the whole history can be parsed again without requesting the API, for
+    instance after a fix in RegExtractor. Files are memory-mapped when read.
+
+    Attributes
+    ----------
+    username (str) : Username of the player.
+    folder (Path) : Folder holding the raw month files of the player.
+    """
+
+    def __init__(self, username: str, data_folder: str = DATA_FOLDER):
+        """
+        Construct the archive of a player.
+
+        Parameters
+        ----------
+            username : str
+                Username of the player in Chess.com.
+            data_folder : str
+                Folder holding the stores of all players.
+        """
+        self.username = username
+        self.folder = Path(data_folder) / username.casefold() / "raw"
+
+    def path(self, month: str) -> Path:
+        """Path of the raw file of a month."""
+        return self.folder / f"{month}.pgn.gz"
+
+    def months(self) -> List[str]:
+        """Return the archived months in chronological order."""
+        if not self.folder.exists():
+            return []
+        return sorted(
+            path.name[: -len(".pgn.gz")] for path in self.folder.glob("*.pgn.gz")
+        )
+
+    def put(self, month: str, pgn: str):
+        """
+        Atomically save the raw file of a month, replacing any previous version.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+                pgn (str) : Raw PGN multi-line string returned by the API.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.path(month)
+        tmp_path = path.with_suffix(".gz.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(pgn.encode("utf-8"), mtime=0))
+        os.replace(tmp_path, path)
+
+    def open(self, month: str) -> Optional[TextIO]:
+        """
+        Open the raw file of a month as a text stream decompressed on the fly.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+
+            Returns:
+                stream (Optional[TextIO]) : Stream over the raw file, None if the month
+                    is not archived. Closing it unmaps the file.
+        """
+        path = self.path(month)
+        if not path.exists() or path.stat().st_size == 0:
+            return None
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return io.TextIOWrapper(MappedGzipFile(mapped), encoding="utf-8", newline="")
+
+    def get(self, month: str) -> Optional[str]:
+        """
+        Read the raw file of a month.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+
+            Returns:
+                pgn (Optional[str]) : Raw PGN multi-line string, None if the month is
+                    not archived.
+        """
+        stream = self.open(month)
+        if stream is None:
+            return None
+        with stream:
+            return stream.read()
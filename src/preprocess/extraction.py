@@ -0,0 +1,138 @@
+"""ExtractionPool class which parses raw PGN files in a pool of processes."""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+import re
+from typing import List, Optional
+
+import pyarrow as pa
+
+from src.config import GAMES_PER_CHUNK, N_PARSE_PROCS, POOL_START_METHOD
+from src.explorer.moves import encode_game
+from src.preprocess.regextractor import RegExtractor
+from src.preprocess.writer import COLUMNS, SCHEMA
+
+EVENT_PATTERN = re.compile(r"^\[Event ", re.MULTILINE)
+
+
+def extract_records(pgns: str, username: str) -> pa.RecordBatch:
+    """
+    Parse a raw PGN multi-line string into a record batch.
+
+    Games which can not be parsed are skipped, as in Fetcher.iter_games.
+
+        Parameters:
+            pgns (str) : Raw PGN multi-line string.
+            username (str) : Username of the inspected player.
+
+        Returns:
+            batch (pa.RecordBatch) : Parsed games with schema SCHEMA.
+    """
+    columns = {col: [] for col in COLUMNS}
+    for pgn_txt in RegExtractor.iter_split(pgns):
+        try:
+            fields = RegExtractor.extract(pgn_txt, username)
+        except ValueError:
+            continue
+        for col, value in zip(COLUMNS, fields + (encode_game(fields[3]),)):
+            columns[col].append(value)
+    return pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+
+
+def split_chunks(pgns: str, games_per_chunk: int) -> List[str]:
+    """
+    Cut a raw PGN multi-line string on game boundaries into chunks of games.
+
+        Parameters:
+            pgns (str) : Raw PGN multi-line string.
+            games_per_chunk (int) : Maximum number of games per chunk.
+
+        Returns:
+            chunks (List[str]) : Consecutive parts of pgns.
+    """
+    starts = [match.start() for match in EVENT_PATTERN.finditer(pgns)]
+    cuts = starts[games_per_chunk::games_per_chunk]
+    return [pgns[a:b] for a, b in zip([0] + cuts, cuts + [len(pgns)])]
+
+
+class ExtractionPool:
+    """
+    ExtractionPool class which parses raw PGN files in a pool of processes.
+
+    Month files are cut into chunks of games which are parsed in parallel. Workers send
+    back Arrow record batches, which are much cheaper to transfer than PGN instances.
+    With one process or less, chunks are parsed in the calling process. Processes are
+    not forked from the calling process, which may run threads, see POOL_START_METHOD.
+
+    Attributes
+    ----------
+    username (str) : Username of the inspected player.
+    n_procs (int) : Number of processes parsing games.
+    games_per_chunk (int) : Maximum number of games per task sent to a process.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        n_procs: int = N_PARSE_PROCS,
+        games_per_chunk: int = GAMES_PER_CHUNK,
+    ):
+        """
+        Construct the pool, its processes are started on first use.
+
+        Parameters
+        ----------
+            username : str
+                Username of the inspected player.
+            n_procs : int
+                Number of processes parsing games.
+            games_per_chunk : int
+                Maximum number of games per task sent to a process.
+        """
+        self.username = username
+        self.n_procs = n_procs
+        self.games_per_chunk = games_per_chunk
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        """Enter the pool context."""
+        return self
+
+    def __exit__(self, *args):
+        """Stop the processes when leaving the pool context."""
+        self.close()
+
+    def submit(self, pgns: Optional[str]) -> List[Future]:
+        """
+        Schedule the parsing of a raw month file.
+
+            Parameters:
+                pgns (Optional[str]) : Raw PGN multi-line string.
+
+            Returns:
+                futures (List[Future]) : One future record batch per chunk, in order.
+        """
+        if pgns is None:
+            return []
+        chunks = split_chunks(pgns, self.games_per_chunk)
+        if self.n_procs <= 1:
+            futures = []
+            for chunk in chunks:
+                future = Future()
+                future.set_result(extract_records(chunk, self.username))
+                futures.append(future)
+            return futures
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.n_procs, multiprocessing.get_context(POOL_START_METHOD)
+            )
+        return [
+            self._executor.submit(extract_records, chunk, self.username)
+            for chunk in chunks
+        ]
+
+    def close(self):
+        """Stop the processes of the pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
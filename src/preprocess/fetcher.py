@@ -1,31 +1,94 @@
 """Downloader class that fetches PGN files from Chess.com."""
 
-from pathlib import Path
-from typing import Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
 
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
+from requests.adapters import HTTPAdapter
 
-from src.config import ADDRESS_ROOT, DATA_FOLDER
-from src.explorer.pgn import PGN
-from src.preprocess.regextractor import RegExtractor
+from src.config import (
+    ADDRESS_ROOT,
+    ARCHIVE_RAW_PGN,
+    DATA_FOLDER,
+    N_FETCH_WORKERS,
+    N_PARSE_PROCS,
+)
+from src.explorer.pgn import PGN, month_range
+from src.preprocess.archive import RawArchive
+from src.preprocess.extraction import ExtractionPool
+from src.preprocess.game_store import GameStore
+from src.preprocess.regextractor import PGNSource, RegExtractor
+from src.preprocess.scheduler import RequestScheduler
+
+# Usernames of Chess.com accounts, players of imported databases may have other names.
+USERNAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def utc_month() -> str:
+    """Current month in the format YYYY-MM, in UTC like the archives of the API."""
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+class MonthPayload(NamedTuple):
+    """Answer of the API for a month.
+
+    Attributes
+    ----------
+    pgn (Optional[str]) : Raw PGN multi-line string, None if empty or not modified.
+    etag (Optional[str]) : ETag header returned by the API.
+    last_modified (Optional[str]) : Last-Modified header returned by the API.
+    not_modified (bool) : True if the API answered 304 to a conditional request.
+    error (Optional[Exception]) : Error raised while requesting the month, if any.
+    """
+
+    pgn: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+    error: Optional[Exception] = None
 
 
 class Fetcher:
     """
     Fetcher class responsible to download all pgns over a given time period for a player.
 
-    Those PGNs are then aggregated into a csv with the following shape:
+    Those PGNs are then parsed and saved month by month in the GameStore of the player
+    with the following columns:
     color,result,link,game,month,opening
     black,win,https://link/to/game,d4 d5 Bf4 c5,Sicilian Defense
     ...
 
+    Months can be downloaded concurrently by a bounded pool of threads sharing a single
+    HTTP session, so that connections to the API are kept alive and reused. Requests go
+    through a RequestScheduler which keeps them within the rate limit of the API and
+    retries them when throttled. Each month is saved as soon as it is downloaded, so an
+    interrupted download resumes from the missing months.
+
     Attributes
     ----------
     username (str) : Username of the player.
+    address_root (str) : Root address of the API (eg: ADDRESS_ROOT).
+    store (GameStore) : Month partitioned store where games are saved.
+    archive (Optional[RawArchive]) : Archive where raw month files are kept, if any.
+    n_parse_procs (int) : Number of processes parsing the downloaded months.
+    session (requests.Session) : Pooled HTTP session used for all requests.
     """
 
-    def __init__(self, username: str):
+    def __init__(
+        self,
+        username: str,
+        address_root: str = ADDRESS_ROOT,
+        session: Optional[requests.Session] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        data_folder: str = DATA_FOLDER,
+        archive_raw: bool = ARCHIVE_RAW_PGN,
+        n_parse_procs: int = N_PARSE_PROCS,
+    ):
         """
         Construct the fetcher with the username.
 
@@ -33,64 +96,342 @@ class Fetcher:
         ----------
             username : str
                 Username of the player in Chess.com.
+            address_root : str
+                Root address of the API, can point to a local server for testing.
+            session : Optional[requests.Session]
+                HTTP session to reuse, a pooled one is created if not provided.
+            scheduler : Optional[RequestScheduler]
+                Scheduler of the requests, the one shared by the process by default.
+            data_folder : str
+                Folder holding the game stores.
+            archive_raw : bool
+                Keep the raw month files so that they can be parsed again offline.
+            n_parse_procs : int
+                Number of processes parsing the downloaded months.
         """
         self.username = username
+        self.address_root = address_root
+        self.session = session if session is not None else self.make_session()
+        self.scheduler = (
+            scheduler if scheduler is not None else RequestScheduler.default()
+        )
+        self.store = GameStore(username, data_folder)
+        self.archive = RawArchive(username, data_folder) if archive_raw else None
+        self.n_parse_procs = n_parse_procs
 
-    def download_month(self, year_month: str) -> Optional[str]:
+    @staticmethod
+    def make_session(pool_size: int = N_FETCH_WORKERS) -> requests.Session:
         """
-        Download the raw file containing all player PGNs for a given month.
+        Create an HTTP session keeping up to pool_size connections alive.
 
-        Note: this is the only way to request games via the Chess.com public API for now.
+            Parameters:
+                pool_size (int) : Maximum number of connections kept per host.
+
+            Returns:
+                session (requests.Session) : Session with a pooled adapter mounted.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch_month(
+        self,
+        year_month: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> MonthPayload:
+        """
+        Request the raw file of a month, conditionally if validators are provided.
 
             Parameters:
                 year_month (str) : Year and month for which we request PGNs, it is in
                     the format YYYY-MM (eg: 2023-01).
+                etag (Optional[str]) : ETag of the stored version of the month.
+                last_modified (Optional[str]) : Last-Modified of the stored version.
 
             Returns:
-                pgn (str) : Raw PGN multi-line string for the month with multiple PGNs
-                    if history exists, else None.
+                payload (MonthPayload) : PGNs of the month and their validators.
         """
         year_str, month_str = year_month.split("-")
-        address = f"{ADDRESS_ROOT}/{self.username}/games/{year_str}/{month_str}/pgn"
-        req = requests.get(address, timeout=5)
+        address = (
+            f"{self.address_root}/{self.username}/games/{year_str}/{month_str}/pgn"
+        )
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        req = self.scheduler.get(self.session, address, headers=headers, timeout=5)
+        validators = (req.headers.get("ETag"), req.headers.get("Last-Modified"))
+        # Stored version is still up to date.
+        if req.status_code == 304:
+            return MonthPayload(None, etag, last_modified, not_modified=True)
         # API didn't return anything
         if req.status_code != 200:
             req.raise_for_status()
         # API returned a file of PGN
         pgn = req.text
-        if len(pgn) == 0:
-            return None
-        return pgn
+        return MonthPayload(pgn if len(pgn) > 0 else None, *validators)
 
-    def download_history(self, start, end):
+    def download_month(self, year_month: str) -> Optional[str]:
         """
-        Download all the history for a player over a time period and saves it in a csv.
+        Download the raw file containing all player PGNs for a given month.
 
-        The csv is save in the data folder with filename = {self.username}.csv.
-        The format of the csv is the following:
-        color,result,link,game,month,opening
-        black,win,https://link/to/game,d4 d5 Bf4 c5,Sicilian Defense
+        Note: this is the only way to request games via the Chess.com public API for now.
 
             Parameters:
-                start (str) : Start month in format YYYY-MM (eg: 2023-01).
-                end (str) : End month in format YYYY-MM (eg: 2023-01).
+                year_month (str) : Year and month for which we request PGNs, it is in
+                    the format YYYY-MM (eg: 2023-01).
+
+            Returns:
+                pgn (str) : Raw PGN multi-line string for the month with multiple PGNs
+                    if history exists, else None.
         """
-        month_list = pd.date_range(start, end, freq="MS").strftime("%Y-%m").tolist()
-        pgn_df = pd.DataFrame(
-            columns=["color", "result", "link", "game", "month", "opening"]
-        )
-        for y_m in month_list:
-            pgns = self.download_month(y_m)
-            if pgns is not None:
+        return self.fetch_month(year_month).pgn
+
+    def fetch_months(
+        self,
+        month_list: List[str],
+        validators: Optional[Dict[str, Dict[str, str]]] = None,
+        n_workers: int = N_FETCH_WORKERS,
+    ) -> Iterator[MonthPayload]:
+        """
+        Request several months, possibly concurrently.
+
+        A month which could not be downloaded does not stop the others, its error is
+        stored in its payload instead.
+
+            Parameters:
+                month_list (List[str]) : Months in the format YYYY-MM (eg: 2023-01).
+                validators (Optional[Dict[str, Dict[str, str]]]) : Per month "etag"
+                    and "last_modified" of the stored versions.
+                n_workers (int) : Maximum number of months downloaded at the same
+                    time, months are downloaded one by one if lower or equal to 1.
+
+            Returns:
+                payloads (Iterator[MonthPayload]) : Answers in the same order as
+                    month_list, each one yielded as soon as it is available.
+        """
+        validators = validators or {}
+
+        def fetch(y_m: str) -> MonthPayload:
+            month_state = validators.get(y_m, {})
+            try:
+                return self.fetch_month(
+                    y_m, month_state.get("etag"), month_state.get("last_modified")
+                )
+            except requests.RequestException as error:
+                return MonthPayload(None, error=error)
+
+        if n_workers <= 1 or len(month_list) <= 1:
+            for y_m in month_list:
+                yield fetch(y_m)
+            return
+        with ThreadPoolExecutor(max_workers=min(n_workers, len(month_list))) as pool:
+            # map yields results in submission order whatever the completion order.
+            yield from pool.map(fetch, month_list)
+
+    def download_months(
+        self, month_list: List[str], n_workers: int = N_FETCH_WORKERS
+    ) -> List[Optional[str]]:
+        """
+        Download the raw PGN files of several months, possibly concurrently.
+
+            Parameters:
+                month_list (List[str]) : Months in the format YYYY-MM (eg: 2023-01).
+                n_workers (int) : Maximum number of months downloaded at the same
+                    time, months are downloaded one by one if lower or equal to 1.
+
+            Returns:
+                pgns (List[Optional[str]]) : Raw PGN multi-line strings (or None) in
+                    the same order as month_list.
+        """
+        pgns = []
+        for payload in self.fetch_months(month_list, n_workers=n_workers):
+            if payload.error is not None:
+                raise payload.error
+            pgns.append(payload.pgn)
+        return pgns
+
+    def iter_games(self, sources: Iterable[Optional[PGNSource]]) -> Iterator[PGN]:
+        """
+        Parse raw month files into games, one at a time.
+
+            Parameters:
+                sources (Iterable[Optional[PGNSource]]) : Raw PGN multi-line strings or
+                    streams, read one game at a time.
+
+            Returns:
+                games (Iterator[PGN]) : Parsed games, in order.
+        """
+        for source in sources:
+            if source is not None:
                 # Spliting multi pgn file in individual PGN blocks.
-                for pgn_txt in RegExtractor.split(pgns):
-                    # TODO: better error handling here to fix extractor.
+                for pgn_txt in RegExtractor.iter_split(source):
+                    # Games which can not be attributed to the player are skipped.
                     try:
                         pgn = PGN.extract_from_txt(pgn_txt, self.username)
-                        # Adding a row to the csv.
-                        pgn_df = pd.concat(
-                            [pgn_df, pd.DataFrame(pgn.__dict__, index=[0])]
-                        )
-                    except:
-                        pass
-        pgn_df.to_csv(Path(DATA_FOLDER) / f"{self.username}.csv", index=False)
+                    except ValueError:
+                        continue
+                    yield pgn
+
+    def download_history(self, start, end, n_workers: int = N_FETCH_WORKERS):
+        """
+        Download all the history for a player over a time period and saves it.
+
+        Every month of the period is saved as a partition of the GameStore of the player,
+        whether it was already stored or not.
+
+            Parameters:
+                start (str) : Start month in format YYYY-MM (eg: 2023-01).
+                end (str) : End month in format YYYY-MM (eg: 2023-01).
+                n_workers (int) : Maximum number of months downloaded at the same time.
+        """
+        month_list = month_range(start, end)
+        payloads = self.fetch_months(month_list, n_workers=n_workers)
+        self.store_months(month_list, payloads, utc_month())
+
+    def sync_history(
+        self,
+        start: str,
+        end: str,
+        n_workers: int = N_FETCH_WORKERS,
+        current_month: Optional[str] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ):
+        """
+        Bring the store of the player up to date without downloading it all again.
+
+        Only months missing from the store and months which were not over when they
+        were fetched are requested. The latter are requested conditionally so that they
+        cost an empty 304 answer if nothing changed.
+
+            Parameters:
+                start (str) : Start month in format YYYY-MM (eg: 2023-01).
+                end (str) : End month in format YYYY-MM (eg: 2023-01).
+                n_workers (int) : Maximum number of months downloaded at the same time.
+                current_month (Optional[str]) : Month still in progress, defaults to the
+                    current month in UTC.
+                progress (Optional[Callable[[str, int, int], None]]) : Called with a
+                    stage, the number of months done and the number of months of the
+                    stage, see store_months.
+        """
+        # pylint: disable=too-many-arguments
+        if current_month is None:
+            current_month = utc_month()
+        month_list = month_range(start, end)
+        to_fetch = []
+        for y_m in month_list:
+            state = self.store.month_state(y_m)
+            if state is None or not state.get("complete", False):
+                to_fetch.append(y_m)
+        validators = {y_m: self.store.month_state(y_m) or {} for y_m in to_fetch}
+        payloads = self.fetch_months(to_fetch, validators, n_workers)
+        self.store_months(to_fetch, payloads, current_month, progress)
+
+    def store_months(
+        self,
+        month_list: List[str],
+        payloads: Iterable[MonthPayload],
+        current_month: str,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+    ):
+        """
+        Parse the payloads of the API and save them in the store, month by month.
+
+        Months are sent to the ExtractionPool as soon as their payload is available, and
+        each month is saved once all its chunks are parsed. Months which could not be
+        downloaded are not saved, so that they are requested again by the next sync,
+        and the first of their errors is raised once all other months are saved.
+
+            Parameters:
+                month_list (List[str]) : Months in the format YYYY-MM (eg: 2023-01).
+                payloads (Iterable[MonthPayload]) : Answers of the API for month_list.
+                current_month (str) : Month still in progress.
+                progress (Optional[Callable[[str, int, int], None]]) : Called with
+                    "fetching" and the number of months downloaded out of month_list,
+                    and with "parsing" and the number of months saved out of the ones
+                    sent to parsing so far.
+        """
+        errors = []
+        # Months being parsed, in order, with their catalog entry and future batches.
+        parsing = deque()
+        n_parsed, n_sent = 0, 0
+
+        def write_parsed():
+            nonlocal n_parsed
+            self._write_parsed(*parsing.popleft())
+            n_parsed += 1
+            if progress is not None:
+                progress("parsing", n_parsed, n_sent)
+
+        with ExtractionPool(self.username, self.n_parse_procs) as pool:
+            for i, (y_m, payload) in enumerate(zip(month_list, payloads)):
+                if progress is not None:
+                    progress("fetching", i + 1, len(month_list))
+                if payload.error is not None:
+                    errors.append(payload.error)
+                    continue
+                state = {
+                    "etag": payload.etag,
+                    "last_modified": payload.last_modified,
+                    "complete": y_m < current_month,
+                }
+                if payload.not_modified:
+                    self.store.update_month_state(y_m, complete=state["complete"])
+                    continue
+                if self.archive is not None and payload.pgn is not None:
+                    self.archive.put(y_m, payload.pgn)
+                parsing.append((y_m, state, pool.submit(payload.pgn)))
+                n_sent += 1
+                while len(parsing) > 0 and all(f.done() for f in parsing[0][2]):
+                    write_parsed()
+            while len(parsing) > 0:
+                write_parsed()
+        if len(errors) > 0:
+            raise errors[0]
+
+    def _write_parsed(self, month: str, state: Dict, futures: List[Future]):
+        """Save a month once the record batches of all its chunks are parsed."""
+        batches = [f.result() for f in futures]
+        imported = self.store.imported(month)
+        appended = self.store.keeps_month(month, batches, merged=imported)
+        if imported:
+            # Games imported from local databases are kept after the ones of the API,
+            # which are kept on a link collision.
+            batches = batches + self.store.read_month(month).to_batches()
+            state = dict(state, imported=True)
+        self.store.write_month(month, batches, appended=appended, **state)
+
+    def reprocess(self, start: str = "0000-00", end: str = "9999-99"):
+        """
+        Parse again the archived raw month files and rebuild their partitions.
+
+        No request is made to the API, the catalog entries of the months are kept but
+        their revision, since games may have changed. Imported games of a month which
+        are not in its raw file are kept.
+
+            Parameters:
+                start (str) : Start month in format YYYY-MM (eg: 2023-01).
+                end (str) : End month in format YYYY-MM (eg: 2023-01).
+        """
+        if self.archive is None:
+            raise ValueError("Raw month files are not archived by this Fetcher.")
+        for y_m in self.archive.months():
+            if start <= y_m <= end:
+                state = dict(self.store.month_state(y_m) or {})
+                state.pop("n_games", None)
+                stream = self.archive.open(y_m)
+                if stream is None:
+                    continue
+                with stream:
+                    games = list(self.iter_games([stream]))
+                records = games
+                if state.get("imported", False):
+                    stored = self.store.read_month(y_m)
+                    links = pa.array([pgn.link for pgn in games], pa.string())
+                    kept = stored.filter(pc.invert(pc.is_in(stored["link"], links)))
+                    records = games + kept.to_batches()
+                self.store.write_month(y_m, records, **state)
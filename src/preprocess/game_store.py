@@ -0,0 +1,240 @@
+"""GameStore class which stores the games of a player partitioned by month."""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.config import DATA_FOLDER
+from src.explorer.pgn import PGN
+from src.preprocess.writer import SCHEMA, BatchWriter
+
+CATALOG_VERSION = 1
+
+
+class GameStore:
+    """
+    GameStore class which stores the games of a player partitioned by month.
+
+    Each month is an uncompressed Arrow IPC file {data_folder}/{username}/{YYYY-MM}.arrow
+    which is memory-mapped when read, so that range queries only touch the months
+    requested and never re-parse text. A small json catalog next to the partitions
+    records which months are stored, their number of games, their revision and the
+    validators returned by the API when they were fetched:
+    {"format": 1, "version": 3, "months": {"2023-01": {"n_games": 42, ...}}}
+    The revision of a month is the version of the store when its games were last
+    replaced, it is kept when games are only appended to the month. Usernames are not
+    case sensitive, so the folder of a player is named after its casefolded username.
+
+    Attributes
+    ----------
+    username (str) : Username of the player.
+    folder (Path) : Folder holding the partitions and the catalog of the player.
+    catalog (Dict) : Content of the catalog.
+    """
+
+    def __init__(self, username: str, data_folder: str = DATA_FOLDER):
+        """
+        Construct the store of a player, loading its catalog if it exists.
+
+        Parameters
+        ----------
+            username : str
+                Username of the player in Chess.com.
+            data_folder : str
+                Folder holding the stores of all players.
+        """
+        self.username = username
+        self.folder = Path(data_folder) / username.casefold()
+        self.catalog = self.load_catalog()
+
+    @property
+    def catalog_path(self) -> Path:
+        """Path of the catalog of the player."""
+        return self.folder / "catalog.json"
+
+    @property
+    def version(self) -> int:
+        """Number of writes to the store, it changes whenever stored games change."""
+        return self.catalog["version"]
+
+    def load_catalog(self) -> Dict:
+        """
+        Load the catalog from disk, or an empty one if the store does not exist.
+
+            Returns:
+                catalog (Dict) : Content of the catalog.
+        """
+        if not self.catalog_path.exists():
+            return {"format": CATALOG_VERSION, "version": 0, "months": {}}
+        with open(self.catalog_path, "r") as f:
+            return json.load(f)
+
+    def save_catalog(self):
+        """Atomically write the catalog to disk."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.catalog_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.catalog, f, indent=1)
+        os.replace(tmp_path, self.catalog_path)
+
+    def exists(self) -> bool:
+        """Return True if some months have already been stored."""
+        return len(self.catalog["months"]) > 0
+
+    def months(self) -> List[str]:
+        """Return the stored months in chronological order."""
+        return sorted(self.catalog["months"])
+
+    def month_state(self, month: str) -> Optional[Dict]:
+        """Return the catalog entry of a month, None if it is not stored."""
+        return self.catalog["months"].get(month)
+
+    def imported(self, month: Optional[str] = None) -> bool:
+        """Return True if games of a month, or of any month, were imported locally."""
+        if month is not None:
+            return (self.month_state(month) or {}).get("imported", False)
+        return any(
+            state.get("imported", False) for state in self.catalog["months"].values()
+        )
+
+    def partition_path(self, month: str) -> Path:
+        """Path of the partition of a month."""
+        return self.folder / f"{month}.arrow"
+
+    def write_month(
+        self,
+        month: str,
+        records: Iterable[Union[PGN, pa.RecordBatch]],
+        appended: bool = False,
+        save: bool = True,
+        **state,
+    ):
+        """
+        Replace the partition of a month by the given games.
+
+        Games are streamed to disk in batches and duplicated links are dropped.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+                records (Iterable[Union[PGN, pa.RecordBatch]]) : Games of the month,
+                    one by one or already gathered in record batches.
+                appended (bool) : True if all the games stored for the month are among
+                    records unchanged, so that the revision of the month is kept.
+                save (bool) : Save the catalog, else it is left to the caller when
+                    several months are written.
+                state : Extra information saved in the catalog entry of the month.
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.partition_path(month)
+        tmp_path = path.with_suffix(".arrow.tmp")
+        with BatchWriter(tmp_path, dedupe_on="link") as writer:
+            for record in records:
+                if isinstance(record, pa.RecordBatch):
+                    writer.write_batch(record)
+                else:
+                    writer.write(record)
+        os.replace(tmp_path, path)
+        self.catalog["version"] += 1
+        revision = self.catalog["version"]
+        previous = self.catalog["months"].get(month)
+        if appended and previous is not None:
+            revision = previous.get("revision", 0)
+        self.catalog["months"][month] = {
+            "n_games": writer.n_written,
+            **state,
+            "revision": revision,
+        }
+        if save:
+            self.save_catalog()
+
+    def keeps_month(
+        self, month: str, batches: List[pa.RecordBatch], merged: bool = False
+    ) -> bool:
+        """
+        Return True if all the games stored for a month are kept by writing new ones.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+                batches (List[pa.RecordBatch]) : New games of the month.
+                merged (bool) : True if the stored games are written after the new
+                    ones, so that only those whose link is among them are replaced.
+
+            Returns:
+                keeps (bool) : True if writing batches only appends games to the month.
+        """
+        if month not in self.catalog["months"]:
+            return True
+        stored = self.read_month(month)
+        new = pa.Table.from_batches(batches, schema=SCHEMA)
+        # Stored games are found by link, and their moves tell edited games apart.
+        kept = pc.is_in(self.game_keys(stored), value_set=self.game_keys(new))
+        if merged:
+            replaced = pc.is_in(stored["link"], value_set=new["link"])
+            kept = pc.or_(kept, pc.invert(replaced))
+        return pc.all(kept, min_count=0).as_py()
+
+    @staticmethod
+    def game_keys(table: pa.Table) -> pa.ChunkedArray:
+        """Link and SAN moves of each game, which change when a game is edited."""
+        return pc.binary_join_element_wise(table["link"], table["game"], "\n")
+
+    def update_month_state(self, month: str, **state):
+        """
+        Update the catalog entry of a stored month without touching its games.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+                state : Information updated in the catalog entry of the month.
+        """
+        self.catalog["months"][month].update(state)
+        self.save_catalog()
+
+    def read_month(self, month: str, memory_map: bool = True) -> pa.Table:
+        """
+        Read the games of a stored month.
+
+        Partitions written before the moves column existed get a null one, so that
+        their games are replayed from SAN.
+
+            Parameters:
+                month (str) : Month in the format YYYY-MM (eg: 2023-01).
+                memory_map (bool) : Map the partition in memory instead of reading it.
+
+            Returns:
+                table (pa.Table) : Games of the month with schema SCHEMA.
+        """
+        path = str(self.partition_path(month))
+        source = pa.memory_map(path, "r") if memory_map else pa.OSFile(path, "rb")
+        table = pa.ipc.open_file(source).read_all()
+        if "moves" not in table.column_names:
+            table = table.append_column(
+                SCHEMA.field("moves"), pa.nulls(table.num_rows, pa.binary())
+            )
+        return table
+
+    def read_range(
+        self, start_month: str, end_month: str, memory_map: bool = True
+    ) -> pa.Table:
+        """
+        Read the games of the stored months between start_month and end_month.
+
+            Parameters:
+                start_month (str) : Start month in format YYYY-MM (eg: 2023-01).
+                end_month (str) : End month in format YYYY-MM (eg: 2023-01).
+                memory_map (bool) : Map the partitions in memory instead of reading them.
+
+            Returns:
+                table (pa.Table) : Games of the period with schema SCHEMA.
+        """
+        tables = [
+            self.read_month(month, memory_map)
+            for month in self.months()
+            if start_month <= month <= end_month
+        ]
+        if len(tables) == 0:
+            return SCHEMA.empty_table()
+        return pa.concat_tables(tables)
@@ -0,0 +1,338 @@
+"""Bulk importer of local PGN databases into the game stores of their players."""
+
+import argparse
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from itertools import groupby
+import mmap
+import multiprocessing
+import os
+from pathlib import Path
+import re
+import tempfile
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pyarrow as pa
+
+from src.config import (
+    DATA_FOLDER,
+    IMPORT_BUFFER_GAMES,
+    IMPORT_CHUNK_BYTES,
+    N_PARSE_PROCS,
+    POOL_START_METHOD,
+)
+from src.explorer.moves import encode_game
+from src.preprocess.game_store import GameStore
+from src.preprocess.regextractor import RegExtractor
+from src.preprocess.writer import COLUMNS, SCHEMA, BatchWriter
+
+# Comments, variations (innermost first) and rest of line comments of the movetext.
+ANNOTATION_PATTERN = re.compile(r"\{[^}]*\}|\([^()]*\)|;[^\n]*")
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+FLIPPED_RESULTS = {"win": "lose", "lose": "win", "draw": "draw"}
+
+Partition = Tuple[str, str]
+# Memory-mapped file of spilled games, its table and the rows of each partition.
+Run = Tuple[pa.MemoryMappedFile, pa.Table, Dict[Partition, Tuple[int, int]]]
+
+
+class ImportStats(NamedTuple):
+    """Summary of an import.
+
+    Attributes
+    ----------
+    n_games (int) : Number of games parsed.
+    n_records (int) : Number of games attributed to a player, at most two per game.
+    n_players (int) : Number of players whose store was updated.
+    seconds (float) : Duration of the import.
+    """
+
+    n_games: int
+    n_records: int
+    n_players: int
+    seconds: float
+
+    @property
+    def games_per_second(self) -> float:
+        """Throughput of the import."""
+        return self.n_games / self.seconds if self.seconds > 0 else 0.0
+
+
+def find_chunks(path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Cut a PGN file in byte ranges of about chunk_bytes which start with a game.
+
+        Parameters:
+            path (str) : Path of the PGN file.
+            chunk_bytes (int) : Target size of a chunk.
+
+        Returns:
+            chunks (List[Tuple[int, int]]) : Start and end offsets of the chunks.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        cuts = [0]
+        while cuts[-1] + chunk_bytes < size:
+            cut = m.find(b"\n[Event ", cuts[-1] + chunk_bytes)
+            if cut == -1:
+                break
+            cuts.append(cut + 1)
+    return list(zip(cuts, cuts[1:] + [size]))
+
+
+def game_record(pgn_txt: str) -> Optional[Tuple[str, str, Tuple[str, ...]]]:
+    """
+    Parse a game of any PGN database from the point of view of White.
+
+    Chess.com tags are used when present, with fallbacks on standard PGN tags: Date for
+    the month, Site or the seven tag roster followed by a digest of the moves for the
+    link, Opening or ECO for the opening. Comments and variations are removed from the
+    movetext.
+
+        Parameters:
+            pgn_txt (str) : Individual raw pgn.
+
+        Returns:
+            record (Optional[Tuple[str, str, Tuple[str, ...]]]) : White, Black and the
+                fields of the game ordered as COLUMNS for White, None if the game can
+                not be attributed to a month or to its players.
+    """
+    headers, end = RegExtractor.parse_headers(pgn_txt)
+    white, black = headers.get("White", "?"), headers.get("Black", "?")
+    month = (headers.get("UTCDate") or headers.get("Date", "")).replace(".", "-")[:7]
+    if not MONTH_PATTERN.match(month):
+        return None
+    eco_url = RegExtractor.ECO_OPENING_PATTERN.search(headers.get("ECOUrl", ""))
+    if eco_url is not None:
+        opening = eco_url.group(1).replace("-", " ")
+    else:
+        opening = headers.get("Opening") or headers.get("ECO", "")
+    movetext, n_subs = pgn_txt[end:], 1
+    while n_subs > 0:
+        movetext, n_subs = ANNOTATION_PATTERN.subn(" ", movetext)
+    game = " ".join(RegExtractor.MOVE_PATTERN.findall(movetext))
+    result = {"1-0": "win", "0-1": "lose", "1/2-1/2": "draw"}.get(headers.get("Result"))
+    if result is None:
+        return None
+    link = headers.get("Link") or headers.get("Site", "")
+    if not link.startswith("http"):
+        # Rematches of a day share their roster when rounds are not numbered.
+        roster = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+        digest = hashlib.blake2b(game.encode(), digest_size=8).hexdigest()
+        link = "|".join([headers.get(tag, "?") for tag in roster] + [digest])
+    moves = encode_game(game)
+    return white, black, ("white", result, link.lower(), game, month, opening, moves)
+
+
+def parse_chunk(
+    path: str, start: int, end: int
+) -> Tuple[int, Dict[Partition, pa.RecordBatch]]:
+    """
+    Parse the games of a byte range of a PGN file, attributing them to both players.
+
+        Parameters:
+            path (str) : Path of the PGN file.
+            start (int) : Offset of the first byte of the range.
+            end (int) : Offset after the last byte of the range.
+
+        Returns:
+            n_games (int) : Number of games in the range.
+            batches (Dict[Partition, pa.RecordBatch]) : Games by (username, month).
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        text = m[start:end].decode("utf-8", errors="replace")
+    partitions = defaultdict(lambda: {col: [] for col in COLUMNS})
+    n_games = 0
+    for pgn_txt in RegExtractor.iter_split(text):
+        n_games += 1
+        record = game_record(pgn_txt)
+        if record is None:
+            continue
+        white, black, fields = record
+        black_fields = ("black", FLIPPED_RESULTS[fields[1]]) + fields[2:]
+        for player, player_fields in [(white, fields), (black, black_fields)]:
+            if player in ("", "?") or "/" in player or player.startswith("."):
+                continue
+            # Player names are matched regardless of their case, as in RegExtractor.
+            columns = partitions[(player.casefold(), fields[4])]
+            for col, value in zip(COLUMNS, player_fields):
+                columns[col].append(value)
+    return n_games, {
+        partition: pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+        for partition, columns in partitions.items()
+    }
+
+
+class PGNImporter:
+    """
+    Bulk importer of local PGN databases into the game stores of their players.
+
+    The file is memory-mapped and cut in chunks on game boundaries, chunks are parsed
+    in a pool of processes and every game is attributed to both of its players. Parsed
+    games are buffered by (player, month) and spilled to temporary files sorted by
+    partition when the buffer is full. Once the file is parsed, each partition of the
+    game stores is written once, merging its stored games with the spilled and buffered
+    ones, deduplicated by link, and each catalog is saved once. Imported months are not marked as complete, so an
+    online sync of a player adds the games of Chess.com to them.
+
+    Attributes
+    ----------
+    data_folder (str) : Folder holding the game stores.
+    n_procs (int) : Number of processes parsing games.
+    chunk_bytes (int) : Target size of the chunks sent to a process.
+    buffer_games (int) : Number of buffered games above which they are spilled.
+    """
+
+    def __init__(
+        self,
+        data_folder: str = DATA_FOLDER,
+        n_procs: int = N_PARSE_PROCS,
+        chunk_bytes: int = IMPORT_CHUNK_BYTES,
+        buffer_games: int = IMPORT_BUFFER_GAMES,
+    ):
+        """
+        Construct the importer.
+
+        Parameters
+        ----------
+            data_folder : str
+                Folder holding the game stores.
+            n_procs : int
+                Number of processes parsing games.
+            chunk_bytes : int
+                Target size of the chunks sent to a process.
+            buffer_games : int
+                Number of buffered games above which they are spilled to a file.
+        """
+        self.data_folder = data_folder
+        self.n_procs = n_procs
+        self.chunk_bytes = chunk_bytes
+        self.buffer_games = buffer_games
+
+    def iter_parsed(self, path: str) -> Iterator[Tuple[int, Dict]]:
+        """Yield the number of games and the parsed batches of each chunk, in order."""
+        chunks = find_chunks(path, self.chunk_bytes)
+        if self.n_procs <= 1:
+            for start, end in chunks:
+                yield parse_chunk(path, start, end)
+            return
+        context = multiprocessing.get_context(POOL_START_METHOD)
+        with ProcessPoolExecutor(self.n_procs, context) as pool:
+            # Chunks are submitted as results are consumed, so that few parsed chunks
+            # wait in memory.
+            parsing = deque()
+            for start, end in chunks:
+                parsing.append(pool.submit(parse_chunk, path, start, end))
+                if len(parsing) >= 2 * self.n_procs:
+                    yield parsing.popleft().result()
+            while len(parsing) > 0:
+                yield parsing.popleft().result()
+
+    @staticmethod
+    def spill(buffer: Dict[Partition, List[pa.RecordBatch]], path: Path) -> Run:
+        """Write buffered batches to a file, sorted by partition, and map it back."""
+        index = {}
+        with BatchWriter(path) as writer:
+            for partition, batches in sorted(buffer.items()):
+                start = writer.n_written
+                for batch in batches:
+                    writer.write_batch(batch)
+                index[partition] = (start, writer.n_written - start)
+        source = pa.memory_map(str(path), "r")
+        return source, pa.ipc.open_file(source).read_all(), index
+
+    def write(
+        self, runs: List[Run], buffer: Dict[Partition, List[pa.RecordBatch]]
+    ) -> set:
+        """
+        Write each partition once, its stored games first, return the players updated.
+
+            Parameters:
+                runs (List[Run]) : Games spilled to temporary files.
+                buffer (Dict[Partition, List[pa.RecordBatch]]) : Games not spilled.
+
+            Returns:
+                players (set) : Players whose store was updated.
+        """
+        partitions = set(buffer).union(*(index for _, _, index in runs))
+        players = set()
+        for player, player_partitions in groupby(sorted(partitions), lambda p: p[0]):
+            store = GameStore(player, self.data_folder)
+            for partition in player_partitions:
+                month = partition[1]
+                state = dict(store.month_state(month) or {})
+                state.pop("n_games", None)
+                state.update(imported=True)
+                batches = []
+                if month in store.catalog["months"]:
+                    batches += store.read_month(month).to_batches()
+                for _, table, index in runs:
+                    if partition in index:
+                        batches += table.slice(*index[partition]).to_batches()
+                batches += buffer.get(partition, [])
+                store.write_month(month, batches, appended=True, save=False, **state)
+            store.save_catalog()
+            players.add(player)
+        return players
+
+    def run(self, path: str, verbose: bool = False) -> ImportStats:
+        """
+        Import all games of a PGN file.
+
+            Parameters:
+                path (str) : Path of the PGN file.
+                verbose (bool) : Print the throughput after each chunk.
+
+            Returns:
+                stats (ImportStats) : Summary of the import.
+        """
+        start = time.perf_counter()
+        n_games, n_records = 0, 0
+        buffer, n_buffered, runs = defaultdict(list), 0, []
+        Path(self.data_folder).mkdir(parents=True, exist_ok=True)
+        # Player folders never start with a dot, see parse_chunk.
+        with tempfile.TemporaryDirectory(
+            prefix=".import-", dir=self.data_folder
+        ) as tmp:
+            try:
+                for chunk_games, batches in self.iter_parsed(path):
+                    n_games += chunk_games
+                    for partition, batch in batches.items():
+                        buffer[partition].append(batch)
+                        n_buffered += batch.num_rows
+                    if n_buffered >= self.buffer_games:
+                        runs.append(
+                            self.spill(buffer, Path(tmp) / f"{len(runs)}.arrow")
+                        )
+                        n_records += n_buffered
+                        buffer, n_buffered = defaultdict(list), 0
+                    if verbose:
+                        elapsed = time.perf_counter() - start
+                        print(f"{n_games} games, {n_games / elapsed:.0f} games/s")
+                players = self.write(runs, buffer)
+                n_records += n_buffered
+            finally:
+                for source, _, _ in runs:
+                    source.close()
+        return ImportStats(
+            n_games, n_records, len(players), time.perf_counter() - start
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="Path of the PGN file to import.")
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    parser.add_argument("--procs", type=int, default=N_PARSE_PROCS)
+    parser.add_argument("--chunk-bytes", type=int, default=IMPORT_CHUNK_BYTES)
+    args = parser.parse_args()
+    importer = PGNImporter(args.data_folder, args.procs, args.chunk_bytes)
+    stats = importer.run(args.path, verbose=True)
+    print(
+        f"Imported {stats.n_games} games for {stats.n_players} players in "
+        f"{stats.seconds:.1f}s ({stats.games_per_second:.0f} games/s)"
+    )
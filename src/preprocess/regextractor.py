@@ -1,7 +1,11 @@
 """Extractor class to get all informations from raw PGNs from Chess.com."""
 
+import codecs
 import re
-from typing import List
+from typing import BinaryIO, Dict, Iterable, Iterator, List, TextIO, Tuple, Union
+
+PGNSource = Union[str, bytes, TextIO, BinaryIO, Iterable[Union[str, bytes]]]
+READ_CHUNK_SIZE = 1 << 16
 
 
 class RegExtractor:
@@ -24,6 +28,14 @@ class RegExtractor:
         Regex to extract the opening name.
     COLOR_RE : str
         Regex to extract the color of the inspected player.
+    TAG_PATTERN : re.Pattern
+        Compiled regex matching one header tag, with leading whitespaces.
+    GAME_PATTERN : re.Pattern
+        Compiled GAME_RE.
+    MOVE_PATTERN : re.Pattern
+        Compiled regex extracting the moves from the movetext.
+    ECO_OPENING_PATTERN : re.Pattern
+        Compiled regex extracting the opening name from the ECOUrl tag.
     """
 
     GAME_RE = r"(?<=\n)1\..*"
@@ -32,6 +44,78 @@ class RegExtractor:
     MONTH_RE = r'\[UTCDate\s"(.*?)"\]'
     OPENING_RE = r'openings\/"?(.*?)(?:\.|\-[0-9]|\n|")'
     COLOR_RE = r'\[(.*?)\s"PLACEHOLDER"'
+    TAG_PATTERN = re.compile(r'\s*\[(\w+)\s+"(.*?)"\]')
+    GAME_PATTERN = re.compile(GAME_RE)
+    MOVE_PATTERN = re.compile(
+        r"[A-Za-z]+[0-9]?[x]?[A-Za-z]?[0-9]=?[A-Za-z]?\+?|O-O(?:-O)?"
+    )
+    ECO_OPENING_PATTERN = re.compile(r"openings/(.*?)(?:\.|-[0-9]|$)")
+
+    @classmethod
+    def parse_headers(cls, pgn_txt: str) -> Tuple[Dict[str, str], int]:
+        """
+        Walk the header block once and collect all its tags.
+
+            Parameters:
+                pgn_txt (str) : Individual raw pgn from chess.com.
+
+            Returns:
+                headers (Dict[str, str]) : Value of each tag by tag name.
+                end (int) : Position in pgn_txt where the header block ends.
+        """
+        headers = {}
+        end = 0
+        match = cls.TAG_PATTERN.match(pgn_txt)
+        while match is not None:
+            headers[match.group(1)] = match.group(2)
+            end = match.end()
+            match = cls.TAG_PATTERN.match(pgn_txt, end)
+        return headers, end
+
+    @classmethod
+    def extract(
+        cls, pgn_txt: str, username: str
+    ) -> Tuple[str, str, str, str, str, str]:
+        """
+        Extract all fields of a game in a single pass over its header block.
+
+        Equivalent to calling get_color, get_result, get_link, get_game, get_month and
+        get_opening, except that the username is matched regardless of its case.
+
+            Parameters:
+                pgn_txt (str) : Individual raw pgn from chess.com.
+                username (str) : Username of the inspected player.
+
+            Returns:
+                fields (Tuple[str, str, str, str, str, str]) : Color, result, link,
+                    game, month and opening of the game.
+        """
+        headers, end = cls.parse_headers(pgn_txt)
+        username = username.casefold()
+        if headers.get("White", "").casefold() == username:
+            color = "white"
+        elif headers.get("Black", "").casefold() == username:
+            color = "black"
+        else:
+            raise ValueError("Pattern did not permit to find player color")
+        try:
+            result = headers["Result"]
+            link = headers["Link"].lower()
+            month = headers["UTCDate"].replace(".", "-")[:-3]
+            opening = cls.ECO_OPENING_PATTERN.search(headers["ECOUrl"]).group(1)
+            movetext = cls.GAME_PATTERN.search(pgn_txt, end).group(0)
+        except (KeyError, AttributeError):
+            raise ValueError(f"Pattern did not permit to parse game {pgn_txt}")
+        if result == "1/2-1/2":
+            result = "draw"
+        elif (result == "1-0" and color == "white") or (
+            result == "0-1" and color == "black"
+        ):
+            result = "win"
+        else:
+            result = "lose"
+        game = " ".join(cls.MOVE_PATTERN.findall(movetext))
+        return color, result, link, game, month, opening.replace("-", " ")
 
     @classmethod
     def get_color(cls, pgn_txt: str, username: str) -> str:
@@ -85,8 +169,7 @@ class RegExtractor:
                 game (str) : Succession of moves in the game separated by spaces.
         """
         game = re.findall(cls.GAME_RE, pgn_txt)[0]
-        cleaning_re = r"[A-Za-z]+[0-9]?[x]?[A-Za-z]?[0-9]=?[A-Za-z]?\+?|O-O(?:-O)?"
-        clean_game = re.findall(cleaning_re, game)
+        clean_game = cls.MOVE_PATTERN.findall(game)
         return " ".join(clean_game)
 
     @classmethod
@@ -139,8 +222,8 @@ class RegExtractor:
         except:
             raise ValueError(f"Pattern did not permit to find player opening{pgn_txt}")
 
-    @staticmethod
-    def split(multi_pgn_txt: str) -> List[str]:
+    @classmethod
+    def split(cls, multi_pgn_txt: str) -> List[str]:
         """
         Split a raw Chess.com PGN file with multiple PGNs into a list of individual PGNs.
 
@@ -150,6 +233,61 @@ class RegExtractor:
             Returns:
                 pgn_list (List[str]) : List of splited raw pgn strings.
         """
-        regex = r'(?<=\[Event "Live Chess"\])[\s\S]*?(?=\[Event "Live Chess"\]|$)'
-        matches = re.findall(regex, multi_pgn_txt, re.DOTALL)
-        return matches
+        return list(cls.iter_split(multi_pgn_txt))
+
+    @classmethod
+    def iter_split(cls, source: PGNSource) -> Iterator[str]:
+        """
+        Split a stream of PGNs into individual PGNs, yielding them one at a time.
+
+        Any [Event ...] tag at the start of a line starts a new PGN, so live and daily
+        games are both recognised. Only the PGN being read is held in memory.
+
+            Parameters:
+                source (PGNSource) : Raw PGN string, text or binary file-like object,
+                    or iterable of str or utf-8 bytes chunks.
+
+            Returns:
+                pgns (Iterator[str]) : Raw pgn strings, each starting with its Event tag.
+        """
+        game_lines = []
+        for line in cls.iter_lines(source):
+            if line.startswith("[Event "):
+                if len(game_lines) > 0:
+                    yield "".join(game_lines)
+                game_lines = [line]
+            elif len(game_lines) > 0:
+                game_lines.append(line)
+        if len(game_lines) > 0:
+            yield "".join(game_lines)
+
+    @staticmethod
+    def iter_lines(source: PGNSource) -> Iterator[str]:
+        """
+        Iterate over the lines of a PGN source, line endings included.
+
+            Parameters:
+                source (PGNSource) : Raw PGN string, text or binary file-like object,
+                    or iterable of str or utf-8 bytes chunks.
+
+            Returns:
+                lines (Iterator[str]) : Lines of the source.
+        """
+        if isinstance(source, (str, bytes)):
+            chunks = [source]
+        elif hasattr(source, "read"):
+            chunks = iter(lambda: source.read(READ_CHUNK_SIZE), source.read(0))
+        else:
+            chunks = source
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk)
+            lines = (pending + chunk).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+        if len(pending) > 0:
+            yield pending
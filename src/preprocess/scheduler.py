@@ -0,0 +1,168 @@
+"""RequestScheduler class which paces and retries the requests made to the API."""
+
+from __future__ import annotations
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+from src.config import (
+    BACKOFF_BASE,
+    BACKOFF_CAP,
+    MAX_RETRIES,
+    REQUEST_BURST,
+    REQUEST_RATE,
+)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RequestScheduler:
+    """
+    RequestScheduler class which paces and retries the requests made to the API.
+
+    The scheduler is meant to be shared by all fetchers (and their threads) so that
+    they draw from a single request budget of rate requests per second, with bursts of
+    up to burst requests. Requests answered with 429 or a transient 5xx, or failing
+    with a connection error, are retried up to max_retries times. The delay before a
+    retry is the Retry-After header if provided, which also pauses every other request,
+    else an exponential backoff with full jitter.
+
+    Attributes
+    ----------
+    rate (float) : Maximum number of requests per second.
+    burst (int) : Number of requests which can be sent at once after being idle.
+    max_retries (int) : Maximum number of retries for a request.
+    backoff_base (float) : Upper bound in seconds of the delay before the first retry.
+    backoff_cap (float) : Maximum delay in seconds before a retry.
+    """
+
+    _default: Optional[RequestScheduler] = None
+
+    def __init__(
+        self,
+        rate: float = REQUEST_RATE,
+        burst: int = REQUEST_BURST,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_cap: float = BACKOFF_CAP,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Construct a scheduler with a full request budget.
+
+        Parameters
+        ----------
+            rate : float
+                Maximum number of requests per second.
+            burst : int
+                Number of requests which can be sent at once after being idle.
+            max_retries : int
+                Maximum number of retries for a request.
+            backoff_base : float
+                Upper bound in seconds of the delay before the first retry.
+            backoff_cap : float
+                Maximum delay in seconds before a retry.
+            sleep : Callable[[float], None]
+                Function used to wait, can be replaced for testing.
+            clock : Callable[[], float]
+                Monotonic clock in seconds, can be replaced for testing.
+        """
+        # pylint: disable=too-many-arguments
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        # Theoretical arrival time of the next request if requests were evenly paced.
+        self._tat = 0.0
+        self._paused_until = 0.0
+
+    @classmethod
+    def default(cls) -> RequestScheduler:
+        """Return the scheduler shared by all fetchers of the process."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def acquire(self):
+        """Wait until the request budget allows a new request."""
+        interval = 1.0 / self.rate
+        with self._lock:
+            now = self._clock()
+            tat = max(self._tat, self._paused_until, now)
+            send_at = max(now, self._paused_until, tat - (self.burst - 1) * interval)
+            self._tat = tat + interval
+        if send_at > now:
+            self._sleep(send_at - now)
+
+    def pause(self, delay: float):
+        """Hold every request for delay seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + delay)
+
+    def backoff(self, attempt: int) -> float:
+        """Delay in seconds before retry number attempt (starting at 0)."""
+        return self._random.uniform(
+            0, min(self.backoff_cap, self.backoff_base * 2**attempt)
+        )
+
+    def retry_after(self, response: requests.Response) -> Optional[float]:
+        """Delay in seconds requested by the Retry-After header, if any."""
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                date = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = (date - datetime.now(timezone.utc)).total_seconds()
+        return min(max(delay, 0.0), self.backoff_cap)
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request within the budget, retrying it if it fails transiently.
+
+            Parameters:
+                session (requests.Session) : Session used to send the request.
+                url (str) : Requested url.
+                kwargs : Keyword arguments passed to session.get.
+
+            Returns:
+                response (requests.Response) : Last response, which can still have a
+                    retryable status code if all retries failed.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                response = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt >= self.max_retries:
+                return response
+            delay = self.retry_after(response)
+            if delay is not None:
+                # Server asked to slow down, every request waits not only this one.
+                self.pause(delay)
+            else:
+                self._sleep(self.backoff(attempt))
+            attempt += 1
@@ -0,0 +1,170 @@
+"""Batch writer class that streams parsed games to disk."""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pyarrow as pa
+
+from src.config import WRITER_BATCH_SIZE
+from src.explorer.pgn import PGN
+
+COLUMNS = ["color", "result", "link", "game", "month", "opening", "moves"]
+SCHEMA = pa.schema(
+    [
+        ("color", pa.dictionary(pa.int8(), pa.string())),
+        ("result", pa.dictionary(pa.int8(), pa.string())),
+        ("link", pa.string()),
+        ("game", pa.string()),
+        ("month", pa.string()),
+        ("opening", pa.dictionary(pa.int32(), pa.string())),
+        ("moves", pa.binary()),
+    ]
+)
+
+
+class BatchWriter:
+    """
+    Batch writer class that streams parsed games to an Arrow IPC file.
+
+    Games are accumulated column by column and appended to the file as a record batch
+    every batch_size games, so that memory stays bounded by one batch and the cost of
+    writing n games is linear in n. The file is not compressed so that it can be
+    memory-mapped when read. An Arrow IPC file holds a single dictionary per column, so
+    dictionary-encoded columns are encoded against dictionaries which only grow, and
+    batches carry the new values as dictionary deltas.
+
+    Attributes
+    ----------
+    path (Path) : Path of the file written.
+    batch_size (int) : Number of games kept in memory before being flushed.
+    dedupe_on (Optional[str]) : Column on which duplicated games are skipped.
+    n_written (int) : Number of games written so far.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = WRITER_BATCH_SIZE,
+        dedupe_on: Optional[str] = None,
+    ):
+        """
+        Construct the writer, truncating the file at path.
+
+        Parameters
+        ----------
+            path : str
+                Path of the file written.
+            batch_size : int
+                Number of games kept in memory before being flushed.
+            dedupe_on : Optional[str]
+                Column on which duplicated games are skipped, the first one is kept.
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.dedupe_on = dedupe_on
+        self.n_written = 0
+        self._batch: Dict[str, List[str]] = {col: [] for col in COLUMNS}
+        self._seen = set()
+        self._dictionaries = {
+            field.name: {} for field in SCHEMA if pa.types.is_dictionary(field.type)
+        }
+        # Schema is written straight away so that an empty history is a valid file.
+        self._writer = pa.ipc.new_file(
+            str(self.path),
+            SCHEMA,
+            options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+        )
+
+    def __enter__(self):
+        """Enter the writer context."""
+        return self
+
+    def __exit__(self, *args):
+        """Flush remaining games when leaving the writer context."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Number of games in the pending batch."""
+        return len(self._batch[COLUMNS[0]])
+
+    def write(self, pgn: PGN):
+        """
+        Add a game to the pending batch, flushing it if it is full.
+
+            Parameters:
+                pgn (PGN) : Game to write.
+        """
+        self.write_row([getattr(pgn, col) for col in COLUMNS])
+
+    def write_row(self, row: List[str]):
+        """
+        Add a row of values ordered as COLUMNS to the pending batch.
+
+            Parameters:
+                row (List[str]) : Values of the game ordered as COLUMNS.
+        """
+        if self.dedupe_on is not None:
+            key = row[COLUMNS.index(self.dedupe_on)]
+            if key in self._seen:
+                return
+            self._seen.add(key)
+        for col, value in zip(COLUMNS, row):
+            self._batch[col].append(value)
+        if len(self) >= self.batch_size:
+            self.flush()
+
+    def write_batch(self, batch: pa.RecordBatch):
+        """
+        Append a record batch with schema SCHEMA, after the pending games.
+
+            Parameters:
+                batch (pa.RecordBatch) : Games to write.
+        """
+        self.flush()
+        batch = self._encode(
+            {
+                col: batch.column(col).to_pylist()
+                if col in self._dictionaries
+                else batch.column(col)
+                for col in COLUMNS
+            }
+        )
+        if self.dedupe_on is not None:
+            keep = []
+            for key in batch.column(self.dedupe_on).to_pylist():
+                keep.append(key not in self._seen)
+                self._seen.add(key)
+            if not all(keep):
+                batch = batch.filter(pa.array(keep))
+        if batch.num_rows == 0:
+            return
+        self._writer.write_batch(batch)
+        self.n_written += batch.num_rows
+
+    def flush(self):
+        """Append the pending batch to the file and start a new one."""
+        if len(self) == 0:
+            return
+        self._writer.write_batch(self._encode(self._batch))
+        self.n_written += len(self)
+        self._batch = {col: [] for col in COLUMNS}
+
+    def _encode(self, columns: Dict[str, Union[List, pa.Array]]) -> pa.RecordBatch:
+        """Build a record batch, encoding values against the dictionaries of the file."""
+        arrays = []
+        for field in SCHEMA:
+            values = columns[field.name]
+            if field.name in self._dictionaries:
+                dictionary = self._dictionaries[field.name]
+                indices = [dictionary.setdefault(v, len(dictionary)) for v in values]
+                values = pa.DictionaryArray.from_arrays(
+                    pa.array(indices, type=field.type.index_type),
+                    pa.array(list(dictionary), type=field.type.value_type),
+                )
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+
+    def close(self):
+        """Flush the games which are still pending and close the file."""
+        self.flush()
+        self._writer.close()
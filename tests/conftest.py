@@ -1,6 +1,16 @@
 """Conftest file for omni_ai unit tests."""
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Tuple
+
 import pytest
 
+from src.explorer.player import Player
+
 
 @pytest.fixture
 def dummy_pgn():  # pragma: no cover
@@ -24,3 +34,157 @@ def username():  # pragma: no cover
 @pytest.fixture
 def csv_path():  # pragma: no cover
     return "tests/units/data_examples/example_player.csv"
+
+
+@pytest.fixture
+def pgns(username, csv_path):  # pragma: no cover
+    """Games of the example player from 2023-02 to 2023-04."""
+    player = Player(username)
+    player.load_player_history("2023-02", "2023-04", csv_path)
+    return player.pgn_list
+
+
+@pytest.fixture
+def assert_same_nodes():  # pragma: no cover
+    """Check that two dictionaries of PositionNode, or NodeStore, hold the same positions.
+
+    Game ids are compared regardless of their order, unless game_ids is False.
+    """
+
+    def check(expected, nodes, game_ids=True):
+        assert sorted(expected.keys()) == sorted(nodes.keys())
+        for node_id, node in expected.items():
+            other = nodes[node_id]
+            assert vars(other.res_cnt) == vars(node.res_cnt)
+            assert other.children == node.children
+            assert other.last_move_hero == node.last_move_hero
+            # Transpositions may keep the move counters of another game.
+            assert other.fen.split()[:4] == node.fen.split()[:4]
+            if game_ids:
+                assert sorted(other.game_ids) == sorted(node.game_ids)
+
+    return check
+
+
+@pytest.fixture
+def assert_same_trees(assert_same_nodes):  # pragma: no cover
+    """Check that a compact GameTree holds the positions of a GameTree of nodes.
+
+    Unless same_order is False, games must be numbered alike in both trees, and the
+    game ids of the positions are compared too.
+    """
+
+    def check(expected, tree, same_order=True):
+        if same_order:
+            assert tree.games == expected.games
+        else:
+            assert sorted(tree.games) == sorted(expected.games)
+        for color in ["white", "black"]:
+            nodes, store = getattr(expected, color), getattr(tree, color)
+            assert_same_nodes(nodes, store, game_ids=same_order)
+
+    return check
+
+
+class FakeClock:
+    """Clock whose time only moves when sleeping or when now is set."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock():  # pragma: no cover
+    return FakeClock()
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """Handler mimicking the Chess.com monthly PGN endpoint."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pragma: no cover
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.clients.add(self.client_address)
+        month = "-".join(self.path.split("/")[-3:-1])
+        time.sleep(server.delays.get(month, 0.0))
+        with server.lock:
+            failures = server.failures.get(month, [])
+            status = failures.pop(0) if len(failures) > 0 else None
+        if status is not None:
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = server.months.get(month, "").encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pragma: no cover
+        pass
+
+
+@pytest.fixture
+def stub_api():  # pragma: no cover
+    """Local HTTP server serving `months` (YYYY-MM -> PGN text) like ADDRESS_ROOT.
+
+    `delays` adds latency to months and `failures` lists the error statuses answered
+    to the first requests of a month.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPIHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.months, server.delays, server.failures = {}, {}, {}
+    server.retry_after = 0
+    server.requests, server.clients = [], set()
+    server.address_root = f"http://127.0.0.1:{server.server_port}/pub/player"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def module_import_times(module: str) -> List[Tuple[int, str]]:
+    """Cumulative import time in microseconds of each module imported by module."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(cumulative), name.strip()))
+    return times
+
+
+@pytest.fixture
+def import_times():  # pragma: no cover
+    """Import times of the modules imported by a module, see module_import_times."""
+    return module_import_times
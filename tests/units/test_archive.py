@@ -0,0 +1,31 @@
+import pytest
+
+from src.preprocess.archive import RawArchive
+
+
+def test_archive_round_trip(tmp_path, username, complete_pgn):
+    archive = RawArchive(username, tmp_path)
+    archive.put("2023-03", complete_pgn)
+    archive.put("2023-01", "")
+
+    assert archive.months() == ["2023-01", "2023-03"]
+    assert archive.get("2023-03") == complete_pgn
+    assert archive.path("2023-03").stat().st_size < len(complete_pgn.encode()) / 2
+
+
+def test_archive_missing_month(tmp_path, username):
+    archive = RawArchive(username, tmp_path)
+
+    assert archive.months() == []
+    assert archive.get("2023-03") is None
+
+
+def test_closing_stream_unmaps_file(tmp_path, username, complete_pgn):
+    archive = RawArchive(username, tmp_path)
+    archive.put("2023-03", complete_pgn)
+
+    with archive.open("2023-03") as stream:
+        assert stream.readline() == complete_pgn.splitlines(keepends=True)[0]
+        mapped = stream.buffer.mapped
+    with pytest.raises(ValueError):
+        len(mapped)
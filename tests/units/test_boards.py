@@ -0,0 +1,34 @@
+import chess
+import pybase64
+
+from src.explorer.boards import _render_board, board_image, report_images
+
+SCANDINAVIAN = "rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+
+
+def test_board_image_is_rendered_once():
+    _render_board.cache_clear()
+    image = board_image(SCANDINAVIAN, chess.BLACK, 300, "svg")
+
+    assert image.startswith("data:image/svg+xml;base64,")
+    svg = pybase64.b64decode(image.split(",", 1)[1]).decode()
+    assert 'width="300"' in svg
+    assert board_image(SCANDINAVIAN, chess.BLACK, 300, "svg") == image
+    assert board_image(SCANDINAVIAN, chess.WHITE, 300, "svg") != image
+    info = _render_board.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+def test_report_images_flip_black_boards():
+    _render_board.cache_clear()
+    report = {
+        "w": [(SCANDINAVIAN, 1, 2, 0, "Scandinavian Defense")],
+        "b": [(SCANDINAVIAN, 0, 1, 1, "Scandinavian Defense")],
+    }
+    images = report_images(report, 300, "svg")
+
+    assert images == {
+        "w": [board_image(SCANDINAVIAN, chess.WHITE, 300, "svg")],
+        "b": [board_image(SCANDINAVIAN, chess.BLACK, 300, "svg")],
+    }
+    assert _render_board.cache_info().currsize == 2
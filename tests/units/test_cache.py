@@ -0,0 +1,24 @@
+from src.explorer.cache import ResultCache
+
+
+def test_least_recently_used_results_are_evicted(clock):
+    cache = ResultCache(max_entries=2, ttl=60, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_results_expire_after_ttl(clock):
+    cache = ResultCache(max_entries=2, ttl=60, clock=clock)
+    cache.put(("hero", 3), "report")
+    clock.now = 59.0
+    assert cache.get(("hero", 3)) == "report"
+    clock.now = 60.0
+
+    assert cache.get(("hero", 3), "missing") == "missing"
+    assert len(cache) == 0
@@ -0,0 +1,36 @@
+from src.explorer.pgn import PGN
+from src.preprocess.extraction import ExtractionPool, extract_records, split_chunks
+from src.preprocess.regextractor import RegExtractor
+from src.preprocess.writer import COLUMNS
+
+
+def test_split_chunks_on_game_boundaries(complete_pgn):
+    chunks = split_chunks(complete_pgn, 50)
+
+    assert "".join(chunks) == complete_pgn
+    assert [len(RegExtractor.split(chunk)) for chunk in chunks] == [50, 50, 38]
+
+
+def test_extract_records_matches_pgn(dummy_pgn, username):
+    batch = extract_records(dummy_pgn, username)
+
+    expected = [
+        PGN.extract_from_txt(pgn_txt, username)
+        for pgn_txt in RegExtractor.split(dummy_pgn)
+    ]
+    assert batch.num_rows == 3
+    for col in COLUMNS:
+        assert batch.column(col).to_pylist() == [getattr(p, col) for p in expected]
+
+
+def test_pool_keeps_chunk_order(complete_pgn, username):
+    expected = extract_records(complete_pgn, username)
+
+    with ExtractionPool(username, n_procs=2, games_per_chunk=20) as pool:
+        futures = pool.submit(complete_pgn)
+        links = [
+            link for f in futures for link in f.result().column("link").to_pylist()
+        ]
+
+    assert len(futures) == 7
+    assert links == expected.column("link").to_pylist()
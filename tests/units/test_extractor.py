@@ -54,3 +54,56 @@ def test_get_opening(dummy_pgn):
 
     expected_opening2 = "Caro Kann Defense Advance Variation"
     assert RegExtractor.get_opening(pgns[1]) == expected_opening2
+
+
+def test_parse_headers(dummy_pgn):
+    pgns = RegExtractor.split(dummy_pgn)
+    headers, end = RegExtractor.parse_headers(pgns[0])
+
+    assert headers["White"] == "marcov24"
+    assert headers["Link"] == "https://www.chess.com/game/live/75743501325"
+    assert pgns[0][end:].lstrip().startswith("1. e4")
+
+
+def test_extract_matches_individual_getters(complete_pgn, username):
+    for pgn_txt in RegExtractor.split(complete_pgn):
+        color = RegExtractor.get_color(pgn_txt, username)
+        expected = (
+            color,
+            RegExtractor.get_result(pgn_txt, color),
+            RegExtractor.get_link(pgn_txt),
+            RegExtractor.get_game(pgn_txt),
+            RegExtractor.get_month(pgn_txt),
+            RegExtractor.get_opening(pgn_txt),
+        )
+        assert RegExtractor.extract(pgn_txt, username) == expected
+
+
+def test_extract_username_case_insensitive(dummy_pgn):
+    pgns = RegExtractor.split(dummy_pgn)
+
+    assert RegExtractor.extract(pgns[1], "MarcoV24")[0] == "black"
+
+
+def test_iter_split_streams_any_event(dummy_pgn):
+    daily = dummy_pgn.replace('[Event "Live Chess"]', '[Event "Let\'s Play!"]', 1)
+    data = (daily + "é").encode()
+    # One byte chunks cut lines and the multi-byte character.
+    chunks = [data[i : i + 1] for i in range(len(data))]
+
+    pgns = list(RegExtractor.iter_split(iter(chunks)))
+
+    assert len(pgns) == 3
+    assert pgns[0].startswith('[Event "Let\'s Play!"]')
+    assert "".join(pgns) == daily + "é"
+
+
+def test_iter_split_file_like(tmp_path, complete_pgn):
+    path = tmp_path / "month.pgn"
+    path.write_text(complete_pgn)
+
+    with open(path, "rb") as f:
+        pgns = list(RegExtractor.iter_split(f))
+
+    assert pgns == RegExtractor.split(complete_pgn)
+    assert len(pgns) == 138
@@ -1,5 +1,10 @@
+import pytest
+import requests
+
+from src.explorer.pgn import PGN
 from src.preprocess.fetcher import Fetcher
 from src.preprocess.regextractor import RegExtractor
+from src.preprocess.scheduler import RequestScheduler
 
 
 def test_fetch_month_no_pgn(username):
@@ -11,3 +16,166 @@ def test_fetch_month_good_number_of_games(username):
     fetcher = Fetcher(username)
     pgn = fetcher.download_month("2023-04")
     assert len(RegExtractor.split(pgn)) == 8
+
+
+def test_download_months_keeps_month_order(stub_api, dummy_pgn, username):
+    stub_api.months = {"2023-02": dummy_pgn, "2023-04": dummy_pgn}
+    # Earlier months answer last to make completion order differ from month order.
+    stub_api.delays = {"2023-01": 0.3, "2023-02": 0.2, "2023-03": 0.1}
+    fetcher = Fetcher(username, address_root=stub_api.address_root)
+    months = ["2023-01", "2023-02", "2023-03", "2023-04"]
+
+    pgns = fetcher.download_months(months, n_workers=4)
+
+    assert pgns == [None, dummy_pgn, None, dummy_pgn]
+
+
+def test_download_months_reuses_connections(stub_api, username):
+    fetcher = Fetcher(
+        username,
+        address_root=stub_api.address_root,
+        session=Fetcher.make_session(pool_size=2),
+    )
+    months = [f"2022-{m:02d}" for m in range(1, 13)]
+
+    fetcher.download_months(months, n_workers=2)
+
+    assert len(stub_api.requests) == 12
+    assert len(stub_api.clients) <= 2
+
+
+def test_sync_history_only_refetches_open_months(
+    stub_api, dummy_pgn, username, tmp_path
+):
+    pgns = RegExtractor.split(dummy_pgn)
+    stub_api.months = {"2023-03": dummy_pgn, "2023-04": "".join(pgns[:2])}
+    fetcher = Fetcher(
+        username, address_root=stub_api.address_root, data_folder=tmp_path
+    )
+
+    progress = []
+    fetcher.sync_history(
+        "2023-01",
+        "2023-04",
+        current_month="2023-04",
+        progress=lambda *step: progress.append(step),
+    )
+    assert len(stub_api.requests) == 4
+    assert [p for p in progress if p[0] == "fetching"][-1] == ("fetching", 4, 4)
+    assert [p for p in progress if p[0] == "parsing"][-1] == ("parsing", 4, 4)
+
+    # Nothing changed: only the current month is requested, and answered with a 304.
+    fetcher.sync_history("2023-01", "2023-04", current_month="2023-04")
+    assert len(stub_api.requests) == 5
+    assert stub_api.requests[4].endswith("/2023/04/pgn")
+
+    # A new game in the current month is picked up and duplicates are dropped.
+    stub_api.months["2023-04"] = dummy_pgn
+    fetcher.sync_history("2023-01", "2023-04", current_month="2023-05")
+    assert len(stub_api.requests) == 6
+    history = fetcher.store.read_month("2023-04").to_pandas()
+    assert history["link"].is_unique
+    assert len(history) == 3
+
+    # Once the month is over, it is not requested anymore.
+    fetcher.sync_history("2023-01", "2023-04", current_month="2023-05")
+    assert len(stub_api.requests) == 6
+
+
+def test_reprocess_from_archive_without_network(
+    stub_api, dummy_pgn, username, tmp_path
+):
+    stub_api.months = {"2023-04": dummy_pgn}
+    fetcher = Fetcher(
+        username, address_root=stub_api.address_root, data_folder=tmp_path
+    )
+    fetcher.sync_history("2023-03", "2023-04", current_month="2023-05")
+    n_requests = len(stub_api.requests)
+    expected = fetcher.store.read_month("2023-04")
+
+    fetcher.reprocess()
+
+    assert len(stub_api.requests) == n_requests
+    assert fetcher.store.read_month("2023-04").equals(expected)
+    assert fetcher.store.month_state("2023-04")["complete"]
+
+
+def test_sync_and_reprocess_keep_imported_games(
+    stub_api, dummy_pgn, username, tmp_path
+):
+    stub_api.months = {"2023-04": dummy_pgn}
+    fetcher = Fetcher(
+        username, address_root=stub_api.address_root, data_folder=tmp_path
+    )
+    otb = PGN("white", "win", "club|paris|2023.04.01", "e4 e5", "2023-04", "KP")
+    fetcher.store.write_month("2023-04", [otb], imported=True)
+
+    fetcher.sync_history("2023-04", "2023-04", current_month="2023-05")
+    state = fetcher.store.month_state("2023-04")
+    assert state["n_games"] == 4 and state["imported"] and state["complete"]
+    # Games kept unchanged, so trees built from the month only miss the new ones.
+    assert state["revision"] == 1
+
+    fetcher.reprocess()
+    links = fetcher.store.read_month("2023-04").column("link").to_pylist()
+    assert len(links) == 4 and otb.link in links
+
+
+def test_sync_prefers_api_games_to_imported_ones(
+    stub_api, dummy_pgn, username, tmp_path
+):
+    stub_api.months = {"2023-04": dummy_pgn}
+    fetcher = Fetcher(
+        username, address_root=stub_api.address_root, data_folder=tmp_path
+    )
+    link = list(fetcher.iter_games([dummy_pgn]))[0].link
+    otb = PGN("white", "win", link, "e4 e5", "2023-04", "KP")
+    fetcher.store.write_month("2023-04", [otb], imported=True)
+
+    fetcher.sync_history("2023-04", "2023-04", current_month="2023-05")
+
+    games = fetcher.store.read_month("2023-04").to_pylist()
+    assert len(games) == 3
+    assert [g["game"] for g in games if g["link"] == link] != ["e4 e5"]
+    # The imported game was replaced, so the month changed.
+    assert fetcher.store.month_state("2023-04")["revision"] == 2
+
+
+def test_fetcher_retries_throttled_requests(stub_api, dummy_pgn, username, tmp_path):
+    stub_api.months = {"2023-04": dummy_pgn}
+    stub_api.failures = {"2023-04": [429, 503, 502], "2023-03": [500]}
+    stub_api.delays = {"2023-02": 0.1}
+    scheduler = RequestScheduler(rate=100.0, backoff_base=0.01)
+    fetcher = Fetcher(
+        username,
+        address_root=stub_api.address_root,
+        scheduler=scheduler,
+        data_folder=tmp_path,
+    )
+
+    fetcher.sync_history("2023-01", "2023-04", current_month="2023-05")
+
+    assert len(stub_api.requests) == 8
+    assert fetcher.store.months() == ["2023-01", "2023-02", "2023-03", "2023-04"]
+    assert fetcher.store.month_state("2023-04")["n_games"] == 3
+
+
+def test_interrupted_sync_resumes_missing_months(stub_api, username, tmp_path):
+    stub_api.failures = {"2023-02": [503] * 3}
+    scheduler = RequestScheduler(rate=100.0, max_retries=2, backoff_base=0.01)
+    fetcher = Fetcher(
+        username,
+        address_root=stub_api.address_root,
+        scheduler=scheduler,
+        data_folder=tmp_path,
+    )
+
+    with pytest.raises(requests.HTTPError):
+        fetcher.sync_history("2023-01", "2023-04", current_month="2023-05")
+    # Months downloaded before and after the failing one are checkpointed.
+    assert fetcher.store.months() == ["2023-01", "2023-03", "2023-04"]
+
+    n_requests = len(stub_api.requests)
+    fetcher.sync_history("2023-01", "2023-04", current_month="2023-05")
+    assert len(stub_api.requests) == n_requests + 1
+    assert fetcher.store.months() == ["2023-01", "2023-02", "2023-03", "2023-04"]
@@ -0,0 +1,67 @@
+from src.explorer.pgn import PGN
+from src.preprocess.game_store import GameStore
+
+
+def make_pgns(month, n_games):
+    return [
+        PGN("black", "draw", f"https://link/{month}/{i}", "d4 d5", month, "Slav")
+        for i in range(n_games)
+    ]
+
+
+def test_read_range_only_reads_requested_months(tmp_path, username):
+    store = GameStore(username, tmp_path)
+    for month, n_games in [("2023-01", 2), ("2023-02", 3), ("2023-03", 4)]:
+        store.write_month(month, make_pgns(month, n_games), complete=True)
+
+    table = store.read_range("2023-02", "2023-05")
+
+    assert table.num_rows == 7
+    assert set(table.column("month").to_pylist()) == {"2023-02", "2023-03"}
+    assert store.read_range("2022-01", "2022-12").num_rows == 0
+
+
+def test_catalog_is_persisted(tmp_path, username):
+    store = GameStore(username, tmp_path)
+    assert not store.exists()
+    store.write_month("2023-02", make_pgns("2023-02", 3), etag='"abc"')
+    store.write_month("2023-01", [])
+
+    reloaded = GameStore(username, tmp_path)
+    assert reloaded.months() == ["2023-01", "2023-02"]
+    assert reloaded.month_state("2023-02") == {
+        "n_games": 3,
+        "etag": '"abc"',
+        "revision": 1,
+    }
+    assert reloaded.version == 2
+
+
+def test_write_month_replaces_partition(tmp_path, username):
+    store = GameStore(username, tmp_path)
+    store.write_month("2023-02", make_pgns("2023-02", 3))
+    store.write_month("2023-02", make_pgns("2023-02", 5))
+
+    assert store.read_month("2023-02").num_rows == 5
+
+
+def test_revision_is_kept_when_games_are_appended(tmp_path, username):
+    store = GameStore(username, tmp_path)
+    pgns = make_pgns("2023-02", 5)
+    store.write_month("2023-02", pgns[:3])
+    batch = store.read_month("2023-02").to_batches()
+
+    assert store.keeps_month("2023-02", batch)
+    assert not store.keeps_month("2023-02", batch[:0])
+    edited = make_pgns("2023-02", 3)
+    edited[0].game = "e4 e5"
+    other = GameStore(username, tmp_path / "other")
+    other.write_month("2023-02", edited)
+    edited = other.read_month("2023-02").to_batches()
+    assert not store.keeps_month("2023-02", edited)
+    assert not store.keeps_month("2023-02", edited, merged=True)
+    assert store.keeps_month("2023-02", batch[:0], merged=True)
+    store.write_month("2023-02", pgns, appended=True)
+    assert store.month_state("2023-02")["revision"] == 1
+    store.write_month("2023-02", pgns[1:])
+    assert store.month_state("2023-02")["revision"] == 3
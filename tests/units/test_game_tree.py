@@ -1,6 +1,10 @@
 import chess
+import chess.polyglot
+import pytest
 
 from src.explorer.game_tree import GameTree
+from src.explorer.moves import encode_game
+from src.explorer.pgn import PGN
 
 
 def test_valid_win_ratio(username, csv_path):
@@ -12,14 +16,14 @@ def test_valid_win_ratio(username, csv_path):
     board.push_san("e4")
 
     # Validate results as White
-    node = game_tree.white[(board.fen(), True)]
+    node = game_tree.white[chess.polyglot.zobrist_hash(board)]
 
     assert node.res_cnt.win == 37
     assert node.res_cnt.lose == 32
     assert node.last_move_hero == True
 
     # Validate results as black
-    node = game_tree.black[(board.fen(), False)]
+    node = game_tree.black[chess.polyglot.zobrist_hash(board)]
 
     assert node.res_cnt.win == 20
     assert node.res_cnt.lose == 17
@@ -32,10 +36,88 @@ def test_valid_children(username, csv_path):
     game_tree.load_tree(username, 20, "2023-02", "2023-04", csv_path)
 
     board = chess.Board()
-    node = game_tree.white[(board.fen(), False)]
+    node = game_tree.white[chess.polyglot.zobrist_hash(board)]
 
     assert len(node.children) == 1
 
     # board once we pushed e4
     board.push_san("e4")
-    assert next(iter(node.children))[0] == board.fen()
+    child = game_tree.white[next(iter(node.children))]
+    assert child.key == chess.polyglot.zobrist_hash(board)
+    assert child.fen == board.fen()
+
+
+def test_encoded_moves_build_same_tree(pgns, assert_same_nodes):
+    san_tree, encoded_tree = GameTree(), GameTree()
+    for pgn in pgns:
+        san_tree.add_pgn_to_tree(pgn, 20)
+        pgn.moves = encode_game(pgn.game, max_plies=10)
+        encoded_tree.add_pgn_to_tree(pgn, 20)
+
+    assert_same_nodes(san_tree.white, encoded_tree.white)
+    assert_same_nodes(san_tree.black, encoded_tree.black)
+
+
+def test_transpositions_share_a_node():
+    tree = GameTree()
+    tree.add_pgn_to_tree(
+        PGN("white", "win", "a", "Nf3 Nf6 g3 g6 Bg2", "2023-01", ""), 4
+    )
+    tree.add_pgn_to_tree(
+        PGN("white", "lose", "b", "g3 g6 Nf3 Nf6 Bg2", "2023-01", ""), 4
+    )
+
+    board = chess.Board()
+    for san in ["Nf3", "Nf6", "g3", "g6"]:
+        board.push_san(san)
+    node = tree.white[chess.polyglot.zobrist_hash(board)]
+
+    assert (node.res_cnt.win, node.res_cnt.lose) == (1, 1)
+    assert node.fen == board.fen()
+
+
+def test_illegal_move_names_its_game():
+    pgn = PGN("white", "win", "https://link/1", "e4 e5 Ke3", "2023-01", "")
+
+    with pytest.raises(
+        ValueError, match="Illegal move 'Ke3' at ply 2 of https://link/1"
+    ):
+        GameTree.from_pgn_list([pgn], 4)
+
+
+def test_trie_build_matches_game_by_game_build(pgns, assert_same_nodes):
+    for pgn in pgns[1::2]:
+        pgn.moves = encode_game(pgn.game, max_plies=10)
+    # Repeating a position in a game still counts it once.
+    pgns.append(PGN("black", "win", "c", "e4 Nf6 Nf3 Ng8 Ng1 Nf6 Nf3", "2023-01", ""))
+    game_tree = GameTree()
+    for pgn in pgns:
+        game_tree.add_pgn_to_tree(pgn, 20)
+    trie_tree = GameTree.from_pgn_list(pgns, 20)
+
+    assert_same_nodes(game_tree.white, trie_tree.white)
+    assert_same_nodes(game_tree.black, trie_tree.black)
+
+
+def test_nodes_hold_game_ids(pgns):
+    game_tree = GameTree.from_pgn_list(pgns, 20)
+    root = game_tree.white[chess.polyglot.zobrist_hash(chess.Board())]
+
+    assert game_tree.games == [pgn.link for pgn in pgns]
+    assert game_tree.node_links(root) == [
+        pgn.link for pgn in pgns if pgn.color == "white"
+    ]
+
+
+def test_example_games_are_bounded(pgns):
+    full = GameTree.from_pgn_list(pgns, 20)
+    sampled = GameTree(n_examples=3)
+    sampled.add_pgns_to_tree(pgns[::2], 20)
+    sampled += GameTree.from_pgn_list(pgns[1::2], 20)
+
+    for node_id, node in full.white.items():
+        game_ids = sampled.white[node_id].game_ids
+        assert len(game_ids) == min(3, node.n_games())
+        assert set(sampled.node_links(sampled.white[node_id])) <= set(
+            full.node_links(node)
+        )
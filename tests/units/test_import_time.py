@@ -0,0 +1,10 @@
+# Modules slow to import which the app only needs once it serves a request, if ever.
+DEFERRED = ["cairosvg", "pandas", "plotly.express", "requests"]
+
+
+def test_app_import_defers_heavy_modules(import_times):
+    times = import_times("src.app")
+    imported = {name for _, name in times}
+
+    assert "src.app" in imported
+    assert [name for name in DEFERRED if name in imported] == []
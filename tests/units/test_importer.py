@@ -0,0 +1,110 @@
+import pytest
+
+from src.explorer.moves import decode_game
+from src.explorer.player import Player
+from src.preprocess.game_store import GameStore
+from src.preprocess.importer import PGNImporter, find_chunks, game_record
+
+ANNOTATED_PGN = """[Event "Club championship"]
+[Site "Paris"]
+[Date "2021.11.05"]
+[Round "3"]
+[White "Alice"]
+[Black "marcov24"]
+[Result "0-1"]
+[ECO "C50"]
+[Opening "Italian Game"]
+
+1. e4 {A comment with Nf3 inside} e5 2. Nf3 (2. Bc4 Nf6 (2... Bc5)) Nc6
+3. Bc4 $1 Bc5 ; rest of line comment Qh5
+4. O-O Nf6 0-1
+
+"""
+
+
+def test_game_record_generic_pgn():
+    white, black, fields = game_record(ANNOTATED_PGN)
+
+    assert (white, black) == ("Alice", "marcov24")
+    assert fields[:2] + fields[3:6] == (
+        "white",
+        "lose",
+        "e4 e5 Nf3 Nc6 Bc4 Bc5 O-O Nf6",
+        "2021-11",
+        "Italian Game",
+    )
+    assert fields[2].startswith("club championship|paris|2021.11.05|3|alice|marcov24|")
+    assert len(decode_game(fields[6])) == 8
+
+
+def test_game_record_links_rematches_apart():
+    rematch = ANNOTATED_PGN.replace('"3"', '"?"')
+    other = rematch.replace("4. O-O Nf6", "4. d3 Nf6")
+
+    link = game_record(rematch)[2][2]
+
+    assert link == game_record(rematch)[2][2]
+    assert link != game_record(other)[2][2]
+
+
+def test_find_chunks_cut_on_games(tmp_path, complete_pgn):
+    path = tmp_path / "dump.pgn"
+    path.write_text(complete_pgn)
+    data = path.read_bytes()
+
+    chunks = find_chunks(str(path), 10000)
+
+    assert len(chunks) > 1
+    assert chunks[-1][1] == len(data)
+    assert all(data[start:].startswith(b"[Event ") for start, _ in chunks)
+
+
+def test_import_attributes_games_to_both_players(tmp_path, complete_pgn, username):
+    path = tmp_path / "dump.pgn"
+    path.write_text(complete_pgn + "\n" + ANNOTATED_PGN)
+    importer = PGNImporter(tmp_path / "data", n_procs=2, chunk_bytes=20000)
+
+    stats = importer.run(str(path))
+    # Importing twice does not duplicate games.
+    importer.run(str(path))
+
+    assert stats.n_games == 139
+    assert stats.n_records == 278
+    store = GameStore(username, tmp_path / "data")
+    assert store.read_range("2000-01", "2100-01").num_rows == 139
+    assert (tmp_path / "data" / "alice").is_dir()
+    alice = GameStore("ALICE", tmp_path / "data").read_month("2021-11").to_pylist()
+    assert [(g["color"], g["result"]) for g in alice] == [("white", "lose")]
+    marco = store.read_month("2021-11").to_pylist()
+    assert [(g["color"], g["result"]) for g in marco] == [("black", "win")]
+
+
+def test_import_spilled_buffers_match_single_buffer(tmp_path, complete_pgn, username):
+    path = tmp_path / "dump.pgn"
+    path.write_text(complete_pgn)
+    PGNImporter(tmp_path / "one", n_procs=1, chunk_bytes=20000).run(str(path))
+    spilled = PGNImporter(
+        tmp_path / "many", n_procs=1, chunk_bytes=20000, buffer_games=5
+    )
+
+    spilled.run(str(path))
+
+    expected = GameStore(username, tmp_path / "one")
+    store = GameStore(username, tmp_path / "many")
+    assert store.months() == expected.months()
+    assert store.read_range("2000-01", "2100-01").equals(
+        expected.read_range("2000-01", "2100-01")
+    )
+    assert not any(p.name.startswith(".") for p in (tmp_path / "many").iterdir())
+
+
+def test_store_only_players_are_not_synced(monkeypatch):
+    def sync_store(self, progress=None):
+        raise AssertionError("synced")
+
+    monkeypatch.setattr(Player, "sync_store", sync_store)
+
+    assert Player("Carlsen, Magnus").load_store().username == "Carlsen, Magnus"
+    assert Player("marcov24").load_store(sync=False).username == "marcov24"
+    with pytest.raises(AssertionError):
+        Player("marcov24").load_store()
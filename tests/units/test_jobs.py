@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from src.explorer.jobs import JobQueue
+
+
+@pytest.fixture
+def jobs():
+    queue = JobQueue(n_workers=2, history=2)
+    yield queue
+    queue.shutdown()
+
+
+def test_same_key_joins_running_job(jobs):
+    release = threading.Event()
+    calls = []
+
+    def task(progress):
+        calls.append(1)
+        progress("building", 1, 2)
+        release.wait(5)
+        return "tree"
+
+    job = jobs.submit("hero", task)
+    assert jobs.submit("hero", task) is job
+    other = jobs.submit("villain", task)
+    assert other is not job
+    release.set()
+
+    assert job.result() == "tree"
+    assert job.status() == {
+        "id": job.job_id,
+        "state": "done",
+        "stage": "building",
+        "done": 1,
+        "total": 2,
+        "error": None,
+    }
+    assert jobs.get(job.job_id) is job and jobs.latest("hero") is job
+    other.result()
+    # A finished job is not joined, the task runs again.
+    again = jobs.submit("hero", task)
+    assert again is not job
+    again.result()
+    assert len(calls) == 3
+
+
+def test_failed_job_reports_error(jobs):
+    def task(progress):
+        raise ValueError("no games")
+
+    job = jobs.submit("hero", task)
+    with pytest.raises(ValueError):
+        job.result()
+    status = job.status()
+    assert status["state"] == "failed"
+    assert "no games" in status["error"]
+
+
+def test_oldest_finished_jobs_are_dropped(jobs):
+    done = [jobs.submit(key, lambda progress: None) for key in "abc"]
+    for job in done:
+        job.result()
+    last = jobs.submit("d", lambda progress: None)
+    last.result()
+
+    assert jobs.get(done[0].job_id) is None and jobs.latest("a") is None
+    assert jobs.get(last.job_id) is last
+
+
+def test_popped_job_is_dropped(jobs):
+    job = jobs.submit("hero", lambda progress: "tree")
+    assert job.result() == "tree"
+
+    assert jobs.pop(job.job_id) is job
+    assert jobs.get(job.job_id) is None and jobs.latest("hero") is None
+    assert jobs.pop(job.job_id) is None
@@ -0,0 +1,25 @@
+import chess
+
+from src.explorer.moves import decode_game, decode_move, encode_game, encode_move
+
+
+def test_encode_game_round_trip():
+    game = "e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 O-O Be7"
+    moves = encode_game(game)
+
+    board = chess.Board()
+    for move, san in zip(decode_game(moves), game.split()):
+        assert board.san(move) == san
+        board.push(move)
+    assert len(moves) == 2 * len(game.split())
+
+
+def test_encode_move_keeps_promotions():
+    for uci in ["a7a8q", "h2h1n", "e2e4"]:
+        move = chess.Move.from_uci(uci)
+        assert decode_move(encode_move(move)) == move
+
+
+def test_encode_game_truncates_and_rejects_illegal_moves():
+    assert len(decode_game(encode_game("e4 e5 Nf3 Nc6", max_plies=2))) == 2
+    assert encode_game("e4 e4") is None
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from src.explorer.game_tree import GameTree
+from src.explorer.node_store import NodeStore
+
+
+def test_store_reads_like_nodes(pgns, assert_same_nodes):
+    nodes = GameTree.from_pgn_list(pgns, 20).white
+    store = NodeStore.from_nodes(nodes)
+
+    assert len(store) == len(nodes)
+    assert_same_nodes(nodes, store)
+    assert all(store[key].path == node.path for key, node in nodes.items())
+    assert 0 not in store and store.get(0) is None
+    rates = {key: node.win_rate() for key, node in nodes.items()}
+    assert np.allclose(store.win_rates(), [rates[key] for key in store.keys()])
+
+
+def test_store_merge_matches_node_merge(pgns, assert_same_nodes):
+    half = len(pgns) // 2
+    expected = GameTree.from_pgn_list(pgns[:half], 20)
+    expected += GameTree.from_pgn_list(pgns[half:], 20)
+    merged = GameTree.from_pgn_list(pgns[:half], 20).compact()
+    merged += GameTree.from_pgn_list(pgns[half:], 20)
+
+    assert_same_nodes(expected.white, merged.white)
+    assert_same_nodes(expected.black, merged.black)
+
+
+def test_compact_merge_keeps_bounded_samples(pgns):
+    half = len(pgns) // 2
+    full = GameTree.from_pgn_list(pgns, 20)
+    merged = GameTree(n_examples=2)
+    merged.add_pgns_to_tree(pgns[:half], 20)
+    merged.compact()
+    merged += GameTree.from_pgn_list(pgns[half:], 20)
+
+    for node_id, node in full.black.items():
+        game_ids = merged.black[node_id].game_ids
+        assert len(game_ids) == min(2, node.n_games())
+        assert set(game_ids) <= set(node.game_ids)
+
+
+def test_period_counts_match_tree_of_period(pgns):
+    half = len(pgns) // 2
+    # Merged trees count results over the union of their months.
+    full = GameTree.from_pgn_list(pgns[:half], 20).compact()
+    full += GameTree.from_pgn_list(pgns[half:], 20)
+
+    for start, end in [("2023-02", "2023-02"), ("2023-03", "2023-04")]:
+        period = full.period(start, end)
+        expected = GameTree.from_pgn_list(
+            [pgn for pgn in pgns if start <= pgn.month <= end], 20
+        )
+        for color in ["white", "black"]:
+            store, nodes = getattr(period, color), getattr(expected, color)
+            played = store.hashes[store.n_games() > 0].tolist()
+            assert played == sorted(nodes.keys())
+            for node_id, node in nodes.items():
+                view = store[node_id]
+                assert vars(view.res_cnt) == vars(node.res_cnt)
+                assert [full.games[i] for i in view.game_ids] == [
+                    expected.games[i] for i in sorted(node.game_ids)
+                ]
+
+
+def test_month_rows_only_for_months_with_games(pgns):
+    tree = GameTree.from_pgn_list(pgns, 20).compact()
+    store = tree.white
+    months = np.array(tree.game_months)
+
+    for i in range(len(store)):
+        ids = store.game_ids[store.game_ptr[i] : store.game_ptr[i + 1]]
+        rows = slice(store.month_ptr[i], store.month_ptr[i + 1])
+        assert store.month_keys[rows].tolist() == sorted(set(months[ids].tolist()))
+        assert store.month_counts[rows][-1].tolist() == store.counts[i].tolist()
+    assert not store.period_counts(0, int(months.min()) - 1).any()
+
+
+def test_sampled_store_has_no_period_counts(pgns):
+    tree = GameTree(n_examples=2)
+    tree.add_pgns_to_tree(pgns, 20)
+    tree.compact()
+
+    assert not tree.white.has_months()
+    with pytest.raises(ValueError):
+        tree.period("2023-02", "2023-03")
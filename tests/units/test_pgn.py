@@ -0,0 +1,46 @@
+import pickle
+
+from src.explorer.pgn import PGN, Color, Outcome, PGNBatch
+
+
+def make_pgn(i, opening="Sicilian Defense"):
+    color = "white" if i % 2 == 0 else "black"
+    return PGN(color, "draw", f"https://link/{i}", "e4 c5", "2023-04", opening)
+
+
+def test_pgn_keeps_string_api():
+    pgn = make_pgn(1)
+
+    assert (pgn.color, pgn.result, pgn.month) == ("black", "draw", "2023-04")
+    assert pgn.color_id == Color.BLACK
+    assert pgn.result_id == Outcome.DRAW
+    assert pgn.month_id == 2023 * 12 + 3
+    assert not hasattr(pgn, "__dict__")
+
+
+def test_pgn_pickle_round_trip():
+    pgn = make_pgn(0)
+    copy = pickle.loads(pickle.dumps(pgn))
+
+    assert [getattr(copy, s) for s in PGN.__slots__] == [
+        getattr(pgn, s) for s in PGN.__slots__
+    ]
+
+
+def test_openings_are_interned():
+    first = make_pgn(0, "".join(["Caro Kann ", "Defense"]))
+    second = make_pgn(1, "".join(["Caro Kann", " Defense"]))
+
+    assert first.opening is second.opening
+
+
+def test_batch_slices_and_iterates():
+    pgns = [make_pgn(i, ["A", "B", "C"][i % 3]) for i in range(10)]
+    batch = PGNBatch.from_pgns(pgns)
+
+    assert len(batch) == 10
+    assert batch.openings == ["A", "B", "C"]
+    chunk = pickle.loads(pickle.dumps(batch[4:7]))
+    assert [pgn.link for pgn in chunk] == [pgn.link for pgn in pgns[4:7]]
+    assert [pgn.opening for pgn in chunk] == ["B", "C", "A"]
+    assert [pgn.color for pgn in chunk] == ["white", "black", "white"]
@@ -0,0 +1,55 @@
+import chess
+import chess.polyglot
+import numpy as np
+
+from src.explorer.game_tree import GameTree
+from src.explorer.ranking import expected_score, rank_positions, wilson_upper_bound
+
+
+def bfs_ranking(nodes, thresh):
+    """Positions ranked by win rate, by a plain walk of the position dictionary."""
+    root = chess.polyglot.zobrist_hash(chess.Board())
+    seen, queue, ranked = {root}, [root], []
+    while queue:
+        node = nodes[queue.pop()]
+        for child_id in node.children:
+            if child_id in nodes and child_id not in seen:
+                child = nodes[child_id]
+                if child.n_games() >= thresh:
+                    seen.add(child_id)
+                    queue.append(child_id)
+                    if not child.last_move_hero:
+                        ranked.append((child.win_rate(), child_id))
+    return [node_id for _, node_id in sorted(ranked)]
+
+
+def test_ranking_matches_bfs(pgns):
+    tree = GameTree.from_pgn_list(pgns, 14)
+    expected = {c: bfs_ranking(getattr(tree, c), 3) for c in ["white", "black"]}
+    positions = tree.compact().get_worse_k_positions(3, 5)
+
+    assert [node.key for node in positions["w"].positions] == expected["white"][:5]
+    assert [node.key for node in positions["b"].positions] == expected["black"][:5]
+    all_ids = rank_positions(tree.white, 3, len(tree.white))
+    assert tree.white.hashes[all_ids].tolist() == expected["white"]
+
+
+def test_dict_and_compact_trees_rank_alike(pgns):
+    tree = GameTree.from_pgn_list(pgns, 14)
+    positions = tree.get_worse_k_positions(2, 4, score="expected_score")
+    compact = tree.compact().get_worse_k_positions(2, 4, score=expected_score)
+
+    for color in ["w", "b"]:
+        assert len(positions[color].positions) == 4
+        keys = [node.key for node in positions[color].positions]
+        assert keys == [node.key for node in compact[color].positions]
+
+
+def test_scores():
+    counts = np.array([[0, 0, 2], [10, 0, 20], [1, 2, 1], [0, 0, 0]])
+
+    assert np.allclose(expected_score(counts)[:3], [0, 1 / 3, 0.5])
+    upper = wilson_upper_bound(counts)
+    # Two losses are weaker evidence of a weakness than 20 losses in 30 games.
+    assert upper[1] < upper[0] < 1
+    assert np.isnan(upper[3])
@@ -0,0 +1,26 @@
+from src.preprocess.scheduler import RequestScheduler
+
+
+def test_acquire_allows_burst_then_paces_requests(clock):
+    scheduler = RequestScheduler(rate=2.0, burst=3, sleep=clock.sleep, clock=clock)
+
+    for _ in range(5):
+        scheduler.acquire()
+
+    # Three requests in the burst, then one every half second.
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_pause_holds_next_requests(clock):
+    scheduler = RequestScheduler(rate=100.0, burst=10, sleep=clock.sleep, clock=clock)
+
+    scheduler.pause(2.0)
+    scheduler.acquire()
+
+    assert clock.now == 2.0
+
+
+def test_backoff_is_capped():
+    scheduler = RequestScheduler(backoff_base=1.0, backoff_cap=4.0)
+
+    assert all(0 <= scheduler.backoff(attempt) <= 4.0 for attempt in range(10))
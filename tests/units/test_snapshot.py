@@ -0,0 +1,92 @@
+import chess
+import chess.polyglot
+
+from src.explorer.game_tree import GameTree
+from src.explorer.pgn import PGN
+from src.explorer.snapshot import TreeSnapshot
+from src.preprocess.game_store import GameStore
+
+
+def test_snapshot_round_trip(tmp_path, pgns):
+    tree = GameTree.from_pgn_list(pgns, 20)
+    tree.save(tmp_path / "tree", months={"2023-02": 3})
+    loaded, meta = GameTree.load(tmp_path / "tree")
+
+    assert meta == {"months": {"2023-02": 3}}
+    assert loaded.games == tree.games
+    assert loaded.game_months == tree.game_months
+    assert not loaded.white.counts.flags.writeable
+    for color in ["white", "black"]:
+        store, loaded_store = getattr(tree, color), getattr(loaded, color)
+        assert loaded_store.openings == store.openings
+        for name, array in store.arrays().items():
+            assert getattr(loaded_store, name).tolist() == array.tolist()
+    assert GameTree.load(tmp_path / "missing") is None
+
+
+def test_snapshot_only_builds_new_games(tmp_path, username, pgns, assert_same_trees):
+    store = GameStore(username, tmp_path)
+    for month in ["2023-02", "2023-03"]:
+        store.write_month(month, [pgn for pgn in pgns if pgn.month == month])
+    april = [pgn for pgn in pgns if pgn.month == "2023-04"]
+    half = len(april) // 2
+    store.write_month("2023-04", april[:half])
+    built = []
+
+    def build(pgn_list):
+        built.append(len(pgn_list))
+        return GameTree.from_pgn_list(pgn_list, 20)
+
+    snapshot = TreeSnapshot(username, 20, tmp_path)
+    snapshot.update(store, "2023-02", "2023-04", build)
+    snapshot.update(store, "2023-02", "2023-04", build)
+    store.write_month("2023-04", april, appended=True)
+    tree = snapshot.update(store, "2023-02", "2023-04", build)
+
+    assert built == [len(pgns) - len(april) + half, len(april) - half]
+    assert_same_trees(GameTree.from_pgn_list(pgns, 20), tree, same_order=False)
+
+
+def test_snapshots_from_other_months_are_kept_apart(tmp_path, username, pgns):
+    store = GameStore(username, tmp_path)
+    for month in ["2023-02", "2023-03", "2023-04"]:
+        store.write_month(month, [pgn for pgn in pgns if pgn.month == month])
+    built = []
+
+    def build(pgn_list):
+        built.append(len(pgn_list))
+        return GameTree.from_pgn_list(pgn_list, 20)
+
+    snapshot = TreeSnapshot(username, 20, tmp_path)
+    snapshot.update(store, "2023-02", "2023-04", build)
+    snapshot.update(store, "2023-03", "2023-04", build)
+    tree = snapshot.update(store, "2023-02", "2023-04", build)
+
+    assert len(built) == 2 and len(tree.games) == len(pgns)
+    assert snapshot.load("2023-03").games != snapshot.load("2023-02").games
+
+
+def test_snapshot_rebuilds_rewritten_months(tmp_path, username):
+    def games(result, game, opening):
+        return [
+            PGN("white", result, f"https://link/{i}", game, "2023-02", opening)
+            for i in range(3)
+        ]
+
+    store = GameStore(username, tmp_path)
+    store.write_month("2023-02", games("win", "e4 e5 Nf3", "King's Pawn"))
+    snapshot = TreeSnapshot(username, 20, tmp_path)
+    snapshot.update(
+        store, "2023-02", "2023-04", lambda p: GameTree.from_pgn_list(p, 20)
+    )
+    # Same links and number of games, as when a month is parsed again.
+    store.write_month("2023-02", games("lose", "d4 d5 c4", "Queen's Gambit"))
+    tree = snapshot.update(
+        store, "2023-02", "2023-04", lambda p: GameTree.from_pgn_list(p, 20)
+    )
+
+    root = tree.white[chess.polyglot.zobrist_hash(chess.Board())]
+    assert (root.res_cnt.win, root.res_cnt.lose) == (0, 3)
+    after_d4 = chess.Board()
+    after_d4.push_san("d4")
+    assert root.children == {chess.polyglot.zobrist_hash(after_d4)}
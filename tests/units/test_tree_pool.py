@@ -0,0 +1,39 @@
+import pytest
+
+from src.explorer.game_tree import GameTree
+from src.explorer.node_store import NodeStore
+from src.explorer.tree_pool import TreePool, attach_store, share_store
+
+
+@pytest.fixture(scope="module")
+def tree_pool():
+    with TreePool(3) as pool:
+        yield pool
+
+
+def test_shared_store_round_trip(pgns):
+    store = GameTree.from_pgn_list(pgns, 20).compact().white
+    copy = attach_store(share_store(store))
+
+    assert isinstance(copy, NodeStore)
+    assert copy.openings == store.openings
+    for name, array in store.arrays().items():
+        assert getattr(copy, name).tolist() == array.tolist()
+
+
+def test_pool_builds_same_tree(tree_pool, pgns, assert_same_trees):
+    progress = []
+
+    tree = tree_pool.build(pgns, 20, lambda *step: progress.append(step))
+    assert_same_trees(GameTree.from_pgn_list(pgns, 20), tree)
+    # 3 chunks are built, then merged in 2 steps.
+    assert progress == [("building", i, 5) for i in range(1, 6)]
+    # The pool is reused by the next build.
+    assert_same_trees(GameTree.from_pgn_list(pgns, 5), tree_pool.build(pgns, 5))
+
+
+def test_pool_with_fewer_games_than_processes(tree_pool, pgns, assert_same_trees):
+    pgns = pgns[:2]
+
+    assert_same_trees(GameTree.from_pgn_list(pgns, 20), tree_pool.build(pgns, 20))
+    assert len(tree_pool.build([], 20).white) == 0
@@ -0,0 +1,56 @@
+import pyarrow as pa
+
+from src.explorer.pgn import PGN
+from src.preprocess.writer import COLUMNS, BatchWriter
+
+
+def read(path):
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def make_pgn(i):
+    return PGN("white", "win", f"https://link/{i}", "e4 e5", "2023-04", "Open")
+
+
+def test_writer_flushes_in_batches(tmp_path):
+    path = tmp_path / "player.arrow"
+    with BatchWriter(path, batch_size=4) as writer:
+        for i in range(10):
+            writer.write(make_pgn(i))
+            assert len(writer) < 4
+        assert writer.n_written == 8
+
+    history = read(path)
+    assert history.num_rows == 10
+    assert history.column("link").to_pylist() == [
+        f"https://link/{i}" for i in range(10)
+    ]
+
+
+def test_writer_dedupes_on_link(tmp_path):
+    path = tmp_path / "player.arrow"
+    with BatchWriter(path, batch_size=4, dedupe_on="link") as writer:
+        for i in [0, 1, 0, 2, 1]:
+            writer.write(make_pgn(i))
+
+    assert read(path).num_rows == 3
+
+
+def test_writer_empty_history_is_valid_file(tmp_path):
+    path = tmp_path / "player.arrow"
+    with BatchWriter(path):
+        pass
+
+    assert read(path).column_names == COLUMNS
+
+
+def test_writer_batches_with_different_dictionaries(tmp_path):
+    path = tmp_path / "player.arrow"
+    with BatchWriter(path, batch_size=2) as writer:
+        writer.write(make_pgn(0))
+        writer.write(PGN("black", "lose", "https://link/1", "d4", "2023-04", "Slav"))
+        writer.write(PGN("black", "draw", "https://link/2", "c4", "2023-04", "English"))
+
+    history = read(path)
+    assert history.column("result").to_pylist() == ["win", "lose", "draw"]
+    assert history.column("opening").to_pylist() == ["Open", "Slav", "English"]